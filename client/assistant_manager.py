@@ -6,6 +6,7 @@ import os
 import sys
 import re
 import datetime
+import uuid
 from enum import Enum
 from dateutil import tz
 import soundfile as sf
@@ -23,6 +24,9 @@ from logger_config import get_logger
 
 logger = get_logger(__name__)
 
+USE_STREAMING_CHAT = True  # เล่นเสียงประโยคแรกทันทีที่ server สังเคราะห์เสร็จ (/chat/stream)
+TURN_INTERRUPTED_STATUS = "interrupted"  # server ตอบแบบนี้เมื่อ turn ถูกยกเลิกด้วย /cancel
+
 class AssistantState(Enum):
     IDLE = 0
     LISTENING = 1
@@ -96,6 +100,38 @@ class AssistantManager:
         escaped_text = html.escape(text)
         return f"<speak><prosody rate=\"{rate}\" pitch=\"{pitch}\">{escaped_text}</prosody></speak>"
 
+    def begin_turn(self):
+        """turn id ใหม่ต่อหนึ่งประโยคที่ผู้ใช้พูด ใช้กับ /chat, /speak และ /cancel (stop word)"""
+        turn_id = uuid.uuid4().hex
+        self.audio_controller.current_turn_id = turn_id
+        return turn_id
+
+    def end_turn(self, turn_id):
+        """หลังส่งคำตอบไปเล่นแล้ว stop word ไม่ต้องยกเลิก turn นี้ที่ server อีก"""
+        if self.audio_controller.current_turn_id == turn_id:
+            self.audio_controller.current_turn_id = None
+
+    def ask_streaming(self, user_voice, turn_id=None):
+        """
+        ส่งคำถามไป /chat/stream แล้วเล่นเสียงทีละประโยคระหว่างที่ server ยังคิดอยู่
+        Returns (response, streamed); response is None only when the server never accepted
+        the turn, so falling back to ask() cannot run the same utterance twice.
+        """
+        first_audio = threading.Event()
+
+        def on_audio(audio_content, text):
+            if not first_audio.is_set():
+                first_audio.set()
+                self.stop_processing_loop()
+                self.audio_controller.begin_stream()
+            self.audio_controller.feed_stream(audio_content, text)
+
+        response = self.gpt_client_proxy.ask_stream(user_voice, on_audio=on_audio, turn_id=turn_id)
+        if first_audio.is_set():
+            self.audio_controller.end_stream()
+        # ถ้าไม่มีเสียงจาก server (เช่น TTS ล้มเหลว) ผู้เรียกจะใช้ /speak ตามปกติ
+        return response, first_audio.is_set()
+
     def check_idle(self):
         """ถ้าไม่มี interaction นานเกิน IDLE_TIMEOUT ให้กลับไป Idle Mode"""
         if self.conversation_active and (time.time() - self.last_interaction_time > IDLE_TIMEOUT):
@@ -133,11 +169,22 @@ class AssistantManager:
                 logger.info(f"🗣️ User said: {user_voice}")
                 self.last_interaction_time = time.time()
 
+                turn_id = self.begin_turn()
                 self.start_processing_loop()
-                response = self.gpt_client_proxy.ask(user_voice)
+                response, streamed = self.ask_streaming(user_voice, turn_id) if USE_STREAMING_CHAT else (None, False)
+                if response is None:
+                    # /chat/stream ไม่ได้รับ turn นี้เลย (เชื่อมต่อไม่ได้ / server ไม่รองรับ) จึงถามซ้ำผ่าน /chat ได้
+                    response = self.gpt_client_proxy.ask(user_voice, turn_id=turn_id)
                 logger.info(f"[ChatGPT] Response received: {response}")
                 self.stop_processing_loop()
 
+                if response.get("status") == TURN_INTERRUPTED_STATUS:
+                    # ผู้ใช้พูด stop word ระหว่างที่ server กำลังคิด -> ไม่ต้องพูดอะไร
+                    logger.info("🛑 Turn interrupted by user")
+                    self.end_turn(turn_id)
+                    self.set_state(AssistantState.LISTENING)
+                    continue
+
                 
                 action = response.get("action")
                 action_type = action.get("type") if isinstance(action, dict) else None
@@ -149,14 +196,18 @@ class AssistantManager:
 
                 if action_type == "home_assistant_command" or action_type == "reminder":     
                     logger.debug("Enter command for Home Assistant and Creating reminder")             
-                    self.audio_controller.speak(self.text_to_ssml(message), is_ssml=True)                
+                    if not streamed:
+                        self.audio_controller.speak(self.text_to_ssml(message), is_ssml=True, turn_id=turn_id)
+                    self.end_turn(turn_id)
                     self.set_state(AssistantState.CONFIRMING)
                     continue               
                 else:
-                    if not re.search(r"<speak>.*</speak>", message, re.DOTALL):
-                        message = self.text_to_ssml(message)
-                    
-                    self.audio_controller.speak(message, is_ssml=True)
+                    if not streamed:
+                        if not re.search(r"<speak>.*</speak>", message, re.DOTALL):
+                            message = self.text_to_ssml(message)
+                        
+                        self.audio_controller.speak(message, is_ssml=True, turn_id=turn_id)
+                    self.end_turn(turn_id)
                     self.set_state(AssistantState.LISTENING)
                     continue
             
@@ -173,13 +224,16 @@ class AssistantManager:
                 logger.info(f"🗣️ User said (confirmation): {user_voice}")
                 self.last_interaction_time = time.time()
 
-                response = self.gpt_client_proxy.ask(user_voice)
+                turn_id = self.begin_turn()
+                response = self.gpt_client_proxy.ask(user_voice, turn_id=turn_id)
                 logger.info(f"[ChatGPT] Response received: {response}")
 
                 status = response.get("status",None)
                 message = response.get("reply", None)  
          
-                self.audio_controller.speak(self.text_to_ssml(message), is_ssml=True)
+                if status != TURN_INTERRUPTED_STATUS:
+                    self.audio_controller.speak(self.text_to_ssml(message), is_ssml=True, turn_id=turn_id)
+                self.end_turn(turn_id)
                 if status == "confirmed" or status == "cancelled":
                     self.set_state(AssistantState.LISTENING)                            
                
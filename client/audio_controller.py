@@ -2,21 +2,29 @@
 import sounddevice as sd
 import soundfile as sf
 import threading
+import queue
+import io
 import os
 import uuid
 import requests
 import scipy.signal
 import time
+import numpy as np
 
+import config
 from avatar_display import AssistantAvatarPygame
 
-from config import TEMP_AUDIO_PATH, TTS_SERVER_ENDPOINT, SAMPLE_RATE, AVATAR_SCALE, AVATAR_STATIC, AVATAR_ANIMATION, ENABLE_AVATAR_DISPLAY
+from config import TEMP_AUDIO_PATH, TTS_SERVER_ENDPOINT, SESSION_ID, SAMPLE_RATE, AVATAR_SCALE, AVATAR_STATIC, AVATAR_ANIMATION, ENABLE_AVATAR_DISPLAY
 from logger_config import get_logger
 
 sd.default.device = (0, 0)
 
 logger = get_logger(__name__)
 
+# /cancel อยู่ข้าง /speak บน server เดียวกัน
+CANCEL_SERVER_ENDPOINT = getattr(config, "CANCEL_SERVER_ENDPOINT", TTS_SERVER_ENDPOINT.rsplit("/", 1)[0] + "/cancel")
+CANCEL_TIMEOUT_SEC = 3
+
 
 class AudioController:
     def __init__(self, assistant_manager):
@@ -24,6 +32,8 @@ class AudioController:
         self.current_audio_file = None
         self.is_sound_playing = False
         self.stop_flag = threading.Event()        
+        self.stream_queue = None
+        self.current_turn_id = None   # turn ของคำถามล่าสุด (AssistantManager ตั้งให้) ใช้ยกเลิกงานฝั่ง server
         try:
             if ENABLE_AVATAR_DISPLAY:
                 self.avatar = AssistantAvatarPygame(
@@ -51,7 +61,30 @@ class AudioController:
         """Check if currently speaking"""
         return self.is_playing and not self.stop_flag.is_set()
         
-    def stop_audio(self):
+    def cancel_turn(self, turn_id=None):
+        """บอก server ให้หยุดงานที่ค้างอยู่ของ turn นี้ (LLM, search, TTS) โดยไม่บล็อก thread ที่เรียก"""
+        turn_id = turn_id or self.current_turn_id
+        if not turn_id:
+            return
+        if self.current_turn_id == turn_id:
+            self.current_turn_id = None   # turn นี้จบแล้ว เสียงถัดไป (เช่น reminder) ต้องไม่ใช้ id ที่ถูกยกเลิก
+
+        def _post():
+            try:
+                requests.post(
+                    CANCEL_SERVER_ENDPOINT,
+                    json={"session_id": SESSION_ID, "turn_id": turn_id},
+                    timeout=CANCEL_TIMEOUT_SEC
+                )
+                logger.info(f"🛑 Cancelled server turn {turn_id}")
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to cancel server turn {turn_id}: {e}")
+
+        threading.Thread(target=_post, daemon=True).start()
+
+    def stop_audio(self, cancel_turn=False):
+        if cancel_turn:
+            self.cancel_turn()
         self.stop_flag.set()
         sd.stop()
 
@@ -111,6 +144,73 @@ class AudioController:
 
         threading.Thread(target=_play, daemon=True).start()
 
+    def begin_stream(self):
+        """
+        เริ่มเล่นเสียงแบบต่อเนื่องทีละประโยค (จาก /chat/stream) โดยไม่ต้องเขียนไฟล์
+        feed_stream() ใส่เสียงเพิ่ม, end_stream() บอกว่าไม่มีประโยคถัดไปแล้ว
+        """
+        self.stop_audio()
+        self.stop_flag.clear()
+        self.stream_queue = queue.Queue()
+        self.is_sound_playing = True
+        threading.Thread(target=self._play_stream, args=(self.stream_queue,), daemon=True).start()
+
+    def feed_stream(self, audio_content, text=""):
+        if self.stream_queue is not None:
+            logger.debug(f"[TTS STREAM] queued sentence: {text}")
+            self.stream_queue.put(audio_content)
+
+    def end_stream(self):
+        if self.stream_queue is not None:
+            self.stream_queue.put(None)
+
+    def _play_stream(self, chunk_queue):
+        output = None
+        try:
+            if self.avatar:
+                self.avatar.start_animation()
+
+            while not self.stop_flag.is_set():
+                try:
+                    audio_content = chunk_queue.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if audio_content is None:
+                    break
+
+                data, samplerate = sf.read(io.BytesIO(audio_content), dtype='float32')
+                if len(data.shape) > 1:
+                    data = data.mean(axis=1)
+                if samplerate != SAMPLE_RATE:
+                    num_samples = int(len(data) * SAMPLE_RATE / samplerate)
+                    data = scipy.signal.resample(data, num_samples)
+
+                if output is None:
+                    output = sd.OutputStream(device=None, samplerate=SAMPLE_RATE, channels=1)
+                    output.start()
+
+                blocksize = 1024
+                i = 0
+                while i < len(data):
+                    if self.stop_flag.is_set():
+                        break
+                    end = i + blocksize
+                    output.write(data[i:end].astype('float32'))
+                    i = end
+                    self.assistant_manager.last_interaction_time = time.time()
+
+        except Exception as e:
+            logger.error(f"❌ Error during stream playback: {e}")
+
+        finally:
+            if output is not None:
+                output.close()
+            self.is_sound_playing = False
+            if self.stream_queue is chunk_queue:
+                self.stream_queue = None
+            if self.avatar:
+                self.avatar.stop_animation()
+
     def save_and_play(self, audio_content, ext=".mp3"):
         filename = os.path.join(TEMP_AUDIO_PATH, f"tts_{uuid.uuid4()}{ext}")
         try:
@@ -121,9 +221,71 @@ class AudioController:
         except Exception as e:
             logger.error(f"❌ Failed to save audio file: {e}")
 
-    def speak(self, text: str, is_ssml: bool = False):
+    def _play_pcm_response(self, response, samplerate):
+        try:
+            if self.avatar:
+                self.avatar.start_animation()
+
+            with sd.OutputStream(device=None, samplerate=samplerate, channels=1, dtype='int16') as stream:
+                leftover = b""
+                for chunk in response.iter_content(chunk_size=4096):
+                    if self.stop_flag.is_set():
+                        break
+                    chunk = leftover + chunk
+                    usable = len(chunk) - (len(chunk) % 2)
+                    leftover = chunk[usable:]
+                    if usable:
+                        stream.write(np.frombuffer(chunk[:usable], dtype=np.int16))
+                    self.assistant_manager.last_interaction_time = time.time()
+
+        except Exception as e:
+            logger.error(f"❌ Error during PCM playback: {e}")
+
+        finally:
+            response.close()
+            self.is_sound_playing = False
+            logger.debug("is_sound_playing is set to False")
+            if self.avatar:
+                self.avatar.stop_animation()
+
+    def _play_bytes(self, audio_content):
+        """Decode MP3 (or any soundfile format) straight from memory, no temp file."""
+        try:
+            data, samplerate = sf.read(io.BytesIO(audio_content), dtype='float32')
+            channels = data.shape[1] if len(data.shape) > 1 else 1
+
+            if samplerate != SAMPLE_RATE:
+                num_samples = int(len(data) * SAMPLE_RATE / samplerate)
+                data = scipy.signal.resample(data, num_samples)
+                samplerate = SAMPLE_RATE
+
+            if self.avatar:
+                self.avatar.start_animation()
+
+            with sd.OutputStream(device=None, samplerate=samplerate, channels=channels) as stream:
+                blocksize = 1024
+                i = 0
+                while i < len(data):
+                    if self.stop_flag.is_set():
+                        break
+                    end = i + blocksize
+                    stream.write(data[i:end].astype('float32'))
+                    i = end
+                    self.assistant_manager.last_interaction_time = time.time()
+
+        except Exception as e:
+            logger.error(f"❌ Error during playback: {e}")
+
+        finally:
+            self.is_sound_playing = False
+            if self.avatar:
+                self.avatar.stop_animation()
+
+    def speak(self, text: str, is_ssml: bool = False, turn_id: str = None):
         """
         ติดต่อ TTS server และเล่นเสียงจากข้อความ
+        ขอเสียงเป็น PCM ที่ SAMPLE_RATE แล้วเล่นทันทีที่ byte แรกมาถึง โดยไม่เขียนไฟล์
+        turn_id: ส่งเฉพาะตอนพูดคำตอบของ turn ปัจจุบัน (/cancel จะหยุดได้) ข้อความอื่น เช่น HELLO_MSG / reminder ไม่ต้องส่ง
         """
         logger.debug(f"[TTS INPUT] {text} | is_ssml={is_ssml}")
         self.stop_audio()
@@ -131,18 +293,28 @@ class AudioController:
         try:
             response = requests.post(
                 TTS_SERVER_ENDPOINT,
-                json={"text": text, "is_ssml": is_ssml},
-                timeout=15
+                json={
+                    "text": text, "is_ssml": is_ssml, "format": "pcm", "sample_rate": SAMPLE_RATE,
+                    "session_id": SESSION_ID, "turn_id": turn_id
+                },
+                timeout=15,
+                stream=True
             )
             response.raise_for_status()
-            logger.debug(f"[TTS RESPONSE] - Type = {response.headers.get('Content-Type')}")
-            if response.headers.get("Content-Type") == "audio/mpeg":
-                self.save_and_play(response.content)
+            content_type = response.headers.get("Content-Type", "")
+            logger.debug(f"[TTS RESPONSE] - Type = {content_type}")
+
+            self.stop_flag.clear()
+            if content_type.startswith("audio/L16"):
+                self.is_sound_playing = True
+                threading.Thread(target=self._play_pcm_response, args=(response, SAMPLE_RATE), daemon=True).start()
+            elif content_type == "audio/mpeg":
+                self.is_sound_playing = True
+                threading.Thread(target=self._play_bytes, args=(response.content,), daemon=True).start()
             else:
-                logger.error(f"❌ Invalid TTS content-type: {response.headers.get('Content-Type')}")
+                logger.error(f"❌ Invalid TTS content-type: {content_type}")
                 logger.error(f"❌ TTS response content: {response.text}")
                  
 
         except Exception as e:
             logger.error(f"❌ Failed to fetch TTS audio: {e}")
-
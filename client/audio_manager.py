@@ -23,8 +23,22 @@ import audio_config
 from logger_config import get_logger
 
 logger = get_logger(__name__)
+
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_CLOUD_CREDENTIALS_PATH
 
+TTS_CALL_DEADLINE_SEC = 10.0
+
+_tts_client = None
+_tts_client_lock = threading.Lock()
+
+def get_tts_client():
+    """One TextToSpeechClient (one gRPC channel) for the whole process, created on first use."""
+    global _tts_client
+    with _tts_client_lock:
+        if _tts_client is None:
+            _tts_client = texttospeech.TextToSpeechClient()
+        return _tts_client
+
 
 
 os.environ["SDL_AUDIODRIVER"] = "dummy"
@@ -183,7 +197,7 @@ class AudioManager:
     def speak(self, text_or_ssml, is_ssml=False):
         try:            
 
-            client = texttospeech.TextToSpeechClient()
+            client = get_tts_client()
             synthesis_input = texttospeech.SynthesisInput(ssml=text_or_ssml) if is_ssml else texttospeech.SynthesisInput(text=text_or_ssml)
 
             voice = texttospeech.VoiceSelectionParams(
@@ -200,7 +214,8 @@ class AudioManager:
             response = client.synthesize_speech(
                 input=synthesis_input,
                 voice=voice,
-                audio_config=audio_config
+                audio_config=audio_config,
+                timeout=TTS_CALL_DEADLINE_SEC
             )
 
             # 🔽 จุดนี้ใช้ path ตามระบบ
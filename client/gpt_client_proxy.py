@@ -1,6 +1,8 @@
 # gpt_client_proxy.py
 
 import requests
+import base64
+import json
 import os
 import sys
 import logging
@@ -10,14 +12,18 @@ from config import GPT_SERVER_ENDPOINT, SESSION_ID
 
 logger = logging.getLogger(__name__)
 
+# server รับ turn ไปแล้วแต่ stream ล้มกลางทาง: แจ้งผู้ใช้แทนการถามซ้ำผ่าน /chat (อาจสั่งงานซ้ำสองรอบ)
+STREAM_ERROR_RESPONSE = {"status": "error", "reply": "ขอโทษค่ะ เกิดข้อผิดพลาดระหว่างรับคำตอบจาก GPT Server"}
+
 class GPTProxyClient:
     def __init__(self, server_url=GPT_SERVER_ENDPOINT):
         self.server_url = server_url
 
-    def ask(self, user_text: str) -> str:
+    def ask(self, user_text: str, turn_id: str = None) -> str:
         payload = {
             "user_voice": user_text,
-            "session_id": SESSION_ID
+            "session_id": SESSION_ID,
+            "turn_id": turn_id
         }
         try:
             response = requests.post(self.server_url, json=payload, timeout=30)
@@ -32,4 +38,49 @@ class GPTProxyClient:
             return "❌ เกิดข้อผิดพลาดในการเชื่อมต่อ GPT Server"
         except Exception as e:
             logger.exception("❌ Unexpected error while contacting GPT server")
-            return "❌ เกิดข้อผิดพลาดภายในระบบ"
\ No newline at end of file
+            return "❌ เกิดข้อผิดพลาดภายในระบบ"
+
+    def ask_stream(self, user_text: str, on_audio=None, turn_id: str = None):
+        """
+        เรียก /chat/stream แล้วส่งเสียงทีละประโยคให้ on_audio(audio_bytes, text) ทันทีที่ได้รับ
+        Returns the final response dict. None only when the server never accepted the
+        turn (connect error or non-2xx status), so the caller can safely fall back to ask();
+        once the stream has started the server may already have run the turn, so a later
+        failure returns STREAM_ERROR_RESPONSE instead.
+        """
+        payload = {
+            "user_voice": user_text,
+            "session_id": SESSION_ID,
+            "turn_id": turn_id
+        }
+        acknowledged = False
+        try:
+            with requests.post(f"{self.server_url}/stream", json=payload, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                acknowledged = True
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event.get("type") == "audio":
+                        if on_audio:
+                            on_audio(base64.b64decode(event["audio"]), event.get("text", ""))
+                    elif event.get("type") == "done":
+                        return event.get("response")
+                    elif event.get("type") == "error":
+                        logger.error(f"❌ GPT server stream error: {event.get('error')}")
+                        return dict(STREAM_ERROR_RESPONSE)
+            logger.error("❌ GPT server stream ended without a final response")
+            return dict(STREAM_ERROR_RESPONSE)
+        except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError) as e:
+            if not acknowledged:
+                logger.warning(f"⚠️ GPT server did not accept the stream, falling back to /chat: {e}")
+                return None
+            logger.error(f"❌ Error streaming from GPT server: {e}")
+            return dict(STREAM_ERROR_RESPONSE)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Error streaming from GPT server: {e}")
+            return dict(STREAM_ERROR_RESPONSE)
+        except Exception:
+            logger.exception("❌ Unexpected error while streaming from GPT server")
+            return dict(STREAM_ERROR_RESPONSE)
@@ -82,7 +82,7 @@ class VoiceListener:
             # ✅ Check for STOP command
             if any(cmd in text for cmd in STOP_WORDS):
                 logger.info(f"🛑 Stop command detected: {text}")
-                self.audio_controller.stop_audio()
+                self.audio_controller.stop_audio(cancel_turn=True)
                 continue
 
             # ✅ Check for Wake Word
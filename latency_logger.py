@@ -3,6 +3,7 @@ import time
 class LatencyLogger:
     def __init__(self):
         self.checkpoints = []
+        self.stages = []
         self.start_time = time.perf_counter()
 
     def mark(self, label):
@@ -10,6 +11,10 @@ class LatencyLogger:
         elapsed = now - self.start_time
         self.checkpoints.append((label, elapsed))
 
+    def record(self, label, duration):
+        # stage ที่รันพร้อมกัน ใช้ mark ต่อกันไม่ได้ จึงเก็บ duration ของแต่ละ stage แยก
+        self.stages.append((label, duration))
+
     def report(self):
         print("📊 Latency Report:")
         for i in range(len(self.checkpoints)):
@@ -20,4 +25,5 @@ class LatencyLogger:
                 _, prev_elapsed = self.checkpoints[i - 1]
                 delta = elapsed - prev_elapsed
                 print(f"  {label}: {delta:.2f}s (since previous)")
-                
\ No newline at end of file
+        for label, duration in self.stages:
+            print(f"  ⏱️ {label}: {duration:.2f}s (stage)")
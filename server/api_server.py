@@ -1,12 +1,12 @@
-from fastapi import FastAPI, File, Request, UploadFile, Form,BackgroundTasks
+from fastapi import FastAPI, File, Request, UploadFile, Form
 from pydantic import BaseModel
-from typing import Union, Dict, Any
-from .gpt_integration import GPTClient
+from typing import Union, Dict, Any, Optional
 from voice_profile_manager import VoiceProfileManager
-from fastapi.responses import FileResponse,JSONResponse
-from .tts_manager import TTSManager
+from fastapi.responses import JSONResponse,StreamingResponse
+from .speech_stream import SpeechStreamer
 from .usage_tracker_instance import usage_tracker
 from contextlib import asynccontextmanager
+import asyncio
 import tempfile
 import shutil
 import os
@@ -16,18 +16,22 @@ from .intent_classifier.router import router as intent_router
 
 # --- Intent Router Imports for /chat endpoint ---
 from .flow_handlers.intent_router import IntentRouter
-from .intent_classifier.classifier import IntentClassifier
 from .session_manager import session_manager
+from .async_http import close_async_http_client, close_http_session
+from .llm_gateway import close_llm_gateway
+from .browser_pool import close_browser_pool
+from .turn_registry import turn_registry, TurnCancelled, TURN_CANCELLED_RESPONSE
+from .service_container import ServiceContainer
 
 
 from logger_config import get_logger
 
 logger = get_logger(__name__)
 
-gpt_client = GPTClient()
-
-intent_classifier = IntentClassifier()
-intent_router_instance = IntentRouter(gpt_client=gpt_client, intent_classifier=intent_classifier)
+# ✅ shared services ถูกสร้างครั้งเดียวต่อ process แล้ว inject ผ่าน IntentRouter
+services = ServiceContainer()
+gpt_client = services.gpt_client
+intent_router_instance = IntentRouter(services=services)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -38,6 +42,12 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 Starting history summarizer...")
     gpt_client.history_summarizer.start()
 
+    logger.info("🔥 Warming up TTS client pool...")
+    try:
+        await asyncio.to_thread(tts_manager.client_pool.warm_up, tts_manager.language_code)
+    except Exception as e:
+        logger.warning(f"⚠️ TTS warm-up failed, channels will connect on first use: {e}")
+
     yield
 
     # ✅ shutdown
@@ -47,27 +57,42 @@ async def lifespan(app: FastAPI):
     logger.info("🛑 Stopping history summarizer...")
     gpt_client.history_summarizer.stop()
 
+    await close_async_http_client()
+    close_http_session()
+    await close_llm_gateway()
+    await asyncio.to_thread(close_browser_pool)
+    services.close()
+
+    logger.info("🛑 Closing TTS client pool...")
+    tts_manager.client_pool.close()
+
 app = FastAPI(lifespan=lifespan)
+app.state.services = services
 
 app.include_router(intent_router, prefix="/nlp", tags=["Intent Detection"])
 
 vpm = VoiceProfileManager()
-tts_manager = TTSManager()
+tts_manager = services.tts_manager
+speech_streamer = SpeechStreamer(tts_manager)
+usage_tracker.register_stats("turns", turn_registry.stats)
 
 class ChatRequest(BaseModel):
     session_id: str
     user_voice: str
+    turn_id: Optional[str] = None   # ส่งมาจาก client ต่อหนึ่งประโยคที่ผู้ใช้พูด ใช้กับ /cancel
+
+class CancelRequest(BaseModel):
+    session_id: str
+    turn_id: Optional[str] = None   # ไม่ระบุ = ยกเลิกทุก turn ที่ค้างอยู่ของ session
  
 class ChatResponse(BaseModel):    
     response: Union[str, Dict[str, Any]]
 
-def cleanup_file(path: str):
-    if os.path.exists(path):
-        try:
-            os.remove(path)
-            logger.info(f"🧹 Deleted: {path}")
-        except Exception as e:
-            logger.info(f"⚠️ Failed to delete file: {e}")
+AUDIO_CHUNK_SIZE = 16 * 1024
+
+def iter_audio_chunks(audio_content: bytes, chunk_size: int = AUDIO_CHUNK_SIZE):
+    for start in range(0, len(audio_content), chunk_size):
+        yield audio_content[start:start + chunk_size]
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(chat_input: ChatRequest):
@@ -77,9 +102,17 @@ async def chat(chat_input: ChatRequest):
     state_info = session_manager.get_state_info(session_id)
     logger.debug(f"session_id = {session_id} : state = {state_info.get('state')}")
     if state_info and state_info.get("state") and state_info.get("state") != "complete":
-        result = intent_router_instance.route_by_state(state_info["state"], chat_input.user_voice, session)
+        route = intent_router_instance.route_by_state_async(state_info["state"], chat_input.user_voice, session)
     else:
-        result = intent_router_instance.route(chat_input.user_voice, session)
+        route = intent_router_instance.route_async(chat_input.user_voice, session)
+
+    async with turn_registry.track(session_id, chat_input.turn_id) as turn:
+        try:
+            result = await turn_registry.run(turn, route)
+        except TurnCancelled:
+            # ผู้ใช้สั่งหยุดระหว่างคิด: ไม่บันทึก state/context ของ turn ที่ถูกยกเลิก
+            logger.info(f"🛑 Turn {turn.turn_id} cancelled: {chat_input.user_voice}")
+            return ChatResponse(response=dict(TURN_CANCELLED_RESPONSE))
 
     session_manager.update_session(session_id, intent=session.intent, state=session.state, context_update=session.context)
 
@@ -87,24 +120,101 @@ async def chat(chat_input: ChatRequest):
     logger.info(f"🤖 Assistant responded: {result}")
     return ChatResponse(response=result)
 
+@app.post("/chat/stream")
+async def chat_stream(chat_input: ChatRequest):
+    """
+    Speak-while-thinking: NDJSON stream of per-sentence audio followed by the
+    final response, so the client can start playback on the first sentence.
+    """
+    session_id = chat_input.session_id
+    session = session_manager.get_session(session_id)
+
+    state_info = session_manager.get_state_info(session_id)
+    state = state_info.get("state") if state_info else None
+    logger.debug(f"session_id = {session_id} : state = {state} (stream)")
+
+    async def events():
+        async with turn_registry.track(session_id, chat_input.turn_id) as turn:
+            # events() ถูกวนอยู่ใน producer task ของ SpeechStreamer -> /cancel ยกเลิก task นั้น
+            turn.attach()
+            async for event in intent_router_instance.route_stream_async(chat_input.user_voice, session, state=state):
+                if event["type"] == "result":
+                    session_manager.update_session(session_id, intent=session.intent, state=session.state, context_update=session.context)
+                    logger.info(f"🗣️ User said: {chat_input.user_voice}")
+                    logger.info(f"🤖 Assistant responded: {event['result']}")
+                yield event
+
+    return StreamingResponse(speech_streamer.stream(events()), media_type="application/x-ndjson")
+
 @app.post("/speak")
-async def speak(req: Request, background_tasks: BackgroundTasks):
+async def speak(req: Request):
+    """
+    Synthesize in memory and stream the bytes back (no temp file).
+    Long texts are synthesized as parallel sentence segments and streamed in order,
+    so the first sentence arrives before the rest are done.
+    Optional "format": "pcm" + "sample_rate" returns raw 16-bit mono PCM the client can play as it arrives.
+    Optional "session_id" + "turn_id" let /cancel stop the remaining segments.
+    """
     data = await req.json()
     text = data.get("text", "")
     is_ssml = data.get("is_ssml", False)
+    audio_format = "pcm" if data.get("format") == "pcm" else "mp3"
+    sample_rate = int(data.get("sample_rate") or 24000) if audio_format == "pcm" else None
+    session_id = data.get("session_id", "")
+    turn_id = data.get("turn_id")
 
-    #print(f"is_ssml = {is_ssml}")
+    segments = tts_manager.iter_synthesize_async(text, is_ssml, audio_format, sample_rate)
+
+    async def next_segment():
+        try:
+            return await segments.__anext__()
+        except StopAsyncIteration:
+            return None
 
     try:
-        mp3_path = tts_manager.synthesize(text=text, is_ssml=is_ssml)
-        background_tasks.add_task(cleanup_file, mp3_path)  # ✅ ลบหลังส่ง
-        return FileResponse(mp3_path, media_type="audio/mpeg")
+        # รอ segment แรกก่อน เพื่อให้ error ตอนเริ่มต้นยังตอบกลับเป็น JSON ได้
+        async with turn_registry.track(session_id, turn_id) as turn:
+            first_segment = await turn_registry.run(turn, next_segment())
+    except TurnCancelled:
+        await segments.aclose()
+        return dict(TURN_CANCELLED_RESPONSE)
     except Exception as e:
+        await segments.aclose()
         return {"error": f"TTS failed: {str(e)}"}
 
+    async def audio_stream():
+        try:
+            async with turn_registry.track(session_id, turn_id) as turn:
+                segment = first_segment
+                while segment is not None:
+                    for chunk in iter_audio_chunks(segment):
+                        yield chunk
+                    segment = await turn_registry.run(turn, next_segment())
+        except TurnCancelled:
+            logger.info(f"🛑 Turn {turn_id} cancelled, stopped TTS stream")
+        except Exception as e:
+            logger.error(f"❌ TTS failed mid-stream: {e}")
+        finally:
+            await segments.aclose()
+
+    return StreamingResponse(
+        audio_stream(),
+        media_type=tts_manager.media_type(audio_format, sample_rate)
+    )
+
+@app.post("/cancel")
+async def cancel(cancel_input: CancelRequest):
+    """
+    Abort in-flight work (LLM, search, page fetch, TTS) for a turn, e.g. when the
+    user says a stop word. A cancel that arrives before its turn starts still applies.
+    """
+    cancelled = turn_registry.cancel(cancel_input.session_id, cancel_input.turn_id)
+    return {"status": "ok", "cancelled": cancelled}
+
 @app.get("/usage")
 async def usage_summary():
     summary = usage_tracker.summarize(by="day")
+    summary["runtime"] = usage_tracker.runtime_stats()
     return JSONResponse(content=summary)
 
 
@@ -119,7 +229,7 @@ async def upload_audio(audio: UploadFile = File(...)):
             shutil.copyfileobj(audio.file, f)
 
     try:
-        speaker = vpm.identify_speaker(temp_path)
+        speaker = await asyncio.to_thread(vpm.identify_speaker, temp_path)
         return {"speaker": speaker}
     finally:
         os.remove(temp_path)
@@ -135,7 +245,7 @@ async def create_profile(name: str = Form(...), audio: UploadFile = File(...)):
             shutil.copyfileobj(audio.file, f)
 
     try:
-        vpm.train_profile(name.strip(), temp_path)
+        await asyncio.to_thread(vpm.train_profile, name.strip(), temp_path)
         return {"status": "ok", "profile": name.strip()}
     finally:
         os.remove(temp_path)
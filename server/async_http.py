@@ -0,0 +1,63 @@
+# server/async_http.py
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+SYNC_POOL_MAXSIZE = 16   # keep-alive connections ต่อ host ของ requests.Session ที่ใช้ร่วมกัน
+
+_client = None
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Shared httpx.AsyncClient for Serper / Home Assistant / weather calls.
+    Created lazily on first use so it binds to the running uvicorn event loop.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        logger.info("🌐 Creating shared async HTTP client")
+        _client = httpx.AsyncClient(timeout=DEFAULT_TIMEOUT)
+    return _client
+
+
+async def close_async_http_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("🛑 Shared async HTTP client closed")
+    _client = None
+
+
+def get_http_session() -> requests.Session:
+    """
+    Shared requests.Session for the sync (worker thread) call paths, so repeated
+    Serper calls reuse keep-alive TLS connections instead of a handshake per request.
+    Pass an explicit timeout per call: a Session has no default.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                logger.info("🌐 Creating shared HTTP session")
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=SYNC_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def close_http_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            logger.info("🛑 Shared HTTP session closed")
+        _session = None
@@ -1,18 +1,17 @@
 import threading
 import time
 
-from openai import OpenAI
-from config import OPENAI_MODEL, OPENAI_API_KEY
+from .llm_gateway import get_llm_gateway
 from logger_config import get_logger
 
 logger = get_logger(__name__)
 
 class MemoryBackgroundSummarizer:
-    def __init__(self, memory_manager, api_key=OPENAI_API_KEY, model=OPENAI_MODEL, interval_sec=30):
+    def __init__(self, memory_manager, model=None, interval_sec=30):
         logger.info("MemoryBackgroundSummarizer Initialized")
         self.memory_manager = memory_manager
-        self.client = OpenAI(api_key=api_key)
-        self.model = model
+        self.llm = get_llm_gateway()
+        self.model = model or self.llm.route("summarize_memory")["model"]
         self.interval_sec = interval_sec
         self._stop_event = threading.Event()
         self._thread = threading.Thread(target=self._run_loop, daemon=True)
@@ -48,7 +47,8 @@ class MemoryBackgroundSummarizer:
         )
 
         try:
-            response = self.client.chat.completions.create(
+            response = self.llm.chat(
+                task="summarize_memory",
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "คุณคือ AI ช่วยสรุปข้อมูล"},
@@ -78,11 +78,11 @@ class MemoryBackgroundSummarizer:
         logger.debug("✅ Loop exited cleanly.")
     
 class HistoryBackgroundSummarizer:
-    def __init__(self, memory_manager, api_key=OPENAI_API_KEY, model=OPENAI_MODEL, interval_sec=60):
+    def __init__(self, memory_manager, model=None, interval_sec=60):
         logger.info("MemoryBackgroundSummarizer Initialized")
         self.memory_manager = memory_manager
-        self.client = OpenAI(api_key=api_key)
-        self.model = model
+        self.llm = get_llm_gateway()
+        self.model = model or self.llm.route("summarize_memory")["model"]
         self.interval_sec = interval_sec
         self._stop_event = threading.Event()
         self._thread = threading.Thread(target=self._run_loop, daemon=True)
@@ -125,7 +125,8 @@ class HistoryBackgroundSummarizer:
         )
 
         try:
-            response = self.client.chat.completions.create(
+            response = self.llm.chat(
+                task="summarize_memory",
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "คุณคือผู้ช่วย AI"},
@@ -0,0 +1,220 @@
+# server/browser_pool.py
+import asyncio
+import threading
+from logger_config import get_logger
+from .usage_tracker_instance import usage_tracker
+
+try:
+    from playwright.async_api import async_playwright
+except ImportError:  # optional: ไม่มีก็ render หน้าเว็บด้วย browser ไม่ได้
+    async_playwright = None
+
+logger = get_logger(__name__)
+
+MAX_CONCURRENT_PAGES = 3
+FETCH_DEADLINE_SEC = 8.0      # เพดานรวมต่อหน้า (navigation + อ่าน DOM)
+CLOSE_TIMEOUT_SEC = 10
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/114.0.0.0 Safari/537.36"
+)
+# ต้องการแค่ข้อความในหน้า: ไม่โหลดรูป ฟอนต์ วิดีโอ และโฆษณา/tracker
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_HOST_MARKERS = (
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "adservice.google",
+    "google-analytics.com", "googletagmanager.com", "facebook.net", "amazon-adsystem.com",
+    "criteo.", "taboola.com", "outbrain.com", "adnxs.com",
+)
+
+
+class BrowserPool:
+    """
+    One long-lived headless Chromium with a bounded pool of reusable pages
+    (each in its own context), replacing a browser launch per URL.
+
+    Playwright objects are bound to the event loop that created them, so the
+    browser lives on a dedicated thread with its own loop; fetch() (worker
+    threads) and fetch_async() (FastAPI loop) both hand the work to it.
+    The browser is started on first use.
+    """
+
+    def __init__(self, max_pages=MAX_CONCURRENT_PAGES, deadline_sec=FETCH_DEADLINE_SEC):
+        self.max_pages = max_pages
+        self.deadline_sec = deadline_sec
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+        # ใช้บน pool loop เท่านั้น
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = None
+        self._semaphore = None
+        self._idle_pages = []
+
+        self.fetches = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.blocked_requests = 0
+        self.browser_launches = 0
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True)
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    async def _ensure_browser(self):
+        if self._browser_lock is None:
+            self._browser_lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.max_pages)
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            logger.info("🌐 Launching shared headless Chromium")
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._idle_pages = []   # หน้าของ browser เดิม (ถ้า crash) ใช้ไม่ได้แล้ว
+            self.browser_launches += 1
+
+    async def _route(self, route):
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or any(marker in request.url for marker in BLOCKED_HOST_MARKERS):
+            self.blocked_requests += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _new_page(self):
+        context = await self._browser.new_context(user_agent=USER_AGENT)
+        await context.route("**/*", self._route)
+        return await context.new_page()
+
+    async def _discard_page(self, page):
+        try:
+            await page.context.close()
+        except Exception:
+            pass
+
+    async def _render(self, url):
+        await self._ensure_browser()
+        async with self._semaphore:
+            page = self._idle_pages.pop() if self._idle_pages else await self._new_page()
+            reusable = False
+            try:
+                # DOM พร้อมก็พอ ไม่รอ networkidle (หน้าข่าวมี request ค้างตลอด)
+                await page.goto(url, wait_until="domcontentloaded", timeout=self.deadline_sec * 1000)
+                html_content = await page.content()
+                reusable = True
+                return html_content
+            finally:
+                if reusable and len(self._idle_pages) < self.max_pages:
+                    self._idle_pages.append(page)
+                else:
+                    await self._discard_page(page)
+
+    async def _render_with_deadline(self, url):
+        try:
+            return await asyncio.wait_for(self._render(url), self.deadline_sec)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def _submit(self, url):
+        self.fetches += 1
+        return asyncio.run_coroutine_threadsafe(self._render_with_deadline(url), self._ensure_loop())
+
+    def fetch(self, url):
+        """Rendered HTML of url, or None. Blocking: call from a worker thread, not the event loop."""
+        if async_playwright is None:
+            logger.warning("⚠️ playwright is not installed, cannot render pages")
+            return None
+        future = self._submit(url)
+        try:
+            return future.result(timeout=self.deadline_sec + 2)
+        except Exception as e:
+            future.cancel()
+            self.failures += 1
+            logger.warning(f"⚠️ Browser fetch failed for {url}: {e!r}")
+            return None
+
+    async def fetch_async(self, url):
+        """Rendered HTML of url, or None."""
+        if async_playwright is None:
+            logger.warning("⚠️ playwright is not installed, cannot render pages")
+            return None
+        future = self._submit(url)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"⚠️ Browser fetch failed for {url}: {e!r}")
+            return None
+
+    async def _close_browser(self):
+        for page in self._idle_pages:
+            await self._discard_page(page)
+        self._idle_pages = []
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def close(self):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_browser(), loop).result(timeout=CLOSE_TIMEOUT_SEC)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to close browser cleanly: {e!r}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=CLOSE_TIMEOUT_SEC)
+        loop.close()
+        self._browser_lock = self._semaphore = None
+
+    def stats(self):
+        return {
+            "fetches": self.fetches,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "blocked_requests": self.blocked_requests,
+            "browser_launches": self.browser_launches,
+            "idle_pages": len(self._idle_pages),
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Process-wide BrowserPool, created on first use (the browser itself starts on the first fetch)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool()
+                usage_tracker.register_stats("browser_pool", _pool.stats)
+    return _pool
+
+
+def close_browser_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            logger.info("🛑 Shared browser closed")
+        _pool = None
@@ -1,13 +1,12 @@
 import re
 import json
 from datetime import datetime, timedelta
-from openai import OpenAI
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
-from config import OPENAI_API_KEY, OPENAI_MODEL
 from .entry_map_ha import control_device_function, domain_field_schema, action_field_schema, attribute_field_schema
-from .usage_tracker_instance import usage_tracker
+from .llm_gateway import get_llm_gateway
+from .llm_schemas import QuestionAnalysis
  
 from logger_config import get_logger
 
@@ -19,7 +18,7 @@ SESSION_EXPIRY_SECONDS = 120
 class ChatManager:
     def __init__(self, tone="default"):
         logger.info("ChatManager initialized")
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.llm = get_llm_gateway()
         self.tone = tone
         self.functions = [control_device_function]
         self.function_schema_sent = False
@@ -66,106 +65,138 @@ class ChatManager:
         self.tone = tone
 
     def get_system_prompt(self, tone="default"):
-        from datetime import datetime
-        today_thai = datetime.today().strftime("%d %B %Y")
-
+        # ต้องคงที่ทุก byte (ไม่มีวันที่/ข้อมูลที่เปลี่ยนทุก request) เพื่อให้ provider prompt cache ใช้ prefix ร่วมกัน
+        # วันที่ย้ายไปอยู่ใน user message ดู _today_line()
         if tone == "family":
             return (
-                f"วันนี้คือวันที่ {today_thai}\n"
                 "คุณคือผู้ช่วยหญิงของบ้านอัจฉริยะ ชื่อ ผิงผิง พูดไทยสุภาพ เป็นกันเองแบบเพื่อนในครอบครัว"
                 "ตอบอย่างมั่นใจ โดยใช้ความรู้ทั่วไปที่คุณเคยเรียนรู้จากการฝึกฝน หากไม่แน่ใจในตัวเลข ให้ตอบประมาณการได้อย่างสมเหตุสมผล"
                 "สามารถตอบเชิงประเมินหรือประมาณการได้ถ้าเป็นประโยชน์ต่อผู้ใช้"
                 "ถ้าไม่รู้จริง ๆ ให้พูดตรง ๆ เช่น 'ยังไม่เจอเลยน้า'"
                 "ถ้าเหมาะสมให้ชวนคุย เช่น 'มีอะไรอยากรู้เพิ่มอีกไหมจ้า?'"
-                "ตอบกลับโดยใช้ SSML ที่รองรับ Google Cloud TTS เท่านั้น: "
-                "- ตอบเฉพาะข้อความที่ต้องพูด "
-                "- ใช้ `<speak>...</speak>` เป็น root "
-                "- ใช้ `<prosody rate=\"108%\" pitch=\"+1st\">...</prosody>` เพื่อควบคุมโทน "
-                "- ใส่ `<break time=\"300ms\"/>` เพื่อเว้นจังหวะ "
-                "- Escape อักขระ เช่น `&`, `<`, `>` "
-                "- ห้ามใช้ Markdown หรืออธิบาย tag SSML "
+                "คำตอบจะถูกอ่านออกเสียง: ตอบเป็นข้อความธรรมดาเฉพาะสิ่งที่ต้องพูด ประโยคสั้น กระชับ "
+                "ห้ามใช้ SSML, Markdown, emoji หรือรายการแบบ bullet"
             )
         else:
             return (
-                f"วันนี้คือวันที่ {today_thai}\n"
                 "You are a polite, Thai-speaking female assistant who answers in Thai using 'ค่ะ'. "
                 "Answer clearly without saying 'จากข้อมูลที่ให้มา'. If the answer is found in the context, state it directly. "
                 "If not clear, infer reasonably and mention it. If no info, say so politely."
             )
 
 
-    def ask_gpt_with_context(self, question, context=""):
+    def _today_line(self):
+        today_thai = datetime.today().strftime("%d %B %Y")
+        return f"วันนี้คือวันที่ {today_thai}"
+
+    def _build_context_request(self, question, context=""):
         system_prompt = self.get_system_prompt(self.tone)
         temperature = 0.5 if self.tone == "family" else 0.2
 
         messages = [{"role": "system", "content": system_prompt}]
 
-        if context:
-            messages.append({"role": "system", "content": f"ข้อมูลจากเว็บ:\n{context}"})
-            
-        gpt_model = OPENAI_MODEL
+        task = "answer"
 
-        # ✨ ปรับให้แนบ context + คำถามไว้ใน message เดียว เพื่อความเชื่อมโยง
+        # ✨ ปรับให้แนบ context + คำถามไว้ใน message เดียว เพื่อความเชื่อมโยง (แนบครั้งเดียว ไม่ซ้ำใน system message)
         if context:
             formatted_question = (
-                f"คำถาม: {question}\n\n"
-                f"ข้อมูลที่อาจช่วยตอบคำถาม:\n{context}\n"
-                f"โปรดใช้ข้อมูลข้างต้นในการตอบคำถามนี้ ให้วิเคราะห์และตอบตรงจากข้อมูล ไม่ต้องคาดเดา"
+                f"{self._today_line()}\n\n"
+                f"ข้อมูลที่อาจช่วยตอบคำถาม:\n{context}\n\n"
+                f"โปรดใช้ข้อมูลข้างต้นในการตอบคำถามนี้ ให้วิเคราะห์และตอบตรงจากข้อมูล ไม่ต้องคาดเดา\n"
+                f"คำถาม: {question}"
             )
         else:
-            formatted_question = question
+            formatted_question = f"{self._today_line()}\n\n{question}"
 
         if self.user_requests_expert(question):
-            gpt_model = "gpt-4o"
+            task = "escalate"
             messages.append({"role": "user", "content": self.build_escalation_prompt(question)})
         
-        messages.append({"role": "user", "content": formatted_question})     
+        messages.append({"role": "user", "content": formatted_question})
+        return task, messages, temperature
 
-        response = self.client.chat.completions.create(
+    def ask_gpt_with_context(self, question, context=""):
+        task, messages, temperature = self._build_context_request(question, context)
+        gpt_model = self.llm.route(task)["model"]
+
+        response = self.llm.chat(
+            task=task,
+            hedge=True,
             model=gpt_model,
             messages=messages,
             temperature=temperature
         )
 
-        usage = response.usage
-        logger.info(f"MODEL={gpt_model}")
-        logger.info(f"Input tokens:{usage.prompt_tokens}")
-        logger.info(f"Output tokens:{usage.completion_tokens}")
-        logger.info(f"Total tokens :{usage.total_tokens}")
+        reply = response.choices[0].message.content.strip()
+        self.update_session(question, gpt_model, reply)
+        return reply
+
+    async def ask_gpt_with_context_async(self, question, context=""):
+        task, messages, temperature = self._build_context_request(question, context)
+        gpt_model = self.llm.route(task)["model"]
 
-        usage_tracker.log_gpt_usage(
-            prompt_tokens=usage.prompt_tokens,
-            completion_tokens=usage.completion_tokens
+        response = await self.llm.chat_async(
+            task=task,
+            hedge=True,
+            model=gpt_model,
+            messages=messages,
+            temperature=temperature
         )
 
         reply = response.choices[0].message.content.strip()
         self.update_session(question, gpt_model, reply)
         return reply
 
-    def ask_simple(self, prompt: str) -> str:
+    async def stream_gpt_with_context_async(self, question, context=""):
+        """
+        Stream the answer as text deltas. The gateway logs usage from the final
+        chunk; the escalation session is updated once the stream completes.
+        """
+        task, messages, temperature = self._build_context_request(question, context)
+        gpt_model = self.llm.route(task)["model"]
+
+        parts = []
+        async for chunk in self.llm.stream_async(
+            task=task,
+            hedge=True,
+            model=gpt_model,
+            messages=messages,
+            temperature=temperature
+        ):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        self.update_session(question, gpt_model, "".join(parts).strip())
+
+    def ask_simple(self, prompt: str, task: str = "general") -> str:
         try:
-            response = self.client.chat.completions.create(
-                model=OPENAI_MODEL,
+            response = self.llm.chat(
+                task=task,
                 messages=[{"role": "user", "content": prompt}]
             )
-            usage = response.usage
-            logger.info(f"Input tokens:{usage.prompt_tokens}")
-            logger.info(f"Output tokens:{usage.completion_tokens}")
-            logger.info(f"Total tokens :{usage.total_tokens}")
-
-            usage_tracker.log_gpt_usage(
-                prompt_tokens=usage.prompt_tokens,
-                completion_tokens=usage.completion_tokens
-            )
             return response.choices[0].message.content.strip()
         except Exception as e:
             logger.error(f"❌ Error in ask_simple: {e}")
             return ""
 
-    def analyze_question_all_in_one(self, current_question, previous_question=None):
-        
+    async def ask_simple_async(self, prompt: str, task: str = "general") -> str:
+        try:
+            response = await self.llm.chat_async(
+                task=task,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            logger.error(f"❌ Error in ask_simple_async: {e}")
+            return ""
+
+    def _build_analysis_prompt(self, current_question, previous_question=None):
         if previous_question:
-            prompt = (
+            return (
                 f"Classify this question:\n"
                 f"Previous: \"{previous_question}\"\n"
                 f"Current: \"{current_question}\"\n\n"
@@ -173,76 +204,75 @@ class ChatManager:
                 f"{{\n  \"need_web_search\": \"Yes/No\",\n  \"need_memory\": \"Yes/No\",\n  \"need_conversation_history\": \"Yes/No\"\n}}\n"
                 f"If context is required to understand current question, set 'need_conversation_history' = 'Yes'."
             )        
-        else:
-            prompt = (
-                f"Classify this question:\n\n\"{current_question}\"\n\n"
-                f"Return only JSON:\n"
-                f"{{\n  \"need_web_search\": \"Yes/No\",\n  \"need_memory\": \"Yes/No\",\n  \"need_conversation_history\": \"Yes/No\"\n}}"
-            )
-
-
+        return (
+            f"Classify this question:\n\n\"{current_question}\"\n\n"
+            f"Return only JSON:\n"
+            f"{{\n  \"need_web_search\": \"Yes/No\",\n  \"need_memory\": \"Yes/No\",\n  \"need_conversation_history\": \"Yes/No\"\n}}"
+        )
 
-        response = self.client.chat.completions.create(
-            model=OPENAI_MODEL,
+    def analyze_question_all_in_one(self, current_question, previous_question=None):
+        prompt = self._build_analysis_prompt(current_question, previous_question)
+        analysis = self.llm.chat_structured(
+            QuestionAnalysis,
+            task="classify",
             messages=[{"role": "user", "content": prompt}],
             temperature=0,
         )
+        return analysis.model_dump()
 
-        usage = response.usage
-        logger.info(f"Input tokens:{usage.prompt_tokens}")
-        logger.info(f"Output tokens:{usage.completion_tokens}")
-        logger.info(f"Total tokens :{usage.total_tokens}")
-
-        usage_tracker.log_gpt_usage(
-            prompt_tokens=usage.prompt_tokens,
-            completion_tokens=usage.completion_tokens
+    async def analyze_question_all_in_one_async(self, current_question, previous_question=None):
+        prompt = self._build_analysis_prompt(current_question, previous_question)
+        analysis = await self.llm.chat_structured_async(
+            QuestionAnalysis,
+            task="classify",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
         )
-
-        content = response.choices[0].message.content.strip()
-        cleaned_content = re.sub(r"```(?:json)?\n([\s\S]*?)\n```", r"\1", content.strip())
-        return json.loads(cleaned_content)
-    def ask_json_only(self, prompt: str) -> dict:
-        response = self.client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "คุณคือ AI ที่จะตอบกลับเฉพาะในรูปแบบ JSON เท่านั้น ห้ามใส่คำบรรยาย คำพูด หรือข้อความอื่นใด"},
-                {"role": "user", "content": prompt}
-            ],
+        return analysis.model_dump()
+
+    def _json_only_messages(self, prompt: str):
+        return [
+            {"role": "system", "content": "คุณคือ AI ที่จะตอบกลับเฉพาะในรูปแบบ JSON เท่านั้น ห้ามใส่คำบรรยาย คำพูด หรือข้อความอื่นใด"},
+            {"role": "user", "content": prompt}
+        ]
+
+    def ask_json_only(self, prompt: str, schema=None) -> dict:
+        """JSON object from the model; with a pydantic schema the API enforces it (structured output)."""
+        result = self.llm.chat_structured(
+            schema,
+            task="extract_json",
+            messages=self._json_only_messages(prompt),
             temperature=0.2,
         )
-        usage = response.usage
-        logger.info(f"Input tokens:{usage.prompt_tokens}")
-        logger.info(f"Output tokens:{usage.completion_tokens}")
-        logger.info(f"Total tokens :{usage.total_tokens}")
-
-        usage_tracker.log_gpt_usage(
-            prompt_tokens=usage.prompt_tokens,
-            completion_tokens=usage.completion_tokens
+        return result.model_dump() if schema is not None else result
+
+    async def ask_json_only_async(self, prompt: str, schema=None) -> dict:
+        result = await self.llm.chat_structured_async(
+            schema,
+            task="extract_json",
+            messages=self._json_only_messages(prompt),
+            temperature=0.2,
         )
-        content = response.choices[0].message.content.strip()
-        if content.startswith("```"):
-            content = re.sub(r"^```(?:json)?\n|\n```$", "", content.strip())
-        json_match = re.search(r"\{.*\}", content, re.DOTALL)
-        if not json_match:
-            raise ValueError(f"GPT response is not valid JSON:\n{content}")
-        return json.loads(json_match.group())
-
-    def ask_plain_response(self, prompt: str) -> str:
-        response = self.client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "คุณคือ AI ที่ให้คำตอบตรงไปตรงมา"},
-                {"role": "user", "content": prompt}
-            ],
+        return result.model_dump() if schema is not None else result
+
+    def _plain_response_messages(self, prompt: str):
+        return [
+            {"role": "system", "content": "คุณคือ AI ที่ให้คำตอบตรงไปตรงมา"},
+            {"role": "user", "content": prompt}
+        ]
+
+    def ask_plain_response(self, prompt: str, task: str = "general") -> str:
+        response = self.llm.chat(
+            task=task,
+            messages=self._plain_response_messages(prompt),
             temperature=0.4,
         )
-        usage = response.usage
-        logger.info(f"Input tokens:{usage.prompt_tokens}")
-        logger.info(f"Output tokens:{usage.completion_tokens}")
-        logger.info(f"Total tokens :{usage.total_tokens}")
-
-        usage_tracker.log_gpt_usage(
-            prompt_tokens=usage.prompt_tokens,
-            completion_tokens=usage.completion_tokens
+        return response.choices[0].message.content.strip()
+
+    async def ask_plain_response_async(self, prompt: str, task: str = "general") -> str:
+        response = await self.llm.chat_async(
+            task=task,
+            messages=self._plain_response_messages(prompt),
+            temperature=0.4,
         )
-        return response.choices[0].message.content.strip()
\ No newline at end of file
+        return response.choices[0].message.content.strip()
@@ -0,0 +1,226 @@
+# server/context_composer.py
+import re
+import threading
+from .sentence_splitter import split_sentences
+from config import OPENAI_MODEL
+from logger_config import get_logger
+
+try:
+    import tiktoken
+except ImportError:  # optional: ไม่มีก็ใช้ค่าประมาณ
+    tiktoken = None
+
+logger = get_logger(__name__)
+
+# token budget ต่อแหล่งข้อมูล (system คือ system prompt ที่ตัดไม่ได้ ส่วนที่เกินจะไปหักจาก web)
+CONTEXT_TOKEN_BUDGETS = {
+    "system": 450,
+    "web": 900,
+    "memory": 250,
+    "history": 300,
+}
+SOURCE_ORDER = ("web", "memory", "history")
+SOURCE_LABELS = {
+    "web": "ข้อมูลจากเว็บ",
+    "memory": "ความทรงจำล่าสุด",
+    "history": "บทสนทนาก่อนหน้า",
+}
+DUPLICATE_SIMILARITY = 0.8   # jaccard ของ character 3-gram ที่ถือว่าเป็นประโยคซ้ำ
+DEDUP_MIN_CHARS = 12         # วลีสั้น ๆ (เช่น "บาท", "User:") ซ้ำกันได้ ไม่นับเป็น duplicate
+MIN_PARTIAL_TOKENS = 16      # budget ที่เหลือน้อยกว่านี้ไม่คุ้มตัดครึ่งประโยคมาต่อท้าย (ยกเว้นยังไม่มีประโยคไหนเลย)
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def _get_encoder():
+    global _encoder
+    if tiktoken is None:
+        return None
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                try:
+                    try:
+                        _encoder = tiktoken.encoding_for_model(OPENAI_MODEL)
+                    except KeyError:
+                        _encoder = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    logger.warning(f"⚠️ tiktoken unavailable, estimating tokens: {e}")
+                    _encoder = False
+    return _encoder or None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder:
+        return len(encoder.encode(text))
+    # ค่าประมาณ: ภาษาไทย ~2 ตัวอักษรต่อ token, ภาษาอังกฤษ ~4 ตัวอักษรต่อ token
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return (non_ascii + 1) // 2 + (len(text) - non_ascii + 3) // 4
+
+
+def _cut_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text that fits in max_tokens (for a sentence too long to keep whole)."""
+    if max_tokens <= 0:
+        return ""
+    encoder = _get_encoder()
+    if encoder:
+        # token สุดท้ายอาจตัดกลางตัวอักษรไทย (decode ได้ \ufffd) จึงตัดทิ้ง
+        return encoder.decode(encoder.encode(text)[:max_tokens]).rstrip("\ufffd").rstrip()
+    non_ascii = 0
+    for idx, ch in enumerate(text):
+        non_ascii += ord(ch) > 127
+        if (non_ascii + 1) // 2 + (idx + 1 - non_ascii + 3) // 4 > max_tokens:
+            return text[:idx].rstrip()
+    return text
+
+
+def _units(text: str):
+    """(block_index, sentence) pairs; blocks are lines so structure like "User: ..." survives."""
+    units = []
+    for block_idx, block in enumerate(re.split(r"\n+", text or "")):
+        if block.strip():
+            units.extend((block_idx, sentence) for sentence in split_sentences(block, min_chars=1))
+    return units
+
+
+def _shingles(sentence: str):
+    normalized = re.sub(r"\s+", "", sentence.lower())
+    if len(normalized) < 3:
+        return {normalized}
+    return {normalized[i:i + 3] for i in range(len(normalized) - 2)}
+
+
+def _is_duplicate(shingles, seen):
+    for other in seen:
+        union = len(shingles | other)
+        if union and len(shingles & other) / union >= DUPLICATE_SIMILARITY:
+            return True
+    return False
+
+
+def _join_units(units):
+    lines = []
+    last_block = None
+    for block_idx, sentence in units:
+        if block_idx == last_block:
+            lines[-1] = f"{lines[-1]} {sentence}"
+        else:
+            lines.append(sentence)
+            last_block = block_idx
+    return "\n".join(lines)
+
+
+def _select(units, max_tokens, seen):
+    """
+    Walk sentences in order, skipping near-duplicates of anything in seen and
+    stopping at the first sentence that would exceed max_tokens. That sentence
+    is cut to the remaining tokens rather than dropped, so a source that is one
+    long unpunctuated "sentence" (common in Thai) is shortened, not lost.
+    Returns (kept_units, tokens_used, duplicates_dropped); seen is updated in place.
+    """
+    kept, used, duplicates = [], 0, 0
+    for block_idx, sentence in units:
+        shingles = _shingles(sentence)
+        dedupable = len(shingles) >= DEDUP_MIN_CHARS
+        if dedupable and _is_duplicate(shingles, seen):
+            duplicates += 1
+            continue
+        tokens = count_tokens(sentence) + 1
+        if used + tokens > max_tokens:
+            remaining = max_tokens - used - 1
+            partial = _cut_to_tokens(sentence, remaining) if remaining >= MIN_PARTIAL_TOKENS or not kept else ""
+            if partial:
+                kept.append((block_idx, partial))
+                used += count_tokens(partial) + 1
+            break
+        if dedupable:
+            seen.append(shingles)
+        kept.append((block_idx, sentence))
+        used += tokens
+    return kept, used, duplicates
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Deduplicate sentences and keep them from the start until max_tokens is reached (the last one may be cut)."""
+    kept, _, _ = _select(_units(text), max_tokens, seen=[])
+    return _join_units(kept)
+
+
+class ContextComposer:
+    """
+    Builds the context block for the answer prompt from the web / memory / history
+    stage outputs: near-duplicate sentences are dropped across sources, every source
+    is cut to its token budget (at a sentence boundary where possible), and the
+    tokens saved per turn are reported (logged, and accumulated for /usage).
+    """
+
+    def __init__(self, budgets=None):
+        self.budgets = {**CONTEXT_TOKEN_BUDGETS, **(budgets or {})}
+        self.lock = threading.Lock()
+        self.turns = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.duplicates_dropped = 0
+
+    def _source_budgets(self, system_prompt: str):
+        budgets = dict(self.budgets)
+        system_tokens = count_tokens(system_prompt)
+        overflow = system_tokens - budgets["system"]
+        if overflow > 0:
+            logger.warning(f"⚠️ System prompt uses {system_tokens} tokens (budget {budgets['system']}), taking {overflow} from web")
+            budgets["web"] = max(0, budgets["web"] - overflow)
+        return budgets, system_tokens
+
+    def compose(self, parts: dict, system_prompt: str = "") -> str:
+        budgets, system_tokens = self._source_budgets(system_prompt)
+        seen = []
+        sections = []
+        report = {}
+        raw_total = 0
+        duplicates = 0
+
+        for source in SOURCE_ORDER:
+            text = (parts.get(source) or "").strip()
+            if not text:
+                continue
+            raw_tokens = count_tokens(text)
+            raw_total += raw_tokens
+
+            kept, used, dropped = _select(_units(text), budgets[source], seen)
+            duplicates += dropped
+
+            if kept:
+                sections.append(f"{SOURCE_LABELS[source]}:\n{_join_units(kept)}")
+            report[source] = f"{raw_tokens}->{used}"
+
+        composed = "\n\n".join(sections)
+        composed_tokens = count_tokens(composed)
+        saved = max(0, raw_total - composed_tokens)
+
+        with self.lock:
+            self.turns += 1
+            self.tokens_in += raw_total
+            self.tokens_out += composed_tokens
+            self.duplicates_dropped += duplicates
+
+        if raw_total:
+            logger.info(
+                f"✂️ Context tokens {raw_total} -> {composed_tokens} (saved {saved}, "
+                f"{duplicates} duplicate sentence(s), system={system_tokens}) {report}"
+            )
+        return composed
+
+    def stats(self):
+        with self.lock:
+            return {
+                "turns": self.turns,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "tokens_saved": max(0, self.tokens_in - self.tokens_out),
+                "duplicates_dropped": self.duplicates_dropped,
+                "token_counter": "tiktoken" if _get_encoder() else "estimate",
+            }
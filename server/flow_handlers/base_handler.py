@@ -3,6 +3,7 @@
 from abc import ABC, abstractmethod
 from typing import Any, Dict
 from logger_config import get_logger
+import asyncio
 import json
 
 logger = get_logger(__name__)
@@ -26,6 +27,14 @@ class BaseIntentHandler(ABC):
         """
         pass
 
+    async def handle_async(self, user_input: str) -> Dict[str, Any]:
+        """
+        Async entry point used by IntentRouter. Handlers that do network I/O
+        should override this; the default runs handle() in a worker thread so
+        blocking handlers never stall the event loop.
+        """
+        return await asyncio.to_thread(self.handle, user_input)
+
     def update_context(self, updates: Dict[str, Any]) -> None:
         """
         Update the session's context state for multi-turn handling.
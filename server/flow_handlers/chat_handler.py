@@ -1,14 +1,30 @@
 # server/flow_handlers/chat_handler.py
+from ..prosody import text_to_ssml
 
 class ChatHandler:
-    def __init__(self, gpt_client=None, context=None):
+    def __init__(self, gpt_client=None, context=None, analysis=None, speculative=None):
         self.gpt_client = gpt_client
         self.context = context
+        # retrieval flags จาก intent classifier (ถ้ามี) ไม่ต้องวิเคราะห์คำถามซ้ำ
+        self.analysis = analysis
+        # web search ที่ IntentRouter ยิงไว้ล่วงหน้าระหว่าง classify (async เท่านั้น)
+        self.speculative = speculative
 
     def handle(self, user_input: str, context: dict = None):
         context_to_use = context or self.context
-        reply = self.gpt_client.ask(user_voice=user_input)
+        reply = self.gpt_client.ask(user_voice=user_input, analysis=self.analysis)
         return {
             "status": "complete",
-            "reply": reply
-        }
\ No newline at end of file
+            "reply": text_to_ssml(reply)   # LLM ตอบข้อความธรรมดา SSML สร้างที่นี่
+        }
+
+    async def handle_async(self, user_input: str, context: dict = None):
+        reply = await self.gpt_client.ask_async(user_voice=user_input, analysis=self.analysis, speculative=self.speculative)
+        return {
+            "status": "complete",
+            "reply": text_to_ssml(reply)   # LLM ตอบข้อความธรรมดา SSML สร้างที่นี่
+        }
+
+    async def stream_async(self, user_input: str):
+        async for delta in self.gpt_client.ask_stream_async(user_voice=user_input, analysis=self.analysis, speculative=self.speculative):
+            yield delta
@@ -1,40 +1,63 @@
 from .base_handler import BaseIntentHandler
 from .entity_map_ha import parse_command_to_ha_json, get_action_th
 from logger_config import get_logger
-from ..home_assistant_bridge import send_command_to_ha, transform_command_for_ha
+from ..home_assistant_bridge import send_command_to_ha, send_command_to_ha_async, transform_command_for_ha
 from config import HA_URL, HA_TOKEN
 
 logger = get_logger(__name__)
 
+CONFIRMATION_WORDS = ["ใช่", "ใช่แล้ว","ตกลง", "โอเค", "ได้เลย", "yes"]
+CANCELLATION_WORDS = ["ไม่", "ไม่ใช่", "ยกเลิก", "หยุด","no"]
+
 
 class CommandHandler(BaseIntentHandler):
     def __init__(self, session):
         super().__init__(session=session)
         self.pending_command = None    
 
+    def _is_confirmed(self, user_input):
+        return self.session.state == "awaiting_confirmation" and user_input.lower().strip() in CONFIRMATION_WORDS
+
+    def _pending_ha_command(self):
+        ha_command = self.context
+        logger.debug(f"ha_command={ha_command}")
+        if ha_command.get('type') == "home_assistant_command":
+            logger.info(f"Send command to Home Assistant : {ha_command}")
+            return ha_command
+        return None
+
+    def _confirmed_result(self):
+        return {
+            "status": "confirmed",
+            "reply": "ดำเนินการตามคำสั่งแล้วนะ",
+            "action": self.context.get("action"),
+            "next_state": "complete"
+        }
+
     def handle(self, user_input):
         # Check current state from session
         current_state = self.session.state
         logger.debug(f"current_state={current_state}")
-        if current_state == "awaiting_confirmation" :
-            confirmation_words = ["ใช่", "ใช่แล้ว","ตกลง", "โอเค", "ได้เลย", "yes"]
-            cancellation_words = ["ไม่", "ไม่ใช่", "ยกเลิก", "หยุด","no"]
+        if self._is_confirmed(user_input):
+            ha_command = self._pending_ha_command()
+            if ha_command:
+                send_command_to_ha(ha_command, HA_URL, HA_TOKEN)
+            return self._confirmed_result()
+        return self._handle_without_send(user_input)
+
+    async def handle_async(self, user_input):
+        logger.debug(f"current_state={self.session.state}")
+        if self._is_confirmed(user_input):
+            ha_command = self._pending_ha_command()
+            if ha_command:
+                await send_command_to_ha_async(ha_command, HA_URL, HA_TOKEN)
+            return self._confirmed_result()
+        return self._handle_without_send(user_input)
+
+    def _handle_without_send(self, user_input):
+        if self.session.state == "awaiting_confirmation" :
             lowered = user_input.lower()
-            if lowered.strip() in confirmation_words:
-                
-                ha_command = self.context
-                logger.debug(f"ha_command={ha_command}")
-                if ha_command.get('type') == "home_assistant_command":
-                    logger.info(f"Send command to Home Assistant : {ha_command}")
-                    send_command_to_ha(ha_command, HA_URL, HA_TOKEN)
-                
-                return {
-                    "status": "confirmed",
-                    "reply": "ดำเนินการตามคำสั่งแล้วนะ",
-                    "action": self.context.get("action"),
-                    "next_state": "complete"
-                }
-            elif lowered.strip() in cancellation_words:
+            if lowered.strip() in CANCELLATION_WORDS:
                 return {
                     "status": "cancelled",
                     "reply": "ยกเลิกคำสั่งแล้วนะ",
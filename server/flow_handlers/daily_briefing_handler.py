@@ -1,3 +1,4 @@
+import asyncio
 from logger_config import get_logger
 from .news_handler import NewsHandler
 from .weather_handler import WeatherHandler
@@ -6,17 +7,11 @@ from .stock_analysis_handler import StockAnalysisHandler
 logger = get_logger(__name__)
 
 class DailyBriefingHandler:
-    def __init__(self, session):
+    def __init__(self, session, services):
         self.session = session
+        self.services = services
 
-    def handle(self, user_input: str):
-        logger.info(f"[DailyBriefingHandler] 📋 Handling user input: {user_input}")
-
-        # Use actual handlers to fetch data
-        news_result = NewsHandler(self.session).handle("ข่าวเด่นวันนี้")
-        weather_result = WeatherHandler(self.session).handle("สภาพอากาศกรุงเทพ")
-        stock_result = StockAnalysisHandler(self.session).handle("หุ้นที่น่าจับตา")
-
+    def _build_result(self, news_result, weather_result, stock_result):
         news_summary = f"📌 ข่าวเด่น: {news_result.get('message', '')}"
         weather_summary = f"🌤 สภาพอากาศ: {weather_result.get('message', '')}"
         stock_summary = f"📈 หุ้นแนะนำ: {stock_result.get('message', '')}"
@@ -33,4 +28,26 @@ class DailyBriefingHandler:
             "message": full_message
         }
         logger.info(f"[DailyBriefingHandler] ✅ Result: {result}")
-        return result
\ No newline at end of file
+        return result
+
+    def handle(self, user_input: str):
+        logger.info(f"[DailyBriefingHandler] 📋 Handling user input: {user_input}")
+
+        # Use actual handlers to fetch data
+        news_result = NewsHandler(self.session, self.services).handle("ข่าวเด่นวันนี้")
+        weather_result = WeatherHandler(self.session).handle("สภาพอากาศกรุงเทพ")
+        stock_result = StockAnalysisHandler(self.session).handle("หุ้นที่น่าจับตา")
+
+        return self._build_result(news_result, weather_result, stock_result)
+
+    async def handle_async(self, user_input: str):
+        logger.info(f"[DailyBriefingHandler] 📋 Handling user input (async): {user_input}")
+
+        # ข่าว อากาศ และหุ้น ไม่ขึ้นต่อกัน จึงดึงพร้อมกันได้
+        news_result, weather_result, stock_result = await asyncio.gather(
+            NewsHandler(self.session, self.services).handle_async("ข่าวเด่นวันนี้"),
+            WeatherHandler(self.session).handle_async("สภาพอากาศกรุงเทพ"),
+            asyncio.to_thread(StockAnalysisHandler(self.session).handle, "หุ้นที่น่าจับตา"),
+        )
+
+        return self._build_result(news_result, weather_result, stock_result)
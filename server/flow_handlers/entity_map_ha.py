@@ -1,4 +1,8 @@
 # entity_map_ha.py
+import threading
+from pythainlp.corpus.common import thai_words
+from pythainlp.tokenize import word_tokenize
+from pythainlp.util import Trie
 from logger_config import get_logger
 
 logger = get_logger(__name__)
@@ -55,6 +59,56 @@ ACTION_KEYWORDS = {
     "increase": ["เพิ่ม", "เร่ง"],
     "decrease": ["ลด"]
 }
+
+# --- local grammar fast path (ใช้ก่อนเรียก LLM classifier) ---
+LOCAL_COMMAND_MAX_CHARS = 48
+LOCAL_COMMAND_PREFIXES = ["ช่วย", "รบกวน", "ขอ"]
+# คำที่บอกว่าเป็นคำถาม/การตั้งเวลา/เตือน ไม่ใช่คำสั่งให้ทำทันที
+NON_COMMAND_MARKERS = [
+    "ไหม", "มั้ย", "มั๊ย", "หรือเปล่า", "หรือยัง", "?", "อะไร", "ทำไม", "ยังไง", "อย่างไร", "วิธี",
+    "เมื่อไหร่", "กี่", "เท่าไหร่", "เท่าไร", "ถ้า", "หาก", "สมมติ", "ควร", "เปลือง", "ค่าไฟ",
+    "เตือน", "ตอน", "โมง", "นาที", "ทุ่ม", "พรุ่งนี้", "ทุกวัน", "ทั้งคืน", "ตั้งเวลา", "อีก"
+]
+AMBIGUOUS_COMMAND_CONFIDENCE = 0.3   # เจออุปกรณ์/ห้องมากกว่าหนึ่ง -> ให้ LLM ตัดสิน
+
+_tokenizer_dict = None
+_tokenizer_lock = threading.Lock()
+
+
+def _command_keywords():
+    keywords = set(ENTITY_MAP)
+    for locations in ENTITY_MAP.values():
+        for location_key, entity in locations.items():
+            keywords.add(location_key)
+            if isinstance(entity, dict):
+                keywords.update(key for key in entity if key != "_default")
+    for words in ACTION_KEYWORDS.values():
+        keywords.update(words)
+    return keywords
+
+
+def _get_tokenizer_dict():
+    """
+    Default Thai dictionary plus the device/location keywords, minus compounds
+    like "เปิดไฟ" that would hide the device word inside one token.
+    """
+    global _tokenizer_dict
+    if _tokenizer_dict is None:
+        with _tokenizer_lock:
+            if _tokenizer_dict is None:
+                actions = tuple(word for words in ACTION_KEYWORDS.values() for word in words)
+                words = {
+                    word for word in thai_words()
+                    if not (word.startswith(actions) and any(device in word for device in ENTITY_MAP))
+                }
+                _tokenizer_dict = Trie(words | _command_keywords())
+    return _tokenizer_dict
+
+
+def command_tokens(text):
+    return set(word_tokenize(text.lower(), custom_dict=_get_tokenizer_dict(), keep_whitespace=False))
+
+
 # สร้าง reverse mapping จาก action_en → คำไทย
 def get_action_th(ai_action):
     for en_action, th_keywords in ACTION_KEYWORDS.items():
@@ -115,4 +169,44 @@ def parse_command_to_ha_json(text):
                             "entity_id": entity
                         })
                         return result
-    return result
\ No newline at end of file
+    return result
+
+
+def _has_conflicting_actions(text):
+    # "ปิด" เป็น substring ของ "เปิด" จึงต้องตัด "เปิด" ออกก่อนค่อยนับ
+    return "เปิด" in text and "ปิด" in text.replace("เปิด", "")
+
+
+def match_local_command(text):
+    """
+    Deterministic grammar for device commands, run before the LLM classifier.
+    Returns (parsed, confidence); confidence is high only for a short, imperative
+    utterance that resolves to a single entity with no question or scheduling words.
+    """
+    parsed = parse_command_to_ha_json(text)
+    if parsed["type"] != "home_assistant_command":
+        return parsed, 0.0
+
+    # อุปกรณ์/ห้องต้องเป็นคำทั้งคำ ("ไฟ" ใน "ไฟฟ้า", "ทีวี" ใน "มุมทีวี" ไม่นับ) และมีอย่างละหนึ่งเท่านั้น
+    tokens = command_tokens(text)
+    devices = [device for device in ENTITY_MAP if device in tokens]
+    locations = {location for locations in ENTITY_MAP.values() for location in locations if location in tokens}
+    if devices != [parsed["device"]] or len(locations) > 1:
+        logger.debug(f"Local grammar ambiguous: devices={devices}, locations={locations}")
+        return parsed, AMBIGUOUS_COMMAND_CONFIDENCE
+
+    normalized = text.lower().strip()
+    confidence = 0.9
+    if any(normalized.startswith(word) for word in LOCAL_COMMAND_PREFIXES) or \
+            any(normalized.startswith(kw) for keywords in ACTION_KEYWORDS.values() for kw in keywords):
+        confidence += 0.05
+    if parsed.get("location") and ENTITY_MAP[parsed["device"]][parsed["location"]].get("_default") != parsed["entity_id"]:
+        confidence += 0.05  # ระบุจุดย่อยชัดเจน เช่น หัวเตียง
+    if len(normalized) > LOCAL_COMMAND_MAX_CHARS:
+        confidence -= 0.3
+    if any(marker in normalized for marker in NON_COMMAND_MARKERS):
+        confidence -= 0.5
+    if _has_conflicting_actions(normalized):
+        confidence -= 0.5
+
+    return parsed, round(max(0.0, min(confidence, 1.0)), 2)
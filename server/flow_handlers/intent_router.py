@@ -1,3 +1,5 @@
+import asyncio
+import time
 from .command_handler import CommandHandler
 from .reminder_handler import ReminderHandler
 from .chat_handler import ChatHandler
@@ -5,20 +7,30 @@ from .stock_analysis_handler import StockAnalysisHandler
 from .news_handler import NewsHandler
 from .daily_briefing_handler import DailyBriefingHandler
 from .weather_handler import WeatherHandler
-from ..intent_classifier.classifier import IntentClassifier
-from ..gpt_integration import GPTClient
+from .entity_map_ha import match_local_command
+from ..intent_classifier.classifier import analysis_from_result
 from ..session_manager import Session
+from ..service_container import ServiceContainer
 from logger_config import get_logger
 
 logger = get_logger(__name__)
 
+LOCAL_COMMAND_THRESHOLD = 0.85  # ความมั่นใจขั้นต่ำของ local grammar ที่จะข้าม LLM classifier
+
 class IntentRouter:
-    def __init__(self, gpt_client: GPTClient, intent_classifier: IntentClassifier):
-        self.gpt_client = gpt_client
-        self.intent_classifier = intent_classifier
+    def __init__(self, services: ServiceContainer):
+        # handlers get the shared container instead of building their own GPTClient per turn
+        self.services = services
 
-    def route(self, user_input: str, session: Session):
-        result = self.intent_classifier.classify_intent(user_input)
+    @property
+    def gpt_client(self):
+        return self.services.gpt_client
+
+    @property
+    def intent_classifier(self):
+        return self.services.intent_classifier
+
+    def _resolve_intent(self, result, session: Session):
         intent = result.get("intent", "chat")
         confidence = result.get("confidence", 0.0)
 
@@ -26,7 +38,53 @@ class IntentRouter:
             intent = "chat"
 
         session.update(intent=intent)
-        return self._handle_intent(intent, user_input, session)
+        return intent
+
+    def _match_local_command(self, user_input: str):
+        """Fast path: device commands the local grammar resolves confidently skip the LLM classifier."""
+        start = time.perf_counter()
+        parsed, confidence = match_local_command(user_input)
+        if confidence < LOCAL_COMMAND_THRESHOLD:
+            return None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"⚡ Local grammar matched {parsed['entity_id']} (confidence={confidence}, {elapsed_ms:.1f} ms), skipping LLM classifier")
+        return {"intent": "home_command", "confidence": confidence}
+
+    def _classify(self, user_input: str):
+        return self._match_local_command(user_input) or self.intent_classifier.classify_intent(
+            user_input, previous_question=self.gpt_client.previous_question
+        )
+
+    async def _classify_async(self, user_input: str):
+        """
+        Returns (result, speculative). While the classifier LLM call is in flight a
+        speculative web search may already be running for the chat answer.
+        """
+        local_result = self._match_local_command(user_input)
+        if local_result:
+            return local_result, None
+
+        speculative = self.gpt_client.start_speculative_search(user_input)
+        try:
+            result = await self.intent_classifier.classify_intent_async(
+                user_input, previous_question=self.gpt_client.previous_question
+            )
+        except BaseException:
+            self.gpt_client.discard_speculative_search(speculative)
+            raise
+        return result, speculative
+
+    def route(self, user_input: str, session: Session):
+        result = self._classify(user_input)
+        intent = self._resolve_intent(result, session)
+        return self._handle_intent(intent, user_input, session, analysis=analysis_from_result(result))
+
+    async def route_async(self, user_input: str, session: Session):
+        result, speculative = await self._classify_async(user_input)
+        intent = self._resolve_intent(result, session)
+        return await self._handle_intent_async(
+            intent, user_input, session, analysis=analysis_from_result(result), speculative=speculative
+        )
 
     def route_by_state(self, state: str, user_input: str, session: Session):
         if state == "complete":
@@ -37,24 +95,67 @@ class IntentRouter:
         intent = session.intent or "chat"
         return self._handle_intent(intent, user_input, session)
 
-    def _handle_intent(self, intent: str, user_input: str, session: Session):
+    async def route_by_state_async(self, state: str, user_input: str, session: Session):
+        if state == "complete":
+            session.update(intent="chat", state=None, context_update={})
+            return await self._handle_intent_async("chat", user_input, session)
+
+        intent = session.intent or "chat"
+        return await self._handle_intent_async(intent, user_input, session)
+
+    async def route_stream_async(self, user_input: str, session: Session, state: str = None):
+        """
+        Streaming variant of route_async/route_by_state_async.
+        Yields {"type": "delta", "text": ...} while a chat answer is generated,
+        then a final {"type": "result", "result": ...} for every intent.
+        """
+        analysis = None
+        speculative = None
+        if state and state != "complete":
+            intent = session.intent or "chat"
+        else:
+            result, speculative = await self._classify_async(user_input)
+            intent = self._resolve_intent(result, session)
+            analysis = analysis_from_result(result)
+
+        handler = self._create_handler(intent, session, analysis=analysis, speculative=speculative)
+        stream_async = getattr(handler, "stream_async", None)
+        if stream_async:
+            parts = []
+            async for delta in stream_async(user_input):
+                parts.append(delta)
+                yield {"type": "delta", "text": delta}
+            result = {"status": "complete", "reply": "".join(parts).strip()}
+        elif getattr(handler, "handle_async", None):
+            result = await handler.handle_async(user_input)
+        else:
+            result = await asyncio.to_thread(handler.handle, user_input)
+
+        yield {"type": "result", "result": self._apply_result(result, session)}
+
+    def _create_handler(self, intent: str, session: Session, analysis: dict = None, speculative=None):
         logger.info(f"Intent: {intent}")
         if intent == "home_command":
             handler = CommandHandler(session=session)
         elif intent == "reminder":
-            handler = ReminderHandler(session=session)
+            handler = ReminderHandler(session=session, services=self.services)
         elif intent == "stock_analysis":
             handler = StockAnalysisHandler(session=session)
         elif intent == "news_summary":
-            handler = NewsHandler(session=session)
+            handler = NewsHandler(session=session, services=self.services)
         elif intent == "daily_briefing":
-            handler = DailyBriefingHandler(session=session)
+            handler = DailyBriefingHandler(session=session, services=self.services)
         elif intent == "weather":
             handler = WeatherHandler(session=session)
         else:
-            handler = ChatHandler(self.gpt_client)
+            return ChatHandler(self.gpt_client, analysis=analysis, speculative=speculative)
 
-        result = handler.handle(user_input)
+        if speculative is not None:
+            # ไม่ใช่ chat ไม่ต้องใช้ผล web search ที่ยิงไว้ล่วงหน้า
+            self.gpt_client.discard_speculative_search(speculative)
+        return handler
+
+    def _apply_result(self, result, session: Session):
         context_update = {}
         action_data = result.get("action")
         if isinstance(action_data, dict):
@@ -64,4 +165,19 @@ class IntentRouter:
             session.update(state=None, context_update={})
         else:
             session.update(state=result.get("next_state"), context_update=context_update)
-        return result
\ No newline at end of file
+        return result
+
+    def _handle_intent(self, intent: str, user_input: str, session: Session, analysis: dict = None):
+        handler = self._create_handler(intent, session, analysis=analysis)
+        result = handler.handle(user_input)
+        return self._apply_result(result, session)
+
+    async def _handle_intent_async(self, intent: str, user_input: str, session: Session, analysis: dict = None, speculative=None):
+        handler = self._create_handler(intent, session, analysis=analysis, speculative=speculative)
+        handle_async = getattr(handler, "handle_async", None)
+        if handle_async:
+            result = await handle_async(user_input)
+        else:
+            # sync compatibility shim: handlers without handle_async run in a worker thread
+            result = await asyncio.to_thread(handler.handle, user_input)
+        return self._apply_result(result, session)
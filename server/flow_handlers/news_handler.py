@@ -1,49 +1,64 @@
+import asyncio
 import feedparser
 from urllib.parse import quote
 from logger_config import get_logger
-from ..gpt_integration import GPTClient
+from ..async_http import get_async_http_client
 
 logger = get_logger(__name__)
 
 class NewsHandler:
-    def __init__(self, session):
+    def __init__(self, session, services):
         self.session = session
-        self.gpt_client = GPTClient()
-
-    def handle(self, user_input: str):
-        logger.info(f"[NewsHandler] 📰 Handling user input: {user_input}")
+        self.gpt_client = services.gpt_client
 
+    def _rss_sources(self, user_input: str):
         query = quote(user_input)
-        rss_sources = [
+        return [
             f"https://news.google.com/rss/search?q={query}+when:1d&hl=th&gl=TH&ceid=TH:th",
             "https://www.thairath.co.th/rss/news",
             "https://www.bangkokbiznews.com/rss"
         ]
 
+    def _select_headlines(self, user_input: str, feeds):
         headlines = []
         filtered_headlines = []
         keywords = user_input.lower().split()
 
-        for url in rss_sources:
-            feed = feedparser.parse(url)
+        for feed in feeds:
             for entry in feed.entries:
                 title = entry.title.strip()
                 headlines.append(title)
                 if any(kw in title.lower() for kw in keywords):
                     filtered_headlines.append(title)
 
-        top_headlines = filtered_headlines[:5] if filtered_headlines else headlines[:5]
-        bulletized_headlines = "\n".join(f"- {h}" for h in top_headlines)
+        return filtered_headlines[:5] if filtered_headlines else headlines[:5]
 
-        prompt = (
+    def _build_prompt(self, user_input: str, bulletized_headlines: str):
+        return (
             f"ต่อไปนี้คือหัวข้อข่าวที่เกี่ยวข้องกับ \"{user_input}\"\n\n"
             f"{bulletized_headlines}\n\n"
             f"กรุณาสรุปเนื้อหาโดยรวมเป็นภาษาไทย ในรูปแบบ:\n"
             f"- ...\n- ...\n- ...\n\nสรุปภาพรวม: ..."
         )
 
+    def _fallback_result(self, bulletized_headlines: str, top_headlines):
+        summary = "สรุปข่าวเด่น:\n" + bulletized_headlines
+        return {
+            "status": "complete",
+            "message": summary,
+            "news_headlines": top_headlines
+        }
+
+    def handle(self, user_input: str):
+        logger.info(f"[NewsHandler] 📰 Handling user input: {user_input}")
+
+        feeds = [feedparser.parse(url) for url in self._rss_sources(user_input)]
+        top_headlines = self._select_headlines(user_input, feeds)
+        bulletized_headlines = "\n".join(f"- {h}" for h in top_headlines)
+        prompt = self._build_prompt(user_input, bulletized_headlines)
+
         try:
-            summary_text = self.gpt_client.ask_raw(prompt)
+            summary_text = self.gpt_client.ask_raw(prompt, task="summarize_news")
             logger.info(f"[NewsHandler] summary_text: {summary_text}")
             result = {
                 "status": "complete",
@@ -52,12 +67,40 @@ class NewsHandler:
             }
         except Exception as e:
             logger.warning(f"[NewsHandler] ⚠️ GPT summarization failed: {e}")
-            summary = "สรุปข่าวเด่น:\n" + bulletized_headlines
+            result = self._fallback_result(bulletized_headlines, top_headlines)
+
+        logger.info(f"[NewsHandler] ✅ Result: {result}")
+        return result
+
+    async def _fetch_feed_async(self, url: str):
+        try:
+            response = await get_async_http_client().get(url, follow_redirects=True)
+            response.raise_for_status()
+            return feedparser.parse(response.content)
+        except Exception as e:
+            logger.warning(f"[NewsHandler] ⚠️ Failed to fetch feed {url}: {e}")
+            return feedparser.parse(b"")
+
+    async def handle_async(self, user_input: str):
+        logger.info(f"[NewsHandler] 📰 Handling user input (async): {user_input}")
+
+        # ดึง RSS ทุกแหล่งพร้อมกัน แทนการรอทีละแหล่ง
+        feeds = await asyncio.gather(*(self._fetch_feed_async(url) for url in self._rss_sources(user_input)))
+        top_headlines = self._select_headlines(user_input, feeds)
+        bulletized_headlines = "\n".join(f"- {h}" for h in top_headlines)
+        prompt = self._build_prompt(user_input, bulletized_headlines)
+
+        try:
+            summary_text = await self.gpt_client.ask_raw_async(prompt, task="summarize_news")
+            logger.info(f"[NewsHandler] summary_text: {summary_text}")
             result = {
                 "status": "complete",
-                "message": summary,
+                "message": summary_text.strip(),
                 "news_headlines": top_headlines
             }
+        except Exception as e:
+            logger.warning(f"[NewsHandler] ⚠️ GPT summarization failed: {e}")
+            result = self._fallback_result(bulletized_headlines, top_headlines)
 
         logger.info(f"[NewsHandler] ✅ Result: {result}")
         return result
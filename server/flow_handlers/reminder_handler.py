@@ -1,33 +1,16 @@
 from .base_handler import BaseIntentHandler
 from server.prompt_manager import get_prompt_for_intent, IntentType
-from server.gpt_integration import GPTClient
 import json
-import re
 from logger_config import get_logger
 from server.session_manager import session_manager
+from server.llm_schemas import ReminderRequest
 
 logger = get_logger(__name__)
 
 class ReminderHandler(BaseIntentHandler):
-    def __init__(self, session):
+    def __init__(self, session, services):
         super().__init__(session)
-        self.gpt_client = GPTClient()
-    
-    def extract_json(self,response_text: str) -> dict:
-        try:
-            # Adjusted regex to capture JSON objects within the text without recursion
-            json_match = re.search(r'\{(?:[^{}]|(?:))*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                return json.loads(json_str)
-            else:
-                raise ValueError("No valid JSON found in the response")
-        except json.JSONDecodeError as e:
-            logger.error(f"❌ Error decoding JSON: {e}")
-            return {"status": "error", "message": f"Error parsing JSON: {e}"}
-        except Exception as e:
-            logger.error(f"❌ General error in JSON extraction: {e}")
-            return {"status": "error", "message": f"General error: {e}"}
+        self.gpt_client = services.gpt_client
     
     def handle_test(self,response_text: str):
         try:
@@ -53,94 +36,113 @@ class ReminderHandler(BaseIntentHandler):
         except Exception as e:
             logger.error(f"❌ General error: {e}")
 
-    def handle(self, user_input: str):
-        try:
-            current_state = self.session.state
-            if current_state == "awaiting_confirmation":
-                confirmation_words = ["ใช่", "ตกลง", "โอเค", "ได้เลย", "yes"]
-                cancellation_words = ["ไม่", "ไม่ใช่", "ยกเลิก", "หยุด", "no"]
-                lowered = user_input.strip().lower()
-                if lowered in confirmation_words:
-                    self.session.update(state="complete")
-                    return {
-                        "status": "confirmed",
-                        "reply": "บันทึกการเตือนเรียบร้อยแล้ว",
-                        "action": {
-                            "type": "reminder",
-                            "time": self.context.get("time"),
-                            "text": self.context.get("message")
-                        },
-                        "next_state": "complete"
-                    }
-                elif lowered in cancellation_words:
-                    self.session.update(state="complete")
-                    return {
-                        "status": "cancelled",
-                        "reply": "ยกเลิกการสร้างการเตือนแล้ว",
-                        "action": {
-                            "type": "reminder"
-                        },
-                        "next_state": "complete"
-                    }
-                else:
-                    return {
-                        "status": "awaiting_confirmation",
-                        "reply": "กรุณายืนยันว่าใช่หรือไม่",
-                        "action": {
-                            "type": "reminder"
-                        },
-                        "next_state": "awaiing_confirmation"
-                    }
-            prompt = get_prompt_for_intent(IntentType.REMINDER, context=user_input)
-            response_text = self.gpt_client.ask_json(prompt)  # ✅ ให้ return raw text ก่อน parse
-            if isinstance(response_text, dict):
-                parsed = response_text
-            else:
-                # If unexpected, handle as an error (though should not occur if return type is consistent)
-                raise ValueError("Expected the response to be a dictionary")            
-
-            time = parsed.get("time")
-            message = parsed.get("message")
-
-            if not time or not message:
-                missing = []
-                if not time:
-                    missing.append("เวลา")
-                if not message:
-                    missing.append("เนื้อหา")
-                prompt = f"กรุณาระบุ {'และ'.join(missing)} สำหรับการเตือนครับ"
-                return {
-                    "status": "incomplete",
-                    "reply": prompt,
-                    "action": {
-                        "type": "reminder"
-                    },
-                    "next_state": "awaiting_reminder_info",
-                    "context_update": {"partial_input": user_input}
-                }
-
-            self.session.update(state="awaiting_confirmation", context_update={
-                "time": time,
-                "reply": message,
-
-            })
-
+    def _handle_confirmation(self, user_input: str):
+        confirmation_words = ["ใช่", "ตกลง", "โอเค", "ได้เลย", "yes"]
+        cancellation_words = ["ไม่", "ไม่ใช่", "ยกเลิก", "หยุด", "no"]
+        lowered = user_input.strip().lower()
+        if lowered in confirmation_words:
+            self.session.update(state="complete")
             return {
-                "status": "ready",
+                "status": "confirmed",
+                "reply": "บันทึกการเตือนเรียบร้อยแล้ว",
                 "action": {
                     "type": "reminder",
-                    "time": time,
-                    "text": message
+                    "time": self.context.get("time"),
+                    "text": self.context.get("message")
                 },
-                "reply": f"รับทราบ จะเตือนคุณว่า '{message}' เวลา {time} ใช่หรือไม่?",
-                "next_state": "awaiting_confirmation"
+                "next_state": "complete"
+            }
+        elif lowered in cancellation_words:
+            self.session.update(state="complete")
+            return {
+                "status": "cancelled",
+                "reply": "ยกเลิกการสร้างการเตือนแล้ว",
+                "action": {
+                    "type": "reminder"
+                },
+                "next_state": "complete"
+            }
+        else:
+            return {
+                "status": "awaiting_confirmation",
+                "reply": "กรุณายืนยันว่าใช่หรือไม่",
+                "action": {
+                    "type": "reminder"
+                },
+                "next_state": "awaiing_confirmation"
             }
 
-        except Exception as e:
+    def _build_reminder_result(self, response_text, user_input: str):
+        if isinstance(response_text, dict):
+            parsed = response_text
+        else:
+            # If unexpected, handle as an error (though should not occur if return type is consistent)
+            raise ValueError("Expected the response to be a dictionary")            
+
+        time = parsed.get("time")
+        message = parsed.get("message")
+
+        if not time or not message:
+            missing = []
+            if not time:
+                missing.append("เวลา")
+            if not message:
+                missing.append("เนื้อหา")
+            prompt = f"กรุณาระบุ {'และ'.join(missing)} สำหรับการเตือนครับ"
             return {
-                "status": "error",
+                "status": "incomplete",
+                "reply": prompt,
                 "action": {
                     "type": "reminder"
                 },
-                "reply": f"เกิดข้อผิดพลาดในการสกัดข้อมูล: {e}"
-            }
\ No newline at end of file
+                "next_state": "awaiting_reminder_info",
+                "context_update": {"partial_input": user_input}
+            }
+
+        self.session.update(state="awaiting_confirmation", context_update={
+            "time": time,
+            "reply": message,
+
+        })
+
+        return {
+            "status": "ready",
+            "action": {
+                "type": "reminder",
+                "time": time,
+                "text": message
+            },
+            "reply": f"รับทราบ จะเตือนคุณว่า '{message}' เวลา {time} ใช่หรือไม่?",
+            "next_state": "awaiting_confirmation"
+        }
+
+    def _error_result(self, e):
+        return {
+            "status": "error",
+            "action": {
+                "type": "reminder"
+            },
+            "reply": f"เกิดข้อผิดพลาดในการสกัดข้อมูล: {e}"
+        }
+
+    def handle(self, user_input: str):
+        try:
+            if self.session.state == "awaiting_confirmation":
+                return self._handle_confirmation(user_input)
+            prompt = get_prompt_for_intent(IntentType.REMINDER, context=user_input)
+            response_text = self.gpt_client.ask_json(prompt, schema=ReminderRequest)  # ✅ structured output คืน dict ที่ผ่าน schema แล้ว
+            return self._build_reminder_result(response_text, user_input)
+
+        except Exception as e:
+            return self._error_result(e)
+
+    async def handle_async(self, user_input: str):
+        try:
+            if self.session.state == "awaiting_confirmation":
+                return self._handle_confirmation(user_input)
+            prompt = get_prompt_for_intent(IntentType.REMINDER, context=user_input)
+            response_text = await self.gpt_client.ask_json_async(prompt, schema=ReminderRequest)
+            return self._build_reminder_result(response_text, user_input)
+
+        except Exception as e:
+            return self._error_result(e)
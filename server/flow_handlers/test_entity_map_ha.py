@@ -0,0 +1,46 @@
+# server/flow_handlers/test_entity_map_ha.py
+# run: python -m pytest server/flow_handlers/test_entity_map_ha.py
+import pytest
+
+pytest.importorskip("pythainlp")
+from server.flow_handlers.entity_map_ha import match_local_command
+
+# เท่ากับ intent_router.LOCAL_COMMAND_THRESHOLD (import intent_router ต้องมี dependency ของทุก handler)
+LOCAL_COMMAND_THRESHOLD = 0.85
+
+
+@pytest.mark.parametrize("text, entity_id, action", [
+    ("เปิดไฟห้องนอน", "switch.bedroom_main", "turn_on"),
+    ("ช่วยเปิดไฟห้องนอนหน่อย", "switch.bedroom_main", "turn_on"),
+    ("ปิดไฟหัวเตียงห้องนอน", "switch.bedroom_bedside", "turn_off"),
+    ("เปิดไฟมุมทีวีห้องนั่งเล่น", "switch.livingroom_tv_corner", "turn_on"),
+    ("ปิดแอร์ห้องนั่งเล่น", "climate.livingroom_ac", "turn_off"),
+    ("เปิดปลั๊กเครื่องทำน้ำแข็ง", "switch.icemaker_machine_plug", "turn_on"),
+])
+def test_single_entity_command_is_confident(text, entity_id, action):
+    parsed, confidence = match_local_command(text)
+
+    assert confidence >= LOCAL_COMMAND_THRESHOLD
+    assert parsed["entity_id"] == entity_id
+    assert parsed["action"] == action
+
+
+@pytest.mark.parametrize("text", [
+    "ถ้าเปิดแอร์ห้องนอนทั้งคืนจะเปลืองไฟเท่าไหร่",   # คำถาม ไม่ใช่คำสั่ง
+    "เปิดไฟห้องนอนได้ไหม",
+    "เปิดไฟห้องนอนตอนสองทุ่ม",                        # ตั้งเวลา -> reminder/LLM
+    "ปิดแอร์กับไฟห้องนอน",                             # สองอุปกรณ์
+    "ปิดไฟห้องนอนกับห้องนั่งเล่น",                     # สองห้อง
+    "เปิดไฟห้องนอนแล้วปิดแอร์",
+])
+def test_non_command_or_ambiguous_falls_back_to_llm(text):
+    _, confidence = match_local_command(text)
+
+    assert confidence < LOCAL_COMMAND_THRESHOLD
+
+
+def test_no_device_is_not_a_command():
+    parsed, confidence = match_local_command("เปิดเพลงหน่อย")
+
+    assert confidence == 0.0
+    assert parsed["type"] != "home_assistant_command"
@@ -1,6 +1,5 @@
-
-
 from logger_config import get_logger
+from ..async_http import get_async_http_client
 
 logger = get_logger(__name__)
 
@@ -8,42 +7,62 @@ class WeatherHandler:
     def __init__(self, session):
         self.session = session
 
+    def _resolve_city(self, user_input: str):
+        # Default to Bangkok if no city found in user input
+        city = "Bangyai"
+        if "เชียงใหม่" in user_input:
+            city = "Chiang Mai"
+        elif "ภูเก็ต" in user_input:
+            city = "Phuket"
+        elif "กรุงเทพ" in user_input:
+            city = "Bangkok"
+        return city
+
+    def _weather_url(self, city: str):
+        # TODO: Replace with your actual OpenWeatherMap API key
+        api_key = "YOUR_OPENWEATHERMAP_API_KEY"
+        return f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric&lang=th"
+
+    def _build_result(self, status_code, data, city):
+        logger.info(f"[WeatherHandler] 🌐 Weather API response: {data}")
+
+        if status_code == 200:
+            weather_desc = data["weather"][0]["description"]
+            temp = data["main"]["temp"]
+            humidity = data["main"]["humidity"]
+            summary = f"สภาพอากาศที่ {city} ตอนนี้: {weather_desc}, อุณหภูมิ {temp}°C, ความชื้น {humidity}%"
+            return {"status": "complete", "message": summary}
+
+        logger.warning(f"[WeatherHandler] ❌ Weather API error: {data}")
+        return {"status": "complete", "message": f"ขออภัย ไม่สามารถตรวจสอบอากาศที่ {city} ได้ในขณะนี้"}
+
     def handle(self, user_input: str):
         import requests
         logger.info(f"[WeatherHandler] ⛅ Handling user input: {user_input}")
 
-        # TODO: Replace with your actual OpenWeatherMap API key
-        api_key = "YOUR_OPENWEATHERMAP_API_KEY"
+        try:
+            city = self._resolve_city(user_input)
+            response = requests.get(self._weather_url(city))
+            result = self._build_result(response.status_code, response.json(), city)
+
+        except Exception as e:
+            logger.error(f"[WeatherHandler] ❌ Exception: {e}")
+            result = {"status": "complete", "message": "เกิดข้อผิดพลาดระหว่างตรวจสอบสภาพอากาศ"}
+
+        logger.info(f"[WeatherHandler] ✅ Result: {result}")
+        return result
+
+    async def handle_async(self, user_input: str):
+        logger.info(f"[WeatherHandler] ⛅ Handling user input (async): {user_input}")
 
         try:
-            # Default to Bangkok if no city found in user input
-            city = "Bangyai"
-            if "เชียงใหม่" in user_input:
-                city = "Chiang Mai"
-            elif "ภูเก็ต" in user_input:
-                city = "Phuket"
-            elif "กรุงเทพ" in user_input:
-                city = "Bangkok"
-
-            url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric&lang=th"
-            response = requests.get(url)
-            data = response.json()
-
-            logger.info(f"[WeatherHandler] 🌐 Weather API response: {data}")
-
-            if response.status_code == 200:
-                weather_desc = data["weather"][0]["description"]
-                temp = data["main"]["temp"]
-                humidity = data["main"]["humidity"]
-                summary = f"สภาพอากาศที่ {city} ตอนนี้: {weather_desc}, อุณหภูมิ {temp}°C, ความชื้น {humidity}%"
-                result = {"status": "complete", "message": summary}
-            else:
-                logger.warning(f"[WeatherHandler] ❌ Weather API error: {data}")
-                result = {"status": "complete", "message": f"ขออภัย ไม่สามารถตรวจสอบอากาศที่ {city} ได้ในขณะนี้"}
+            city = self._resolve_city(user_input)
+            response = await get_async_http_client().get(self._weather_url(city))
+            result = self._build_result(response.status_code, response.json(), city)
 
         except Exception as e:
             logger.error(f"[WeatherHandler] ❌ Exception: {e}")
             result = {"status": "complete", "message": "เกิดข้อผิดพลาดระหว่างตรวจสอบสภาพอากาศ"}
 
         logger.info(f"[WeatherHandler] ✅ Result: {result}")
-        return result
\ No newline at end of file
+        return result
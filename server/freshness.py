@@ -0,0 +1,70 @@
+# server/freshness.py
+import re
+
+# คำที่บ่งบอกว่าคำถามต้องการข้อมูลสด (ใช้ตัดสินใจยิง web search ล่วงหน้า)
+FRESHNESS_KEYWORDS = [
+    "ล่าสุด", "วันนี้", "เมื่อวาน", "เมื่อคืน", "พรุ่งนี้", "ตอนนี้", "ขณะนี้", "ปัจจุบัน", "สัปดาห์นี้", "เดือนนี้", "ปีนี้",
+    "ราคา", "ค่าเงิน", "อัตราแลกเปลี่ยน", "ทองคำ", "น้ำมัน", "หุ้น", "ดัชนี", "set index",
+    "ผลบอล", "ผลการแข่งขัน", "สกอร์", "คะแนน", "ใครชนะ", "ข่าว", "อัปเดต", "อัพเดท", "เลือกตั้ง",
+    "latest", "today", "yesterday", "tonight", "now", "current", "price", "score", "news", "update",
+]
+
+
+def _keyword_pattern(keywords):
+    # คำไทยไม่มีช่องว่างคั่น จึงเทียบแบบ substring; คำอังกฤษต้องเป็นคำทั้งคำ ("now" ใน "know" ไม่นับ)
+    parts = [
+        rf"\b{re.escape(keyword)}s?\b" if keyword.isascii() else re.escape(keyword)
+        for keyword in keywords
+    ]
+    return re.compile("|".join(parts))
+
+
+FRESHNESS_PATTERN = _keyword_pattern(FRESHNESS_KEYWORDS)
+
+THAI_MONTHS = [
+    "มกราคม", "กุมภาพันธ์", "มีนาคม", "เมษายน", "พฤษภาคม", "มิถุนายน",
+    "กรกฎาคม", "สิงหาคม", "กันยายน", "ตุลาคม", "พฤศจิกายน", "ธันวาคม",
+    "ม.ค.", "ก.พ.", "มี.ค.", "เม.ย.", "พ.ค.", "มิ.ย.", "ก.ค.", "ส.ค.", "ก.ย.", "ต.ค.", "พ.ย.", "ธ.ค.",
+]
+
+DATE_PATTERN = re.compile(
+    r"\b(19|20)\d{2}\b"                 # ค.ศ.
+    r"|\b25\d{2}\b"                     # พ.ศ.
+    r"|\b\d{1,2}[/-]\d{1,2}([/-]\d{2,4})?\b"
+)
+
+
+def needs_fresh_data(text: str) -> bool:
+    """Cheap local guess that answering needs a web search (dates, ล่าสุด/วันนี้, prices, scores)."""
+    lowered = str(text).lower()
+    if FRESHNESS_PATTERN.search(lowered):
+        return True
+    if any(month in lowered for month in THAI_MONTHS):
+        return True
+    return bool(DATE_PATTERN.search(lowered))
+
+
+# อายุ cache ของผลค้นหาตามประเภทคำถาม: ราคา/สกอร์เปลี่ยนทุกไม่กี่นาที, ข่าว/วันที่เปลี่ยนรายชั่วโมง, เรื่องทั่วไปเป็นวัน
+FRESHNESS_TTL_SEC = {
+    "live": 5 * 60,
+    "daily": 2 * 3600,
+    "evergreen": 3 * 24 * 3600,
+}
+
+LIVE_KEYWORDS = [
+    "ราคา", "ค่าเงิน", "อัตราแลกเปลี่ยน", "ทองคำ", "น้ำมัน", "หุ้น", "ดัชนี", "set index",
+    "ผลบอล", "สกอร์", "ตอนนี้", "ขณะนี้", "now", "price", "score",
+]
+LIVE_PATTERN = _keyword_pattern(LIVE_KEYWORDS)
+
+
+def freshness_class(text: str) -> str:
+    """"live" (prices, scores, ตอนนี้), "daily" (anything else time-sensitive) or "evergreen"."""
+    lowered = str(text).lower()
+    if LIVE_PATTERN.search(lowered):
+        return "live"
+    return "daily" if needs_fresh_data(lowered) else "evergreen"
+
+
+def freshness_ttl(text: str) -> int:
+    return FRESHNESS_TTL_SEC[freshness_class(text)]
@@ -1,21 +1,28 @@
 # gpt_integration.py (refactored with structured context support)
 
-import openai
+import asyncio
 import time
 import re
 import json
 import os
 import sys
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import partial
 from .entry_map_ha import ENTITY_MAP
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from config import OPENAI_API_KEY, OPENAI_MODEL, SYSTEM_TONE, HA_URL, HA_TOKEN
+from config import OPENAI_MODEL, SYSTEM_TONE, HA_URL, HA_TOKEN
 from .chat_manager import ChatManager
 from .memory_manager import MemoryManager
 from .search_manager import SearchManager
 from .background_summarizer import MemoryBackgroundSummarizer, HistoryBackgroundSummarizer
+from .freshness import needs_fresh_data
+from .context_composer import ContextComposer
+from .llm_gateway import get_llm_gateway
+from .usage_tracker_instance import usage_tracker
 
 from logger_config import get_logger
 from latency_logger import LatencyLogger
@@ -27,6 +34,12 @@ HA_HEADERS = {
     "Content-Type": "application/json"
 }
 
+# context stages (web / memory / history) รันพร้อมกัน ภายใต้ budget ของ turn
+CONTEXT_BUDGET_SEC = 6.0
+STAGE_TIMEOUTS_SEC = {"web": 5.5, "memory": 1.0, "history": 1.0}
+# pool ของ sync context stages แยกจาก self.executor: stage ที่เกินเวลาแล้วยังทำงานต่อจะไม่แย่ง worker ของ speculative search
+CONTEXT_STAGE_WORKERS = 6
+
 CMD_ACTION_MAP = {
     "turn_on": "เปิด",
     "turn_off": "ปิด",
@@ -38,10 +51,8 @@ CMD_ACTION_MAP = {
 class GPTClient:
     def __init__(self, api_key: str = None, model: str = OPENAI_MODEL):
         logger.info("GPTClient initialized")
-        self.api_key = OPENAI_API_KEY
         self.model = model
-        openai.api_key = self.api_key
-        self.client = openai
+        self.llm = get_llm_gateway()
 
         self.conversation_active = False
         self.previous_question = None
@@ -52,6 +63,16 @@ class GPTClient:
         self.search_manager = SearchManager(self)        
         self.memory_summarizer = MemoryBackgroundSummarizer(memory_manager=self.memory_manager  )
         self.history_summarizer = HistoryBackgroundSummarizer(memory_manager=self.memory_manager)
+
+        # speculative web search: ยิง Serper พร้อมกับการวิเคราะห์คำถาม ถ้า heuristic บอกว่าน่าจะต้องใช้ข้อมูลสด
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gpt-client")
+        self.stage_executor = ThreadPoolExecutor(max_workers=CONTEXT_STAGE_WORKERS, thread_name_prefix="context-stage")
+        self.speculation_stats = {"started": 0, "hits": 0, "wasted": 0}
+        self._speculation_lock = threading.Lock()   # นับจาก event loop, worker ของ to_thread และ stage pool
+        usage_tracker.register_stats("speculative_search", self.get_speculation_stats)
+
+        self.context_composer = ContextComposer()
+        usage_tracker.register_stats("context_composer", self.context_composer.stats)
  
     def stop(self):
         self.memory_summarizer.stop()
@@ -86,75 +107,121 @@ class GPTClient:
             context += f"{role.capitalize()}: {summary}\n"
         return context.strip()
     # เพิ่มใน gpt_integration.py
-    def ask_json(self, prompt: str):
+    def ask_json(self, prompt: str, schema=None):
         try:
-            result = self.chat_manager.ask_json_only(prompt)
+            result = self.chat_manager.ask_json_only(prompt, schema=schema)
             return result
         except Exception as e:
             logger.error(f"❌ ask_json failed: {e}")
             raise
 
-    def ask(self, user_voice: str) -> str:
+    async def ask_json_async(self, prompt: str, schema=None):
         try:
-            self.tracker = LatencyLogger()
-            logger.info(f"User question:{user_voice}")
-            self.tracker.mark("analyze_question_all_in_one - start")
-            analysis = self.chat_manager.analyze_question_all_in_one(
-                current_question=user_voice,
-                previous_question=self.previous_question
-            )
+            return await self.chat_manager.ask_json_only_async(prompt, schema=schema)
+        except Exception as e:
+            logger.error(f"❌ ask_json_async failed: {e}")
+            raise
 
-            need_web = analysis.get("need_web_search", "No") == "Yes"
-            need_memory = analysis.get("need_memory", "No") == "Yes"
-            need_history = analysis.get("need_conversation_history", "No") == "Yes"
+    def _count_speculation(self, key: str):
+        with self._speculation_lock:
+            self.speculation_stats[key] += 1
 
-            logger.info(f"📊 Analysis: need_web={need_web}, need_memory={need_memory}, need_history={need_history}")
-            self.tracker.mark("analyze_question_all_in_one - done")
+    def get_speculation_stats(self):
+        with self._speculation_lock:
+            stats = dict(self.speculation_stats)
+        resolved = stats["hits"] + stats["wasted"]
+        stats["hit_rate"] = round(stats["hits"] / resolved, 3) if resolved else 0.0
+        return stats
 
-            context_parts = []
+    def start_speculative_search(self, user_voice: str):
+        """Fire the web search now (asyncio task) if the question looks like it needs fresh data."""
+        if not needs_fresh_data(user_voice):
+            return None
+        self._count_speculation("started")
+        logger.info("🔮 Speculative web search started")
+        return asyncio.create_task(self.search_manager.search_dual_language_async(user_voice, top_k=10))
 
-            if need_web:
-                self.tracker.mark("searching web - start")
-                logger.info("🌐 Searching web...")
-                search_results = self.search_manager.search_dual_language(user_voice, top_k=10)
-                self.tracker.mark("searching_dual_lang")
-                logger.debug(f"search_result={search_results}")
-                search_context = self.search_manager.build_context_from_search_results(search_results,enable_fetch=False)
-                self.tracker.mark("build_context_from_search_results")
-                summarized_context = self.search_manager.summarize_web_context(search_context, user_voice)
-                self.tracker.mark("summarize_web_context")
-                context_parts.append(summarized_context)
-                logger.info(f"Searching web...done : {summarized_context}")
-                self.tracker.mark("searching web - done")
+    def discard_speculative_search(self, speculative):
+        """The turn turned out not to need the web: cancel (task) or ignore (future) the search."""
+        if speculative is None:
+            return
+        self._count_speculation("wasted")
+        logger.info("🗑️ Speculative web search discarded")
+        if not speculative.done():
+            speculative.cancel()
+        elif not speculative.cancelled():
+            speculative.exception()  # mark as retrieved, a failed search here is not an error
 
-            if need_memory:
-                logger.info("🧠 Loading memory...")
-                recent_memories = self.memory_manager.get_recent_memories(limit=5)
-                memory_text = "\n".join([f"{role.capitalize()}: {summary}" for role, summary in reversed(recent_memories)])
-                context_parts.append(memory_text)    
-                # logger.info("🧠 Summarizing memory...")
-                # recent_memories = self.memory_manager.get_recent_memories(limit=10)
-                # summary = self.chat_manager.summarize_memories(recent_memories)
-                # context_parts.append(f"💭 ความทรงจำล่าสุด:\n{summary}")
-                
-            if need_history:
-                # logger.info("🗣️ Loading conversation history...")
-                # history_text = self.get_conversation_history(limit=5)
-                # context_parts.append(history_text)
+    async def _search_web_async(self, user_voice: str, speculative=None):
+        if speculative is not None:
+            try:
+                results = await speculative
+                self._count_speculation("hits")
+                logger.info("🔮 Using speculative web search results")
+                return results
+            except asyncio.CancelledError:
+                # web stage หมดเวลา
+                self._count_speculation("wasted")
+                raise
+            except Exception as e:
+                self._count_speculation("wasted")
+                logger.warning(f"⚠️ Speculative web search failed, searching again: {e}")
+        return await self.search_manager.search_dual_language_async(user_voice, top_k=10)
+
+    def _search_web(self, user_voice: str, speculative=None):
+        if speculative is not None:
+            try:
+                results = speculative.result()
+                self._count_speculation("hits")
+                logger.info("🔮 Using speculative web search results")
+                return results
+            except Exception as e:
+                self._count_speculation("wasted")
+                logger.warning(f"⚠️ Speculative web search failed, searching again: {e}")
+        return self.search_manager.search_dual_language(user_voice, top_k=10)
+
+    def _analysis_flags(self, analysis: dict):
+        need_web = analysis.get("need_web_search", "No") == "Yes"
+        need_memory = analysis.get("need_memory", "No") == "Yes"
+        need_history = analysis.get("need_conversation_history", "No") == "Yes"
+        logger.info(f"📊 Analysis: need_web={need_web}, need_memory={need_memory}, need_history={need_history}")
+        return need_web, need_memory, need_history
 
-                logger.info("🗣️ Loading conversation history...")
-                history_summary = self.memory_manager.get_latest_history_summary()
-                if history_summary:
-                    context_parts.append(f"📘 ประวัติย่อ: {history_summary}")
-                else:
-                    full_history = self.get_conversation_history(limit=5)
-                    context_parts.append(full_history)
-                    
+    def ask(self, user_voice: str, analysis: dict = None) -> str:
+        """
+        analysis: retrieval flags already produced by the combined intent classifier
+        call; when given, the separate analyze_question_all_in_one round trip is skipped.
+        """
+        speculative = None
+        try:
+            self.tracker = LatencyLogger()
+            logger.info(f"User question:{user_voice}")
+            if analysis is None:
+                if needs_fresh_data(user_voice):
+                    self._count_speculation("started")
+                    logger.info("🔮 Speculative web search started")
+                    speculative = self.executor.submit(self.search_manager.search_dual_language, user_voice, 10)
+                self.tracker.mark("analyze_question_all_in_one - start")
+                analysis = self.chat_manager.analyze_question_all_in_one(
+                    current_question=user_voice,
+                    previous_question=self.previous_question
+                )
+                self.tracker.mark("analyze_question_all_in_one - done")
+            else:
+                logger.info("📊 Using analysis from intent classifier")
 
-            full_context = "\n\n".join(context_parts).strip()
+            need_web, need_memory, need_history = self._analysis_flags(analysis)
 
-            if not full_context:
-                logger.info("🚀 No extra context needed.")
+            stages = {}
+            stages_cancelled = threading.Event()
+            if need_web:
+                stages["web"] = partial(self._web_context, user_voice, speculative, cancelled=stages_cancelled)
+                speculative = None  # web stage เป็นเจ้าของแล้ว
+            if need_memory:
+                stages["memory"] = self._memory_context
+            if need_history:
+                stages["history"] = self._history_context
+            full_context = self._join_context(self._run_context_stages(stages, self.tracker, stages_cancelled))
 
             self.tracker.mark("asking chatGPT - start")
             logger.info("Asking ChatGPT...")
@@ -163,22 +230,254 @@ class GPTClient:
             self.tracker.mark("asking chatGPT - done")
             self.last_interaction_time = time.time()
 
-            self.memory_manager.add_message("user", user_voice)
-            self.memory_manager.add_message("assistant", answer)
+            self._remember_turn(user_voice, answer)
 
-   
             self.tracker.report()
             self.previous_question = user_voice
             return answer
 
         except Exception as e:
-            print(f"❌ GPT Error: {e}")
+            logger.error(f"❌ GPT Error: {e}", exc_info=True)
             return "ขอโทษค่ะ เกิดข้อผิดพลาดในการประมวลผลคำถาม"
+        finally:
+            self.discard_speculative_search(speculative)
+
+    def _memory_context(self):
+        logger.info("🧠 Loading memory...")
+        recent_memories = self.memory_manager.get_recent_memories(limit=5)
+        return "\n".join([f"{role.capitalize()}: {summary}" for role, summary in reversed(recent_memories)])
+
+    def _history_context(self):
+        logger.info("🗣️ Loading conversation history...")
+        history_summary = self.memory_manager.get_latest_history_summary()
+        if history_summary:
+            return f"📘 ประวัติย่อ: {history_summary}"
+        return self.get_conversation_history(limit=5)
+
+    def _web_context(self, user_voice: str, speculative=None, cancelled: threading.Event = None):
+        """cancelled: set when the stage is past its deadline; checked before each expensive step."""
+        logger.info("🌐 Searching web...")
+        search_results = self._search_web(user_voice, speculative)
+        logger.debug(f"search_result={search_results}")
+        direct_answer = self.search_manager.direct_answer(search_results, user_voice)
+        if direct_answer:
+            # answerBox/knowledgeGraph ตอบได้แล้ว ไม่ต้องเรียก LLM สรุปผลค้นหาอีกรอบ
+            return direct_answer
+        if cancelled is not None and cancelled.is_set():
+            # คำตอบถูกส่งไปแล้วโดยไม่มี web context ไม่ต้องเสีย LLM call สรุปผลค้นหา
+            logger.info("🛑 Web stage past its deadline, skipping summarization")
+            return None
+        search_context = self.search_manager.build_context_from_search_results(search_results, enable_fetch=False)
+        summarized_context = self.search_manager.summarize_web_context(search_context, user_voice)
+        logger.info(f"Searching web...done : {summarized_context}")
+        return summarized_context
+
+    async def _web_context_async(self, user_voice: str, speculative=None):
+        logger.info("🌐 Searching web...")
+        search_results = await self._search_web_async(user_voice, speculative)
+        logger.debug(f"search_result={search_results}")
+        direct_answer = self.search_manager.direct_answer(search_results, user_voice)
+        if direct_answer:
+            # answerBox/knowledgeGraph ตอบได้แล้ว ไม่ต้องเรียก LLM สรุปผลค้นหาอีกรอบ
+            return direct_answer
+        search_context = self.search_manager.build_context_from_search_results(search_results, enable_fetch=False)
+        summarized_context = await self.search_manager.summarize_web_context_async(search_context, user_voice)
+        logger.info(f"Searching web...done : {summarized_context}")
+        return summarized_context
+
+    def _join_context(self, parts: dict) -> str:
+        system_prompt = self.chat_manager.get_system_prompt(self.chat_manager.tone)
+        full_context = self.context_composer.compose(parts, system_prompt=system_prompt).strip()
+        if not full_context:
+            logger.info("🚀 No extra context needed.")
+        return full_context
+
+    def _run_stage(self, name, fn, tracker: LatencyLogger, cancelled: threading.Event):
+        if cancelled.is_set():
+            return None   # หมดเวลาก่อนได้ worker
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            tracker.record(f"context:{name}", time.perf_counter() - start)
+
+    def _run_context_stages(self, stages: dict, tracker: LatencyLogger, cancelled: threading.Event = None) -> dict:
+        """
+        Run the context stages concurrently on the dedicated stage pool. Each stage
+        gets its own timeout (measured from the common start) capped by
+        CONTEXT_BUDGET_SEC; whatever finished in time is returned, late or failed
+        stages are dropped.
+
+        A running thread cannot be stopped, so cancellation is cooperative: on
+        return `cancelled` is set, stages that have not started yet return at
+        once and the web stage skips its summarization call (see _web_context).
+        The pool is separate from self.executor so late stages never delay a
+        speculative search.
+        """
+        cancelled = cancelled or threading.Event()
+        started = time.perf_counter()
+        futures = {
+            name: self.stage_executor.submit(self._run_stage, name, fn, tracker, cancelled)
+            for name, fn in stages.items()
+        }
+        parts = {}
+        try:
+            for name, future in futures.items():
+                deadline = min(STAGE_TIMEOUTS_SEC.get(name, CONTEXT_BUDGET_SEC), CONTEXT_BUDGET_SEC)
+                remaining = max(0.0, deadline - (time.perf_counter() - started))
+                try:
+                    parts[name] = future.result(timeout=remaining)
+                except FutureTimeoutError:
+                    future.cancel()
+                    logger.warning(f"⏱️ Context stage '{name}' timed out after {deadline}s, skipping")
+                except Exception as e:
+                    logger.warning(f"⚠️ Context stage '{name}' failed: {e}")
+        finally:
+            cancelled.set()
+        return parts
+
+    async def _run_stage_async(self, name, coro, tracker: LatencyLogger):
+        start = time.perf_counter()
+        timeout = STAGE_TIMEOUTS_SEC.get(name, CONTEXT_BUDGET_SEC)
+        try:
+            return await asyncio.wait_for(coro, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ Context stage '{name}' timed out after {timeout}s, skipping")
+        except Exception as e:
+            logger.warning(f"⚠️ Context stage '{name}' failed: {e}")
+        finally:
+            tracker.record(f"context:{name}", time.perf_counter() - start)
+        return None
+
+    async def _run_context_stages_async(self, stages: dict, tracker: LatencyLogger) -> dict:
+        """Async counterpart of _run_context_stages: stages run as concurrent tasks."""
+        if not stages:
+            return {}
+        tasks = {name: asyncio.create_task(self._run_stage_async(name, coro, tracker)) for name, coro in stages.items()}
+        try:
+            done, pending = await asyncio.wait(tasks.values(), timeout=CONTEXT_BUDGET_SEC)
+        except asyncio.CancelledError:
+            # turn ถูกยกเลิก (/cancel หรือ client ตัดการเชื่อมต่อ): หยุด search/fetch/summarize ที่ค้างอยู่ด้วย
+            for task in tasks.values():
+                task.cancel()
+            raise
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"⏱️ Context budget {CONTEXT_BUDGET_SEC}s exceeded, dropping {len(pending)} stage(s)")
+        return {name: task.result() for name, task in tasks.items() if task in done}
 
-    def ask_raw(self, prompt: str):
+    def ask_raw(self, prompt: str, task: str = "general"):
         try:
-            result = self.chat_manager.ask_plain_response(prompt)
+            result = self.chat_manager.ask_plain_response(prompt, task=task)
             return result
         except Exception as e:
             logger.error(f"❌ ask_raw failed: {e}")
             raise
+
+    async def ask_raw_async(self, prompt: str, task: str = "general"):
+        try:
+            return await self.chat_manager.ask_plain_response_async(prompt, task=task)
+        except Exception as e:
+            logger.error(f"❌ ask_raw_async failed: {e}")
+            raise
+
+    async def _gather_context_async(self, user_voice: str, tracker: LatencyLogger, analysis: dict = None, speculative=None) -> str:
+        """
+        speculative: web search task already started by the caller (IntentRouter starts
+        one alongside intent classification). It is used if the analysis says
+        need_web_search, otherwise cancelled.
+        """
+        try:
+            if analysis is None:
+                speculative = speculative or self.start_speculative_search(user_voice)
+                tracker.mark("analyze_question_all_in_one - start")
+                analysis = await self.chat_manager.analyze_question_all_in_one_async(
+                    current_question=user_voice,
+                    previous_question=self.previous_question
+                )
+                tracker.mark("analyze_question_all_in_one - done")
+            else:
+                logger.info("📊 Using analysis from intent classifier")
+
+            need_web, need_memory, need_history = self._analysis_flags(analysis)
+        except BaseException:
+            self.discard_speculative_search(speculative)
+            raise
+
+        if not need_web:
+            self.discard_speculative_search(speculative)
+
+        stages = {}
+        if need_web:
+            stages["web"] = self._web_context_async(user_voice, speculative)
+        if need_memory:
+            stages["memory"] = asyncio.to_thread(self._memory_context)
+        if need_history:
+            stages["history"] = asyncio.to_thread(self._history_context)
+        return self._join_context(await self._run_context_stages_async(stages, tracker))
+
+    async def ask_async(self, user_voice: str, analysis: dict = None, speculative=None) -> str:
+        """
+        Non-blocking version of ask() for the FastAPI event loop.
+        LLM and Serper calls are awaited; SQLite access runs in a worker thread.
+        """
+        try:
+            tracker = LatencyLogger()
+            logger.info(f"User question:{user_voice}")
+            full_context = await self._gather_context_async(user_voice, tracker, analysis, speculative)
+
+            tracker.mark("asking chatGPT - start")
+            logger.info("Asking ChatGPT...")
+            answer = await self.chat_manager.ask_gpt_with_context_async(user_voice, context=full_context)
+            logger.info("ChatGPT: %s", answer)
+            tracker.mark("asking chatGPT - done")
+            self.last_interaction_time = time.time()
+
+            await asyncio.to_thread(self._remember_turn, user_voice, answer)
+
+            tracker.report()
+            self.previous_question = user_voice
+            return answer
+
+        except Exception as e:
+            logger.error(f"❌ GPT Error: {e}", exc_info=True)
+            return "ขอโทษค่ะ เกิดข้อผิดพลาดในการประมวลผลคำถาม"
+
+    async def ask_stream_async(self, user_voice: str, analysis: dict = None, speculative=None):
+        """
+        Same pipeline as ask_async() but yields the answer as it is generated,
+        so TTS can start on the first sentence.
+        """
+        tracker = LatencyLogger()
+        parts = []
+        try:
+            logger.info(f"User question (stream):{user_voice}")
+            full_context = await self._gather_context_async(user_voice, tracker, analysis, speculative)
+
+            tracker.mark("streaming chatGPT - start")
+            async for delta in self.chat_manager.stream_gpt_with_context_async(user_voice, context=full_context):
+                if not parts:
+                    tracker.mark("streaming chatGPT - first token")
+                parts.append(delta)
+                yield delta
+            tracker.mark("streaming chatGPT - done")
+
+        except Exception as e:
+            logger.error(f"❌ GPT Stream Error: {e}")
+            if not parts:
+                fallback = "ขอโทษค่ะ เกิดข้อผิดพลาดในการประมวลผลคำถาม"
+                parts.append(fallback)
+                yield fallback
+            return
+
+        answer = "".join(parts).strip()
+        logger.info("ChatGPT (stream): %s", answer)
+        self.last_interaction_time = time.time()
+        await asyncio.to_thread(self._remember_turn, user_voice, answer)
+        tracker.report()
+        self.previous_question = user_voice
+
+    def _remember_turn(self, user_voice: str, answer: str):
+        self.memory_manager.add_message("user", user_voice)
+        self.memory_manager.add_message("assistant", answer)
@@ -4,6 +4,7 @@ from logger_config import get_logger
 logger = get_logger(__name__)
 
 import requests
+from .async_http import get_async_http_client
 
 def transform_command_for_ha(command):
     action_map = {
@@ -29,28 +30,38 @@ def transform_command_for_ha(command):
         "extra": extra
     }
 
-def send_command_to_ha(command_json, ha_url, ha_token):
-    try:
-
-        headers = {
-            "Authorization": f"Bearer {ha_token}",
-            "Content-Type": "application/json"
-        }
+def _build_ha_request(command_json, ha_url, ha_token):
+    headers = {
+        "Authorization": f"Bearer {ha_token}",
+        "Content-Type": "application/json"
+    }
 
-        action = command_json["action"]
-        entity_id = command_json["entity_id"]
-        extra = command_json.get("extra", {})
-        
+    action = command_json["action"]
+    entity_id = command_json["entity_id"]
 
-        payload = {
-            "entity_id": entity_id        
-        }
+    payload = {
+        "entity_id": entity_id        
+    }
+    return f"{ha_url}/api/services/homeassistant/{action}", headers, payload
 
-        response = requests.post(f"{ha_url}/api/services/homeassistant/{action}", headers=headers, json=payload)
+def send_command_to_ha(command_json, ha_url, ha_token):
+    try:
+        url, headers, payload = _build_ha_request(command_json, ha_url, ha_token)
+        response = requests.post(url, headers=headers, json=payload)
         logger.debug(f"send_command_to_ha: response = {response}")
         return response.status_code == 200
     except Exception as e:
         print(f"❌ Error sending command to Home Assistant: {e}")
         return False
 
+async def send_command_to_ha_async(command_json, ha_url, ha_token):
+    try:
+        url, headers, payload = _build_ha_request(command_json, ha_url, ha_token)
+        response = await get_async_http_client().post(url, headers=headers, json=payload)
+        logger.debug(f"send_command_to_ha_async: response = {response}")
+        return response.status_code == 200
+    except Exception as e:
+        logger.error(f"❌ Error sending command to Home Assistant: {e}")
+        return False
+
     
\ No newline at end of file
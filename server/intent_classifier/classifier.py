@@ -1,124 +1,209 @@
+import json
+import threading
+import time
 from typing import Dict
-from openai import OpenAI
-from .intent_definitions import INTENT_DEFINITIONS
-from config import OPENAI_API_KEY, OPENAI_MODEL
+from .intent_definitions import INTENT_DEFINITIONS, ROUTER_INTENT_DESCRIPTIONS, ROUTER_INTENT_EXAMPLES
+from .local_model import LocalIntentModel, DEFAULT_MODEL_PATH, INTENT_LOG_PATH
+from ..text_normalizer import normalize_utterance
+from ..ttl_cache import PersistentTTLCache
+from ..usage_tracker_instance import usage_tracker
+from ..llm_gateway import get_llm_gateway
+from ..llm_schemas import IntentClassification
+import config
 from logger_config import get_logger
 
 logger = get_logger(__name__)
 
+# ตั้งใน config.py ได้ (optional) ถ้าไม่ตั้งใช้ค่า default
+LOCAL_INTENT_THRESHOLD = getattr(config, "LOCAL_INTENT_THRESHOLD", 0.75)
+LOCAL_INTENT_MODEL_PATH = getattr(config, "LOCAL_INTENT_MODEL_PATH", DEFAULT_MODEL_PATH)
+
+INTENT_CACHE_TTL_SEC = 7 * 24 * 3600   # intent ของประโยคเดิมแทบไม่เปลี่ยน
+INTENT_CACHE_MAX_ENTRIES = 2000
+INTENT_LLM_DEADLINE_SEC = 8.0         # classifier อยู่บน critical path ของทุก turn อย่ารอนาน
+
+ANALYSIS_KEYS = ("need_web_search", "need_memory", "need_conversation_history")
+
+
+def _intent_catalogue():
+    """Intent list for the system prompt, built from ROUTER_INTENT_EXAMPLES (the local model's seed data)."""
+    blocks = []
+    for intent, description in ROUTER_INTENT_DESCRIPTIONS.items():
+        lines = [f"- {intent}:", f"ความหมาย: {description}"]
+        examples = ROUTER_INTENT_EXAMPLES.get(intent)
+        if examples:
+            lines.append("ตัวอย่าง:")
+            lines.extend(f"    - {example}" for example in examples)
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks) + "\n\n"
+
+
+# สร้างครั้งเดียวตอน import: ทุก request ได้ string เดิมทุก byte (provider prompt cache ยังใช้ได้)
+INTENT_SYSTEM_PROMPT = """
+คุณคือ AI ที่ทำหน้าที่วิเคราะห์ข้อความของผู้ใช้ แล้วระบุ "intent" ที่ตรงที่สุดเพียงหนึ่งรายการจากรายการด้านล่าง พร้อมระบุระดับความมั่นใจ (0-1) และคำอธิบายประกอบ
+
+รายการ intent ที่รองรับมีดังนี้:
+
+""" + _intent_catalogue() + """นอกจากนี้ให้ประเมินว่าการตอบข้อความนี้ต้องใช้ข้อมูลเพิ่มหรือไม่ (ตอบ "Yes" หรือ "No"):
+- need_web_search: ต้องค้นข้อมูลล่าสุดหรือข้อเท็จจริงจากอินเทอร์เน็ต
+- need_memory: ต้องใช้ความทรงจำเกี่ยวกับผู้ใช้
+- need_conversation_history: ต้องใช้บทสนทนาก่อนหน้า
+
+ข้อความของผู้ใช้ (และคำถามก่อนหน้า ถ้ามี) จะอยู่ในข้อความถัดไป
+ถ้าต้องรู้บริบทจากคำถามก่อนหน้าจึงจะเข้าใจข้อความปัจจุบัน ให้ need_conversation_history = "Yes"
+
+ตอบกลับในรูปแบบ JSON ที่ถูกต้อง เช่น:
+{
+"intent": "reminder",
+"confidence": 0.88,
+"explanation": "ผู้ใช้ขอให้ช่วยเตือนเรื่องสำคัญ ซึ่งตรงกับเจตนา reminder",
+"need_web_search": "No",
+"need_memory": "No",
+"need_conversation_history": "No"
+}
+"""
+
+
+def analysis_from_result(result: Dict):
+    """
+    Retrieval flags from a combined classifier response, in the same shape as
+    ChatManager.analyze_question_all_in_one. None if the result has no flags
+    (local model / local grammar), so the caller still has to analyze.
+    """
+    if not result or not all(key in result for key in ANALYSIS_KEYS):
+        return None
+    return {key: "Yes" if str(result[key]).strip().lower() in ("yes", "true") else "No" for key in ANALYSIS_KEYS}
+
 class IntentClassifier:
-    def __init__(self, model=OPENAI_MODEL, api_key=OPENAI_API_KEY):
-        self.client = OpenAI(api_key=api_key)
-        self.model = model
+    def __init__(self, model=None, local_model_path=LOCAL_INTENT_MODEL_PATH,
+                 local_threshold=LOCAL_INTENT_THRESHOLD, log_path=INTENT_LOG_PATH):
+        self.llm = get_llm_gateway()
+        self.model = model or self.llm.route("classify")["model"]
         self.intent_definitions = INTENT_DEFINITIONS
 
+        self.local_model = LocalIntentModel.load_if_exists(local_model_path)
+        self.local_threshold = local_threshold
+        self.log_path = log_path
+        self._log_lock = threading.Lock()
+
+        self.cache = PersistentTTLCache("intent", ttl_seconds=INTENT_CACHE_TTL_SEC, max_entries=INTENT_CACHE_MAX_ENTRIES)
+        usage_tracker.register_stats("intent_cache", self.cache.stats)
+
     def classify(self, text: str):
         return self.classify_intent(text)
 
-    def classify_intent(self, user_input: str) -> Dict:
-        prompt = self._build_prompt(user_input)
+    async def classify_async(self, text: str):
+        return await self.classify_intent_async(text)
+
+    def _build_messages(self, user_input: str, previous_question: str = None):
+        return [
+            # system prompt คงที่ทุก byte เพื่อให้ provider prompt cache ใช้ prefix ร่วมกันได้
+            {"role": "system", "content": INTENT_SYSTEM_PROMPT},
+            {"role": "user", "content": self._build_prompt(user_input, previous_question)}
+        ]
+
+    def _classify_local(self, user_input: str):
+        """Local n-gram model first; None means fall back to the LLM."""
+        if not self.local_model:
+            return None
+        start = time.perf_counter()
+        result = self.local_model.predict(user_input)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if result["confidence"] >= self.local_threshold:
+            logger.info(f"[classify_intent] ⚡ Local model: {result['intent']} ({result['confidence']}, {elapsed_ms:.2f} ms)")
+            return result
+        logger.debug(f"[classify_intent] Local model unsure ({result['intent']} {result['confidence']}), falling back to LLM")
+        return None
+
+    def _cached(self, user_input: str):
+        cache_key = normalize_utterance(user_input)
+        result = self.cache.get(cache_key) if cache_key else None
+        if result is not None:
+            logger.info(f"[classify_intent] 💾 Cache hit: {result.get('intent')} ({cache_key})")
+        return cache_key, result
+
+    def _store(self, cache_key: str, result: Dict):
+        # ไม่ cache ผลที่ parse ไม่ได้หรือเรียก LLM ไม่สำเร็จ
+        if not cache_key or result.get("intent") in (None, "unknown") or result.get("confidence", 0.0) <= 0:
+            return
+        # key คือข้อความอย่างเดียว: ประโยคที่ต้องอาศัยคำถามก่อนหน้า (เช่น "แล้วพรุ่งนี้ล่ะ")
+        # ให้ผลต่างกันตามบริบท จึงไม่ cache
+        if result.get("need_conversation_history") == "Yes":
+            return
+        self.cache.put(cache_key, result)
+
+    def _log_utterance(self, user_input: str, result: Dict, source: str):
+        # utterance ที่ผ่าน LLM ถูกเก็บไว้ retrain local model (tools/train_intent_model.py)
+        if not self.log_path:
+            return
+        record = {
+            "text": user_input,
+            "intent": result.get("intent"),
+            "confidence": result.get("confidence", 0.0),
+            "source": source,
+            "ts": time.time(),
+        }
         try:
-            response = self.client.chat.completions.create(
+            with self._log_lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"⚠️ Failed to log intent utterance: {e}")
+
+    def classify_intent(self, user_input: str, previous_question: str = None) -> Dict:
+        """
+        One LLM round trip returns intent, confidence and the retrieval flags
+        (see analysis_from_result), so a chat turn does not need a second analysis call.
+        """
+        cache_key, cached = self._cached(user_input)
+        if cached is not None:
+            return cached
+        local_result = self._classify_local(user_input)
+        if local_result:
+            return local_result
+        try:
+            parsed = self.llm.chat_structured(
+                IntentClassification,
+                task="classify",
+                deadline=INTENT_LLM_DEADLINE_SEC,
+                hedge=True,
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": "คุณคือ AI ที่ช่วยระบุ intent ของข้อความผู้ใช้"},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=self._build_messages(user_input, previous_question),
                 temperature=0.2,
-            )
-            result = response.choices[0].message.content.strip()
-            logger.info(f"[classify_intent] 🧠 Result: {result}")
-            logger.info(f"[classify_intent] 🔢 Token usage: {response.usage}")
-            return self._parse_result(result)
+            ).model_dump()
+            logger.info(f"[classify_intent] 🧠 Result: {parsed}")
+            self._log_utterance(user_input, parsed, "llm")
+            self._store(cache_key, parsed)
+            return parsed
         except Exception as e:
             logger.error(f"[classify_intent] ❌ Error: {e}")
             return {"intent": "unknown", "confidence": 0.0}
 
-    def _build_prompt(self, user_input: str) -> str:
-        return f"""
-            คุณคือ AI ที่ทำหน้าที่วิเคราะห์ข้อความของผู้ใช้ แล้วระบุ "intent" ที่ตรงที่สุดเพียงหนึ่งรายการจากรายการด้านล่าง พร้อมระบุระดับความมั่นใจ (0-1) และคำอธิบายประกอบ
-
-            รายการ intent ที่รองรับมีดังนี้:
-
-            - general_chat:
-            ความหมาย: การพูดคุยทั่วไป ไม่ได้ขอข้อมูลหรือสั่งงาน
-            ตัวอย่าง:
-                - สบายดีไหม
-                - วันนี้อากาศดีจัง
-                - เล่าเรื่องสนุก ๆ ให้ฟังหน่อย
-                - How are you?
-
-            - home_command:
-            ความหมาย: คำสั่งควบคุมอุปกรณ์ในบ้าน เช่น ไฟ แอร์ ประตู
-            ตัวอย่าง:
-                - เปิดไฟห้องนั่งเล่น
-                - ปิดแอร์ตอนตีหนึ่ง
-                - เปิดม่าน
-                - Turn off the bedroom light
-
-            - reminder:
-            ความหมาย: ขอให้สร้าง ลบ หรือแจ้งเตือนสิ่งใดสิ่งหนึ่ง
-            ตัวอย่าง:
-                - เตือนฉันให้กินยา 2 ทุ่ม
-                - ลบการเตือนเมื่อวาน
-                - ตั้งเตือนตอน 9 โมงให้โทรหาหมอ
-                - Remind me to take my meds at 8PM
-
-            - news_summary:
-            ความหมาย: ขอให้สรุปข่าวล่าสุด หรือข่าวเฉพาะหมวด เช่น เทคโนโลยี พลังงาน
-            ตัวอย่าง:
-                - ช่วยสรุปข่าวเทคโนโลยีล่าสุดวันนี้
-                - ข่าว AI มีอะไรใหม่
-                - Trending news in Thailand
-                - ข่าวที่เกี่ยวกับพลังงานสะอาดมีอะไรบ้าง
-
-            - stock_analysis:
-            ความหมาย: ขอวิเคราะห์แนวโน้มหรือสถานการณ์ของหุ้นตัวใดตัวหนึ่ง
-            ตัวอย่าง:
-                - วิเคราะห์หุ้น BBL หน่อย
-                - หุ้นพลังงานน่าเข้าตอนนี้มั้ย
-                - ADVANC มีแนวโน้มยังไง
-
-            - weather:
-            ความหมาย: ถามพยากรณ์อากาศ
-            ตัวอย่าง:
-                - หัวหินพรุ่งนี้ฝนตกไหม
-                - วันนี้ที่กรุงเทพอากาศกี่องศา
-                - Will it rain tomorrow?
-
-            - daily_briefing:
-            ความหมาย: ขอรายงานสรุปประจำวัน
-            ตัวอย่าง:
-                - แจ้งเตือนวันนี้มีอะไรบ้าง
-                - สรุปข่าว หุ้น และกิจกรรมให้หน่อยตอนเช้า
-                - Today’s daily briefing please
-
-            - unknown:
-            ความหมาย: ข้อความไม่สามารถระบุเจตนาได้แน่ชัด
-
-            โปรดวิเคราะห์ข้อความผู้ใช้ต่อไปนี้:
-            \"{user_input}\"
-
-            และตอบกลับในรูปแบบ JSON ที่ถูกต้อง เช่น:
-            {{
-            "intent": "reminder",
-            "confidence": 0.88,
-            "explanation": "ผู้ใช้ขอให้ช่วยเตือนเรื่องสำคัญ ซึ่งตรงกับเจตนา reminder"
-            }}
-            """
-
-    def _parse_result(self, result_str: str):
+    async def classify_intent_async(self, user_input: str, previous_question: str = None) -> Dict:
+        cache_key, cached = self._cached(user_input)
+        if cached is not None:
+            return cached
+        local_result = self._classify_local(user_input)
+        if local_result:
+            return local_result
         try:
-            import json
-            cleaned = result_str.strip()
-
-            # Remove triple backticks if present
-            if cleaned.startswith("```json"):
-                cleaned = cleaned.removeprefix("```json").removesuffix("```").strip()
-            elif cleaned.startswith("```"):
-                cleaned = cleaned.removeprefix("```").removesuffix("```").strip()
-
-            return json.loads(cleaned)
+            parsed = (await self.llm.chat_structured_async(
+                IntentClassification,
+                task="classify",
+                deadline=INTENT_LLM_DEADLINE_SEC,
+                hedge=True,
+                model=self.model,
+                messages=self._build_messages(user_input, previous_question),
+                temperature=0.2,
+            )).model_dump()
+            logger.info(f"[classify_intent_async] 🧠 Result: {parsed}")
+            self._log_utterance(user_input, parsed, "llm")
+            self._store(cache_key, parsed)
+            return parsed
         except Exception as e:
-            logger.error(f"[classify_intent] ❌ Failed to parse JSON result: {e}")
-            return {"intent": "unknown", "confidence": 0.0}
\ No newline at end of file
+            logger.error(f"[classify_intent_async] ❌ Error: {e}")
+            return {"intent": "unknown", "confidence": 0.0}
+
+    def _build_prompt(self, user_input: str, previous_question: str = None) -> str:
+        # เฉพาะส่วนที่เปลี่ยนทุก request อยู่ท้ายสุด ส่วน catalogue อยู่ใน INTENT_SYSTEM_PROMPT
+        previous_block = f"คำถามก่อนหน้าของผู้ใช้: \"{previous_question}\"\n" if previous_question else ""
+        return f"{previous_block}โปรดวิเคราะห์ข้อความผู้ใช้ต่อไปนี้:\n\"{user_input}\""
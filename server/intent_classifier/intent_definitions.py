@@ -59,4 +59,70 @@ INTENT_DEFINITIONS = {
             "ระบบควบคุมพัดลมได้หรือเปล่า"
         ]
     }
-}
\ No newline at end of file
+}
+
+# map จาก key ของ INTENT_DEFINITIONS → intent ที่ IntentRouter ใช้จริง
+INTENT_LABEL_MAP = {
+    "command": "home_command",
+    "reminder": "reminder",
+    "chatgpt": "general_chat",
+    "stock_analysis": "stock_analysis",
+    "news_summary": "news_summary",
+    "weather_query": "weather",
+    "inquiry": "general_chat",
+}
+
+# ความหมายของ intent ที่ router ใช้ (ลำดับเดียวกับใน prompt ของ IntentClassifier)
+ROUTER_INTENT_DESCRIPTIONS = {
+    "general_chat": "การพูดคุยทั่วไป ไม่ได้ขอข้อมูลหรือสั่งงาน",
+    "home_command": "คำสั่งควบคุมอุปกรณ์ในบ้าน เช่น ไฟ แอร์ ประตู",
+    "reminder": "ขอให้สร้าง ลบ หรือแจ้งเตือนสิ่งใดสิ่งหนึ่ง",
+    "news_summary": "ขอให้สรุปข่าวล่าสุด หรือข่าวเฉพาะหมวด เช่น เทคโนโลยี พลังงาน",
+    "stock_analysis": "ขอวิเคราะห์แนวโน้มหรือสถานการณ์ของหุ้นตัวใดตัวหนึ่ง",
+    "weather": "ถามพยากรณ์อากาศ",
+    "daily_briefing": "ขอรายงานสรุปประจำวัน",
+    "unknown": "ข้อความไม่สามารถระบุเจตนาได้แน่ชัด",
+}
+
+# ตัวอย่างตาม intent ของ router: แหล่งเดียวของทั้ง prompt ของ IntentClassifier และ seed ของ local model
+ROUTER_INTENT_EXAMPLES = {
+    "general_chat": [
+        "สบายดีไหม",
+        "วันนี้อากาศดีจัง",
+        "เล่าเรื่องสนุก ๆ ให้ฟังหน่อย",
+        "How are you?",
+    ],
+    "home_command": [
+        "เปิดไฟห้องนั่งเล่น",
+        "ปิดแอร์ตอนตีหนึ่ง",
+        "เปิดม่าน",
+        "Turn off the bedroom light",
+    ],
+    "reminder": [
+        "เตือนฉันให้กินยา 2 ทุ่ม",
+        "ลบการเตือนเมื่อวาน",
+        "ตั้งเตือนตอน 9 โมงให้โทรหาหมอ",
+        "Remind me to take my meds at 8PM",
+    ],
+    "news_summary": [
+        "ช่วยสรุปข่าวเทคโนโลยีล่าสุดวันนี้",
+        "ข่าว AI มีอะไรใหม่",
+        "Trending news in Thailand",
+        "ข่าวที่เกี่ยวกับพลังงานสะอาดมีอะไรบ้าง",
+    ],
+    "stock_analysis": [
+        "วิเคราะห์หุ้น BBL หน่อย",
+        "หุ้นพลังงานน่าเข้าตอนนี้มั้ย",
+        "ADVANC มีแนวโน้มยังไง",
+    ],
+    "weather": [
+        "หัวหินพรุ่งนี้ฝนตกไหม",
+        "วันนี้ที่กรุงเทพอากาศกี่องศา",
+        "Will it rain tomorrow?",
+    ],
+    "daily_briefing": [
+        "แจ้งเตือนวันนี้มีอะไรบ้าง",
+        "สรุปข่าว หุ้น และกิจกรรมให้หน่อยตอนเช้า",
+        "Today’s daily briefing please",
+    ],
+}
@@ -0,0 +1,207 @@
+# server/intent_classifier/local_model.py
+import json
+import math
+import os
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from .intent_definitions import INTENT_DEFINITIONS, INTENT_LABEL_MAP, ROUTER_INTENT_EXAMPLES
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MODEL_PATH = "intent_model.json"
+INTENT_LOG_PATH = "intent_log.jsonl"
+NGRAM_RANGE = (1, 4)           # ภาษาไทยไม่มีช่องว่างระหว่างคำ จึงใช้ character n-gram
+MIN_LOG_CONFIDENCE = 0.8       # ใช้เฉพาะ utterance ที่ LLM มั่นใจเป็น label สำหรับ train
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", str(text).lower()).strip()
+
+
+def extract_features(text: str, ngram_range=NGRAM_RANGE):
+    """L2-normalised character n-gram counts."""
+    padded = f" {normalize_text(text)} "
+    counts = Counter()
+    low, high = ngram_range
+    for n in range(low, high + 1):
+        for i in range(len(padded) - n + 1):
+            counts[padded[i:i + n]] += 1
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {gram: v / norm for gram, v in counts.items()}
+
+
+def seed_examples():
+    """(text, intent) pairs from INTENT_DEFINITIONS and the classifier prompt examples."""
+    examples = []
+    for key, definition in INTENT_DEFINITIONS.items():
+        intent = INTENT_LABEL_MAP.get(key)
+        if intent:
+            examples.extend((text, intent) for text in definition.get("examples", []))
+    for intent, texts in ROUTER_INTENT_EXAMPLES.items():
+        examples.extend((text, intent) for text in texts)
+    return examples
+
+
+def load_logged_examples(path=INTENT_LOG_PATH, min_confidence=MIN_LOG_CONFIDENCE):
+    """(text, intent) pairs from production utterances the LLM classified confidently."""
+    if not os.path.exists(path):
+        return []
+
+    latest = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("source") != "llm" or record.get("intent") in (None, "unknown"):
+                continue
+            if float(record.get("confidence", 0.0)) < min_confidence:
+                continue
+            # ประโยคซ้ำให้ใช้ label ล่าสุด
+            latest[normalize_text(record.get("text", ""))] = record["intent"]
+    return [(text, intent) for text, intent in latest.items() if text]
+
+
+class LocalIntentModel:
+    """
+    Multinomial logistic regression over character n-grams, trained with SGD.
+    Pure Python with sparse weights so a prediction is a few hundred dict lookups
+    (well under 5 ms) and the model file is plain JSON.
+    """
+
+    def __init__(self, labels=None, weights=None, bias=None, ngram_range=NGRAM_RANGE):
+        self.labels = list(labels or [])
+        self.weights = weights or {}
+        self.bias = list(bias or [0.0] * len(self.labels))
+        self.ngram_range = tuple(ngram_range)
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        model = cls(data["labels"], data["weights"], data["bias"], data.get("ngram_range", NGRAM_RANGE))
+        logger.info(f"📦 Loaded local intent model ({len(model.labels)} intents, {len(model.weights)} features) from {path}")
+        return model
+
+    @classmethod
+    def load_if_exists(cls, path=DEFAULT_MODEL_PATH):
+        if not path or not os.path.exists(path):
+            logger.info(f"ℹ️ No local intent model at {path}, using LLM classifier only")
+            return None
+        try:
+            return cls.load(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to load local intent model {path}: {e}")
+            return None
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        data = {
+            "labels": self.labels,
+            "weights": self.weights,
+            "bias": self.bias,
+            "ngram_range": list(self.ngram_range),
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _scores(self, features):
+        scores = list(self.bias)
+        for gram, value in features.items():
+            row = self.weights.get(gram)
+            if row:
+                for k, w in enumerate(row):
+                    scores[k] += w * value
+        return scores
+
+    @staticmethod
+    def _softmax(scores):
+        top = max(scores)
+        exps = [math.exp(s - top) for s in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def train(self, examples, epochs=40, learning_rate=0.5, l2=1e-4, seed=42):
+        self.labels = sorted({intent for _, intent in examples})
+        index = {label: k for k, label in enumerate(self.labels)}
+        n_labels = len(self.labels)
+        weights = defaultdict(lambda: [0.0] * n_labels)
+        self.weights = weights
+        self.bias = [0.0] * n_labels
+
+        data = [(extract_features(text, self.ngram_range), index[intent]) for text, intent in examples]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            lr = learning_rate / (1 + epoch * 0.1)
+            for features, target in data:
+                probs = self._softmax(self._scores(features))
+                for k in range(n_labels):
+                    grad = probs[k] - (1.0 if k == target else 0.0)
+                    self.bias[k] -= lr * grad
+                    for gram, value in features.items():
+                        row = weights[gram]
+                        row[k] -= lr * (grad * value + l2 * row[k])
+
+        # ตัด feature ที่น้ำหนักเล็กมากออก ให้ไฟล์เล็กและ predict เร็ว
+        self.weights = {
+            gram: [round(w, 5) for w in row]
+            for gram, row in weights.items()
+            if max(abs(w) for w in row) > 1e-4
+        }
+        return self
+
+    def predict_proba(self, text: str):
+        probs = self._softmax(self._scores(extract_features(text, self.ngram_range)))
+        return dict(zip(self.labels, probs))
+
+    def predict(self, text: str):
+        probs = self.predict_proba(text)
+        intent = max(probs, key=probs.get)
+        return {
+            "intent": intent,
+            "confidence": round(probs[intent], 3),
+            "explanation": "local n-gram model",
+            "source": "local",
+        }
+
+    def evaluate(self, examples, threshold=0.0):
+        """Accuracy / latency report on a held-out set."""
+        correct = 0
+        confident = 0
+        confident_correct = 0
+        per_intent = defaultdict(lambda: {"total": 0, "correct": 0})
+        latencies = []
+
+        for text, expected in examples:
+            start = time.perf_counter()
+            result = self.predict(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            hit = result["intent"] == expected
+            correct += hit
+            per_intent[expected]["total"] += 1
+            per_intent[expected]["correct"] += hit
+            if result["confidence"] >= threshold:
+                confident += 1
+                confident_correct += hit
+
+        total = len(examples)
+        latencies.sort()
+        return {
+            "examples": total,
+            "accuracy": round(correct / total, 3) if total else 0.0,
+            "threshold": threshold,
+            "coverage": round(confident / total, 3) if total else 0.0,
+            "accuracy_above_threshold": round(confident_correct / confident, 3) if confident else 0.0,
+            "latency_ms_mean": round(sum(latencies) / total, 3) if total else 0.0,
+            "latency_ms_p95": round(latencies[int(0.95 * (total - 1))], 3) if total else 0.0,
+            "per_intent": {
+                intent: round(v["correct"] / v["total"], 3) for intent, v in sorted(per_intent.items())
+            },
+        }
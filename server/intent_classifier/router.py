@@ -1,12 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from pydantic import BaseModel
-from .classifier import IntentClassifier
 
 router = APIRouter()
 
-# ✅ สร้างอินสแตนซ์ของ classifier
-classifier = IntentClassifier()
-
 class IntentRequest(BaseModel):
     text: str
 
@@ -16,8 +12,10 @@ class IntentResponse(BaseModel):
     explanation: str = ""  # optional field (for now)
 
 @router.post("/intent")
-async def detect_intent(req: IntentRequest):
-    result = classifier.classify(req.text)
+async def detect_intent(req: IntentRequest, request: Request):
+    # ใช้ classifier ตัวเดียวกับ /chat จาก service container ของแอป
+    classifier = request.app.state.services.intent_classifier
+    result = await classifier.classify_async(req.text)
     return IntentResponse(
         intent=result.get("intent", "unknown"),
         confidence=result.get("confidence", 0.0),
@@ -0,0 +1,119 @@
+# server/intent_classifier/test_classifier.py
+# run: python -m pytest server/intent_classifier/test_classifier.py
+import asyncio
+import pytest
+
+pytest.importorskip("pydantic")
+pytest.importorskip("openai")
+from server.intent_classifier import classifier as classifier_module
+from server.intent_classifier.classifier import IntentClassifier
+from server.intent_classifier.intent_definitions import ROUTER_INTENT_EXAMPLES
+from server.intent_classifier.local_model import LocalIntentModel
+
+WEATHER_RESULT = {
+    "intent": "weather",
+    "confidence": 0.93,
+    "explanation": "ถามสภาพอากาศ",
+    "need_web_search": "Yes",
+    "need_memory": "No",
+    "need_conversation_history": "No",
+}
+
+
+class StubGateway:
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    def route(self, task):
+        return {"model": "stub-model"}
+
+    def chat_structured(self, schema, **kwargs):
+        self.calls.append(kwargs)
+        return schema(**self.result)
+
+    async def chat_structured_async(self, schema, **kwargs):
+        self.calls.append(kwargs)
+        return schema(**self.result)
+
+
+@pytest.fixture
+def make_classifier(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # cache.db ของ PersistentTTLCache
+
+    def make(result=WEATHER_RESULT):
+        gateway = StubGateway(result)
+        monkeypatch.setattr(classifier_module, "get_llm_gateway", lambda: gateway)
+        classifier = IntentClassifier(local_model_path=str(tmp_path / "no_model.json"), log_path=None)
+        return classifier, gateway
+
+    return make
+
+
+def test_classify_intent_async_returns_llm_intent(make_classifier):
+    classifier, gateway = make_classifier()
+
+    result = asyncio.run(classifier.classify_intent_async("พรุ่งนี้ฝนตกไหม"))
+
+    assert result["intent"] == "weather"
+    assert result["confidence"] == pytest.approx(0.93)
+    assert len(gateway.calls) == 1
+    assert gateway.calls[0]["task"] == "classify"
+
+
+def test_classify_intent_sync_and_async_agree(make_classifier):
+    classifier, _ = make_classifier()
+
+    sync_result = classifier.classify_intent("พรุ่งนี้ฝนตกไหม")
+    async_result = asyncio.run(classifier.classify_intent_async("พรุ่งนี้ฝนตกไหม"))
+
+    assert sync_result["intent"] == async_result["intent"] == "weather"
+
+
+def test_repeated_utterance_is_served_from_cache(make_classifier):
+    classifier, gateway = make_classifier()
+
+    classifier.classify_intent("พรุ่งนี้ฝนตกไหม")
+    result = asyncio.run(classifier.classify_intent_async("  พรุ่งนี้ฝนตกไหม "))
+
+    assert result["intent"] == "weather"
+    assert len(gateway.calls) == 1
+
+
+def test_context_dependent_result_is_not_cached(make_classifier):
+    follow_up = {**WEATHER_RESULT, "need_conversation_history": "Yes"}
+    classifier, gateway = make_classifier(follow_up)
+
+    classifier.classify_intent("แล้วพรุ่งนี้ล่ะ", previous_question="วันนี้ฝนตกไหม")
+    classifier.classify_intent("แล้วพรุ่งนี้ล่ะ", previous_question="หุ้น PTT วันนี้เท่าไหร่")
+
+    assert len(gateway.calls) == 2
+    assert "หุ้น PTT" in gateway.calls[1]["messages"][-1]["content"]
+
+
+def test_failed_classification_is_not_cached(make_classifier):
+    classifier, gateway = make_classifier({**WEATHER_RESULT, "intent": "unknown"})
+
+    classifier.classify_intent("อืม")
+    classifier.classify_intent("อืม")
+
+    assert len(gateway.calls) == 2
+
+
+def test_confident_local_model_skips_llm(make_classifier):
+    classifier, gateway = make_classifier()
+    classifier.local_model = LocalIntentModel().train([("เปิดไฟ", "command"), ("ฝนตกไหม", "weather")], epochs=30)
+    classifier.local_threshold = 0.5
+
+    result = classifier.classify_intent("เปิดไฟ")
+
+    assert result["intent"] == "command"
+    assert result["source"] == "local"
+    assert gateway.calls == []
+
+
+def test_prompt_examples_come_from_router_examples():
+    for intent, examples in ROUTER_INTENT_EXAMPLES.items():
+        block = classifier_module.INTENT_SYSTEM_PROMPT.split(f"- {intent}:\n", 1)[1].split("\n\n", 1)[0]
+        assert [line.strip()[2:] for line in block.splitlines() if line.startswith("    - ")] == examples
+    assert "- unknown:" in classifier_module.INTENT_SYSTEM_PROMPT
@@ -0,0 +1,73 @@
+# server/intent_classifier/test_local_model.py
+# run: python -m pytest server/intent_classifier/test_local_model.py
+import json
+
+from server.intent_classifier.local_model import (
+    LocalIntentModel, extract_features, load_logged_examples, seed_examples
+)
+
+EXAMPLES = [
+    ("เปิดไฟห้องนอน", "command"),
+    ("ปิดไฟห้องนั่งเล่น", "command"),
+    ("ปิดแอร์ห้องนอน", "command"),
+    ("วันนี้อากาศเป็นยังไง", "weather"),
+    ("พรุ่งนี้ฝนตกไหม", "weather"),
+    ("อากาศที่เชียงใหม่ร้อนไหม", "weather"),
+]
+
+
+def trained_model():
+    return LocalIntentModel().train(EXAMPLES, epochs=30)
+
+
+def test_features_are_l2_normalised():
+    features = extract_features("เปิดไฟ")
+
+    assert abs(sum(v * v for v in features.values()) - 1.0) < 1e-9
+    assert extract_features("  เปิดไฟ ") == extract_features("เปิดไฟ")
+
+
+def test_predicts_training_intents():
+    model = trained_model()
+
+    assert model.predict("เปิดไฟห้องนอนหน่อย")["intent"] == "command"
+    assert model.predict("พรุ่งนี้อากาศเป็นยังไง")["intent"] == "weather"
+    result = model.predict("ปิดไฟ")
+    assert result["source"] == "local"
+    assert 0.0 < result["confidence"] <= 1.0
+
+
+def test_save_and_load_round_trip(tmp_path):
+    model = trained_model()
+    path = str(tmp_path / "intent_model.json")
+    model.save(path)
+
+    loaded = LocalIntentModel.load(path)
+
+    assert loaded.labels == model.labels
+    assert loaded.predict_proba("ปิดแอร์") == model.predict_proba("ปิดแอร์")
+
+
+def test_load_if_exists_handles_missing_and_broken_files(tmp_path):
+    assert LocalIntentModel.load_if_exists(str(tmp_path / "missing.json")) is None
+    broken = tmp_path / "broken.json"
+    broken.write_text("{", encoding="utf-8")
+    assert LocalIntentModel.load_if_exists(str(broken)) is None
+
+
+def test_logged_examples_keep_confident_llm_labels_only(tmp_path):
+    path = tmp_path / "intent_log.jsonl"
+    records = [
+        {"text": "เปิดเพลง", "intent": "music", "confidence": 0.9, "source": "llm"},
+        {"text": "เปิดเพลง ", "intent": "command", "confidence": 0.95, "source": "llm"},
+        {"text": "อืม", "intent": "chat", "confidence": 0.4, "source": "llm"},
+        {"text": "ปิดไฟ", "intent": "command", "confidence": 0.99, "source": "local"},
+        {"text": "ไม่รู้", "intent": "unknown", "confidence": 0.9, "source": "llm"},
+    ]
+    path.write_text("\n".join(json.dumps(r, ensure_ascii=False) for r in records) + "\nnot json\n", encoding="utf-8")
+
+    assert load_logged_examples(str(path)) == [("เปิดเพลง", "command")]
+
+
+def test_seed_examples_cover_several_intents():
+    assert len({intent for _, intent in seed_examples()}) > 1
@@ -0,0 +1,534 @@
+# server/llm_gateway.py
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial, lru_cache
+
+import httpx
+import openai
+from openai import OpenAI, AsyncOpenAI
+import config
+from config import OPENAI_API_KEY, OPENAI_MODEL
+from .usage_tracker_instance import usage_tracker
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# ทุก call ไป OpenAI ผ่าน gateway นี้: connection pool เดียว (keep-alive), deadline ต่อ call,
+# retry แบบ jittered backoff เฉพาะ 429/5xx/connection error และ semaphore จำกัดจำนวน call พร้อมกัน
+DEFAULT_DEADLINE_SEC = 20.0
+CONNECT_TIMEOUT_SEC = 5.0
+MAX_RETRIES = 2
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 4.0
+MAX_CONCURRENT_CALLS = 8
+POOL_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+LATENCY_WINDOW = 200   # จำนวน call ล่าสุดต่อ task ที่ใช้คำนวณ p95
+
+# model ต่อประเภทงาน: งาน structured/background ย้ายไป model ที่เร็วกว่าได้โดยไม่กระทบคำตอบหลัก
+# override บางส่วนได้ใน config.py เช่น LLM_MODEL_ROUTES = {"classify": {"model": "gpt-4.1-nano"}}
+DEFAULT_MODEL_ROUTES = {
+    "answer":           {"model": OPENAI_MODEL, "max_tokens": 400},   # คำตอบสำหรับพูด ~30 วินาที (ChatManager._build_context_request เท่านั้น)
+    "general":          {"model": OPENAI_MODEL, "max_tokens": None},  # prompt อื่นๆ ที่ไม่ได้ระบุ task ไม่จำกัดความยาว
+    "escalate":         {"model": "gpt-4o",     "max_tokens": 900},
+    "classify":         {"model": OPENAI_MODEL, "max_tokens": 200},
+    "extract_json":     {"model": OPENAI_MODEL, "max_tokens": 500},
+    "summarize_web":    {"model": OPENAI_MODEL, "max_tokens": 600},
+    "summarize_news":   {"model": OPENAI_MODEL, "max_tokens": 800},
+    "summarize_memory": {"model": OPENAI_MODEL, "max_tokens": 500},
+}
+MODEL_ROUTES = {
+    task: {**DEFAULT_MODEL_ROUTES.get(task, {}), **route}
+    for task, route in {**DEFAULT_MODEL_ROUTES, **getattr(config, "LLM_MODEL_ROUTES", {})}.items()
+}
+# USD ต่อ 1M tokens (input, output) ใช้ประมาณ cost ใน /usage เท่านั้น
+MODEL_PRICES_PER_1M = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    **getattr(config, "LLM_PRICES_PER_1M", {}),
+}
+
+# hedged requests: เปิดด้วย LLM_HEDGING = True ใน config.py (เพิ่ม cost ตามจำนวน hedges_fired ใน /usage)
+LLM_HEDGING = getattr(config, "LLM_HEDGING", False)
+LLM_HEDGE_PERCENTILE = getattr(config, "LLM_HEDGE_PERCENTILE", 0.9)
+HEDGE_MIN_SAMPLES = 20          # ก่อนมีข้อมูลพอ ใช้ HEDGE_DEFAULT_DELAY_SEC
+HEDGE_DEFAULT_DELAY_SEC = 2.5
+HEDGE_MIN_DELAY_SEC = 0.5
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def _is_retryable(error):
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+class StructuredOutputError(ValueError):
+    """Model output did not parse as the requested JSON object / schema."""
+
+
+@lru_cache(maxsize=None)
+def json_schema_format(schema):
+    """response_format for strict structured output from a pydantic model class."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": schema.__name__, "schema": schema.model_json_schema(), "strict": True},
+    }
+
+
+def _backoff_delay(attempt, error=None):
+    """Full-jitter exponential backoff; honours Retry-After on 429 when the server sends it."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SEC)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** attempt)))
+
+
+class LLMGateway:
+    """
+    Shared OpenAI chat-completions client for ChatManager, IntentClassifier,
+    the background summarizers and SearchToContextBuilder.
+
+    chat() / chat_async() / stream_async() take the usual create() kwargs plus
+    task (a MODEL_ROUTES key: picks model / max_tokens unless given, and labels
+    the stats), deadline (seconds for the whole call including retries) and
+    hedge (interactive calls opt in; only active with LLM_HEDGING). Usage goes
+    to usage_tracker and per-task latency / tokens / cost to /usage
+    ("llm_gateway") automatically, so callers only handle the response.
+    """
+
+    def __init__(self, api_key=OPENAI_API_KEY, max_concurrent=MAX_CONCURRENT_CALLS,
+                 deadline_sec=DEFAULT_DEADLINE_SEC, max_retries=MAX_RETRIES,
+                 hedging=LLM_HEDGING, hedge_percentile=LLM_HEDGE_PERCENTILE, routes=None):
+        self.api_key = api_key
+        self.routes = routes or MODEL_ROUTES
+        self.deadline_sec = deadline_sec
+        self.max_retries = max_retries
+        self.max_concurrent = max_concurrent
+        timeout = httpx.Timeout(deadline_sec, connect=CONNECT_TIMEOUT_SEC)
+
+        # retry ทำเองใน gateway (max_retries=0) เพื่อให้ deadline ครอบทุก attempt
+        self.client = OpenAI(
+            api_key=api_key, max_retries=0,
+            http_client=httpx.Client(limits=POOL_LIMITS, timeout=timeout)
+        )
+        self._async_client = None
+        self._async_semaphore = None
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+        self.lock = threading.Lock()
+        self.calls = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self.models = {}
+        self.tokens_in = defaultdict(int)
+        self.tokens_out = defaultdict(int)
+        self.cost_usd = defaultdict(float)
+        self.parse_failures = defaultdict(int)
+        self.first_response = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+
+        # hedging (opt-in): ถ้า request แรกช้ากว่า percentile ปกติ ยิงซ้ำอีกตัวแล้วใช้ตัวที่ตอบก่อน
+        self.hedging = hedging
+        self.hedge_percentile = hedge_percentile
+        self.hedges_fired = defaultdict(int)
+        self.hedges_won = defaultdict(int)
+        self._hedge_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm-hedge")
+
+    @property
+    def async_client(self):
+        # สร้างตอนใช้ครั้งแรก ให้ผูกกับ event loop ของ uvicorn (เหมือน async_http)
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key, max_retries=0,
+                http_client=httpx.AsyncClient(
+                    limits=POOL_LIMITS, timeout=httpx.Timeout(self.deadline_sec, connect=CONNECT_TIMEOUT_SEC)
+                )
+            )
+        return self._async_client
+
+    @property
+    def async_semaphore(self):
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._async_semaphore
+
+    def _record(self, task, model, started, response=None, error=None):
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.calls[task] += 1
+            self.latencies[task].append(elapsed)
+            if error is not None:
+                self.errors[task] += 1
+        if error is not None:
+            logger.error(f"❌ [{task}] LLM call failed after {elapsed:.2f}s: {error}")
+            return
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            input_price, output_price = MODEL_PRICES_PER_1M.get(model, (0.0, 0.0))
+            with self.lock:
+                self.models[task] = model
+                self.tokens_in[task] += usage.prompt_tokens
+                self.tokens_out[task] += usage.completion_tokens
+                self.cost_usd[task] += (usage.prompt_tokens * input_price + usage.completion_tokens * output_price) / 1_000_000
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+            logger.info(
+                f"🧮 [{task}] {model} {elapsed:.2f}s tokens in={usage.prompt_tokens} "
+                f"(cached {cached}) out={usage.completion_tokens}"
+            )
+            usage_tracker.log_openai_usage(usage, model=model)
+
+    def route(self, task):
+        return self.routes.get(task) or {"model": OPENAI_MODEL, "max_tokens": None}
+
+    def _apply_route(self, task, kwargs):
+        """Fill model / max_tokens from the routing table unless the call sets them."""
+        route = self.route(task)
+        if route.get("max_tokens") and "max_tokens" not in kwargs:
+            kwargs["max_tokens"] = route["max_tokens"]
+        return kwargs.setdefault("model", route["model"])
+
+    def _record_first_response(self, task, started):
+        # เวลาถึง response (หรือ chunk แรกของ stream) ใช้คำนวณ hedge delay
+        with self.lock:
+            self.first_response[task].append(time.perf_counter() - started)
+
+    def _retry_delay(self, task, attempt, error, deadline_at):
+        """Seconds to wait before the next attempt, or None when not retryable / out of time."""
+        if attempt >= self.max_retries or not _is_retryable(error):
+            return None
+        delay = _backoff_delay(attempt, error)
+        if time.monotonic() + delay >= deadline_at:
+            return None
+        with self.lock:
+            self.retries[task] += 1
+        logger.warning(f"🔁 [{task}] {type(error).__name__}, retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        return delay
+
+    def _attempt(self, task, deadline_at, kwargs):
+        """One logical request (with retries) under the concurrency semaphore."""
+        attempt = 0
+        with self._semaphore:
+            while True:
+                try:
+                    return self.client.chat.completions.create(
+                        timeout=max(0.1, deadline_at - time.monotonic()), **kwargs
+                    )
+                except Exception as e:
+                    delay = self._retry_delay(task, attempt, e, deadline_at)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                    attempt += 1
+
+    async def _attempt_async(self, task, deadline_at, kwargs):
+        attempt = 0
+        async with self.async_semaphore:
+            while True:
+                try:
+                    return await self.async_client.chat.completions.create(
+                        timeout=max(0.1, deadline_at - time.monotonic()), **kwargs
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    delay = self._retry_delay(task, attempt, e, deadline_at)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    attempt += 1
+
+    async def _open_stream_async(self, task, deadline_at, kwargs):
+        """
+        Open a stream and wait for its first chunk. Returns (stream, first_chunk)
+        with a semaphore slot still held; _close_stream_async releases it.
+        """
+        await self.async_semaphore.acquire()
+        try:
+            attempt = 0
+            while True:
+                try:
+                    stream = await self.async_client.chat.completions.create(
+                        timeout=max(0.1, deadline_at - time.monotonic()), **kwargs
+                    )
+                    return stream, await anext(stream, None)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    delay = self._retry_delay(task, attempt, e, deadline_at)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    attempt += 1
+        except BaseException:
+            self.async_semaphore.release()
+            raise
+
+    async def _close_stream_async(self, opened):
+        stream, _ = opened
+        try:
+            await stream.close()
+        except Exception as e:
+            logger.debug(f"Closing stream failed: {e}")
+        finally:
+            self.async_semaphore.release()
+
+    def hedge_delay(self, task):
+        """Seconds to wait before duplicating a request: the task's recent first-response percentile."""
+        with self.lock:
+            samples = sorted(self.first_response[task])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY_SEC
+        return max(HEDGE_MIN_DELAY_SEC, samples[min(len(samples) - 1, int(len(samples) * self.hedge_percentile))])
+
+    def _hedge_event(self, task, event, delay=None):
+        with self.lock:
+            if event == "fired":
+                self.hedges_fired[task] += 1
+            else:
+                self.hedges_won[task] += 1
+        if event == "fired":
+            logger.info(f"🪁 [{task}] No response after {delay:.2f}s, sending hedge request")
+        else:
+            logger.info(f"🏁 [{task}] Hedge request won")
+
+    def _hedged(self, task, make_attempt):
+        """
+        Sync hedging: a thread that is already waiting on OpenAI cannot be
+        cancelled, so the losing request runs to completion and is discarded.
+        """
+        delay = self.hedge_delay(task)
+        futures = [self._hedge_executor.submit(make_attempt)]
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            self._hedge_event(task, "fired", delay)
+            futures.append(self._hedge_executor.submit(make_attempt))
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in (f for f in futures if f in done):
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is not futures[0]:
+                        self._hedge_event(task, "won")
+                    return future.result()
+        raise futures[0].exception()
+
+    async def _hedged_async(self, task, make_attempt, discard=None):
+        """
+        Start make_attempt(); if it has not finished after hedge_delay(), start a
+        second one and return whichever succeeds first. The loser is cancelled
+        (and passed to discard if it had already produced a result).
+        """
+        delay = self.hedge_delay(task)
+        attempts = [asyncio.create_task(make_attempt())]
+        winner = None
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done:
+                self._hedge_event(task, "fired", delay)
+                attempts.append(asyncio.create_task(make_attempt()))
+
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in (a for a in attempts if a in done):
+                    if attempt.exception() is None:
+                        winner = attempt
+                        break
+                if winner is not None:
+                    break
+            if winner is None:
+                raise attempts[0].exception()
+            if winner is not attempts[0]:
+                self._hedge_event(task, "won")
+            return winner.result()
+        finally:
+            losers = [attempt for attempt in attempts if attempt is not winner]
+            for loser in losers:
+                loser.cancel()
+            results = await asyncio.gather(*losers, return_exceptions=True)
+            if discard is not None:
+                for result in results:
+                    if not isinstance(result, BaseException):
+                        await discard(result)
+
+    def chat(self, task="general", deadline=None, hedge=False, **kwargs):
+        model = self._apply_route(task, kwargs)
+        deadline_at = time.monotonic() + (deadline or self.deadline_sec)
+        started = time.perf_counter()
+        make_attempt = partial(self._attempt, task, deadline_at, kwargs)
+        try:
+            response = self._hedged(task, make_attempt) if hedge and self.hedging else make_attempt()
+        except Exception as e:
+            self._record(task, model, started, error=e)
+            raise
+        self._record_first_response(task, started)
+        self._record(task, model, started, response=response)
+        return response
+
+    async def chat_async(self, task="general", deadline=None, hedge=False, **kwargs):
+        model = self._apply_route(task, kwargs)
+        deadline_at = time.monotonic() + (deadline or self.deadline_sec)
+        started = time.perf_counter()
+        make_attempt = partial(self._attempt_async, task, deadline_at, kwargs)
+        try:
+            if hedge and self.hedging:
+                response = await self._hedged_async(task, make_attempt)
+            else:
+                response = await make_attempt()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record(task, model, started, error=e)
+            raise
+        self._record_first_response(task, started)
+        self._record(task, model, started, response=response)
+        return response
+
+    async def stream_async(self, task="general", deadline=None, hedge=False, **kwargs):
+        """
+        Async generator over stream chunks. Opening the stream (up to the first
+        chunk) is retried and, with hedge=True, hedged; once chunks have been
+        yielded a failure is raised to the caller.
+        """
+        model = self._apply_route(task, kwargs)
+        kwargs["stream"] = True
+        kwargs.setdefault("stream_options", {"include_usage": True})
+        deadline_at = time.monotonic() + (deadline or self.deadline_sec)
+        started = time.perf_counter()
+        make_attempt = partial(self._open_stream_async, task, deadline_at, kwargs)
+        try:
+            if hedge and self.hedging:
+                opened = await self._hedged_async(task, make_attempt, discard=self._close_stream_async)
+            else:
+                opened = await make_attempt()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record(task, model, started, error=e)
+            raise
+        self._record_first_response(task, started)
+
+        stream, first_chunk = opened
+        usage_chunk = None
+        try:
+            if first_chunk is not None:
+                if first_chunk.usage:
+                    usage_chunk = first_chunk
+                yield first_chunk
+            async for chunk in stream:
+                if chunk.usage:
+                    usage_chunk = chunk
+                yield chunk
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record(task, model, started, error=e)
+            raise
+        finally:
+            await self._close_stream_async(opened)
+        self._record(task, model, started, response=usage_chunk)
+
+    def parse_structured(self, task, response, schema=None):
+        """
+        Parse the reply once: a schema instance (pydantic model) or, without a
+        schema, a plain dict. Failures are counted and raised as StructuredOutputError.
+        """
+        message = response.choices[0].message
+        content = message.content or ""
+        try:
+            if schema is not None:
+                return schema.model_validate_json(content)
+            parsed = json.loads(content)
+            if not isinstance(parsed, dict):
+                raise ValueError("expected a JSON object")
+            return parsed
+        except ValueError as e:
+            with self.lock:
+                self.parse_failures[task] += 1
+            refusal = getattr(message, "refusal", None)
+            logger.error(f"❌ [{task}] Structured output parse failed: {refusal or e}")
+            raise StructuredOutputError(f"{task}: {refusal or e}") from e
+
+    def _structured_kwargs(self, schema, kwargs):
+        kwargs["response_format"] = json_schema_format(schema) if schema is not None else {"type": "json_object"}
+        return kwargs
+
+    def chat_structured(self, schema=None, task="extract_json", **kwargs):
+        """chat() with JSON-schema structured output (or JSON mode when schema is None), parsed once."""
+        response = self.chat(task=task, **self._structured_kwargs(schema, kwargs))
+        return self.parse_structured(task, response, schema)
+
+    async def chat_structured_async(self, schema=None, task="extract_json", **kwargs):
+        response = await self.chat_async(task=task, **self._structured_kwargs(schema, kwargs))
+        return self.parse_structured(task, response, schema)
+
+    def stats(self):
+        with self.lock:
+            result = {}
+            for task, samples in self.latencies.items():
+                ordered = sorted(samples)
+                p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+                result[task] = {
+                    "model": self.models.get(task, self.route(task)["model"]),
+                    "calls": self.calls[task],
+                    "errors": self.errors[task],
+                    "retries": self.retries[task],
+                    "hedges_fired": self.hedges_fired[task],
+                    "hedges_won": self.hedges_won[task],
+                    "tokens_in": self.tokens_in[task],
+                    "tokens_out": self.tokens_out[task],
+                    "tokens_out_per_call": round(self.tokens_out[task] / self.calls[task], 1) if self.calls[task] else 0.0,
+                    "cost_usd": round(self.cost_usd[task], 6),
+                    "parse_failures": self.parse_failures[task],
+                    "latency_ms_mean": round(sum(ordered) / len(ordered) * 1000, 1) if ordered else 0.0,
+                    "latency_ms_p95": round(p95 * 1000, 1),
+                }
+            return result
+
+    async def close_async(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    def close(self):
+        self._hedge_executor.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Process-wide LLMGateway, created on first use."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                logger.info("🌐 Creating shared LLM gateway")
+                _gateway = LLMGateway()
+                usage_tracker.register_stats("llm_gateway", _gateway.stats)
+    return _gateway
+
+
+async def close_llm_gateway():
+    global _gateway
+    if _gateway is not None:
+        await _gateway.close_async()
+        _gateway.close()
+        logger.info("🛑 Shared LLM gateway closed")
+    _gateway = None
@@ -0,0 +1,42 @@
+# server/llm_schemas.py
+from typing import List, Literal
+from pydantic import BaseModel, ConfigDict, Field
+
+# schema ของ structured output (response_format json_schema, strict) ที่ LLMGateway.chat_structured ใช้
+# strict mode: ทุก field ต้อง required และห้ามมี field เกิน (extra="forbid" -> additionalProperties: false)
+
+YesNo = Literal["Yes", "No"]
+RouterIntent = Literal[
+    "general_chat", "home_command", "reminder", "news_summary",
+    "stock_analysis", "weather", "daily_briefing", "unknown",
+]
+
+
+class StrictModel(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+
+class QuestionAnalysis(StrictModel):
+    need_web_search: YesNo
+    need_memory: YesNo
+    need_conversation_history: YesNo
+
+
+class IntentClassification(QuestionAnalysis):
+    intent: RouterIntent
+    confidence: float = Field(description="0-1")
+    explanation: str
+
+
+class ReminderRequest(StrictModel):
+    time: str = Field(description="ISO 8601 เช่น 2025-05-29T08:00 หรือ \"\" ถ้าไม่ได้ระบุ")
+    message: str = Field(description="สิ่งที่ต้องการให้เตือน หรือ \"\" ถ้าไม่ได้ระบุ")
+
+
+class Entity(StrictModel):
+    type: str
+    value: str
+
+
+class EntityList(StrictModel):
+    entities: List[Entity]
@@ -7,8 +7,21 @@ class MemoryManager:
         self.db_path = db_path
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)        
         self.lock = threading.Lock()
+        # WAL ให้อ่านพร้อมกับเขียนได้ การอ่านใช้ connection ของแต่ละ thread จึงไม่ต้องรอ self.lock
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._local = threading.local()
+        self._read_conns = []
         self._create_table()
 
+    def _read_conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._local.conn = conn
+            with self.lock:
+                self._read_conns.append(conn)
+        return conn
+
     def _create_table(self):
         with self.conn:
             self.conn.execute('''
@@ -31,10 +44,8 @@ class MemoryManager:
                 )
 
     def get_recent_memories(self, limit=5):
-        with self.lock:
-            with self.conn:
-                cursor = self.conn.execute('SELECT role, content FROM memory ORDER BY id DESC LIMIT ?', (limit,))
-                return cursor.fetchall()
+        cursor = self._read_conn().execute('SELECT role, content FROM memory ORDER BY id DESC LIMIT ?', (limit,))
+        return cursor.fetchall()
 
     def get_unsummarized(self, limit=5):
         with self.lock:
@@ -73,16 +84,14 @@ class MemoryManager:
                 return [{"id": row[0], "role": row[1], "content": row[2]} for row in rows]
 
     def get_latest_history_summary(self):
-        with self.lock:
-            with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT content FROM memory
-                    WHERE is_history = 1 AND is_summarized = 1
-                    ORDER BY timestamp DESC
-                    LIMIT 1
-                ''')
-                row = cursor.fetchone()
-                return row[0] if row else ""
+        cursor = self._read_conn().execute('''
+            SELECT content FROM memory
+            WHERE is_history = 1 AND is_summarized = 1
+            ORDER BY timestamp DESC
+            LIMIT 1
+        ''')
+        row = cursor.fetchone()
+        return row[0] if row else ""
 
     def add_history_summary(self, summary):
         with self.lock:
@@ -98,4 +107,8 @@ class MemoryManager:
                 self.conn.execute('DELETE FROM memory')
 
     def close(self):
+        with self.lock:
+            for conn in self._read_conns:
+                conn.close()
+            self._read_conns = []
         self.conn.close()
\ No newline at end of file
@@ -0,0 +1,70 @@
+# server/prosody.py
+import html
+import re
+from .sentence_splitter import split_sentences
+
+# สร้าง SSML สำหรับ Google TTS จากข้อความธรรมดาฝั่ง server (LLM ไม่ต้องส่ง markup มาเอง)
+DEFAULT_RATE = "108%"       # ค่าเดียวกับ AssistantManager.text_to_ssml ฝั่ง client
+DEFAULT_PITCH = "+1st"
+SENTENCE_BREAK = "300ms"
+PARAGRAPH_BREAK = "600ms"
+
+EMOJI_PATTERN = re.compile(
+    "[\U0001F300-\U0001FAFF\U00002600-\U000027BF\U0001F1E0-\U0001F1FF\uFE0F\u200D]+", flags=re.UNICODE
+)
+MARKUP_PATTERN = re.compile(r"<[^>]+>")
+BOLD_PATTERN = re.compile(r"\*\*(.+?)\*\*")
+LINE_MARKER_PATTERN = re.compile(r"^[ \t]*(?:#{1,6}|[-•*])[ \t]+", re.MULTILINE)   # หัวข้อ / bullet
+MARKDOWN_LEFTOVER_PATTERN = re.compile(r"[*_`~]")
+
+# เวลา 10:30 หรือ 10.30 น. / ตัวเลขมีคอมมา 1,250 / จำนวนเต็ม (ไม่แตะทศนิยม เลขที่ติดจุด/คอมมา)
+SAY_AS_PATTERN = re.compile(
+    r"(?P<time>(?<!\d)(?:[01]?\d|2[0-3]):[0-5]\d(?!\d)|(?<!\d)(?:[01]?\d|2[0-3])\.[0-5]\d(?=\s*น\.))"
+    r"|(?P<grouped>(?<![\d.,])\d{1,3}(?:,\d{3})+(?![\d,]|\.\d))"
+    r"|(?P<integer>(?<![\d.,])\d+(?![\d,]|\.\d))"
+)
+
+
+def clean_spoken_text(text: str) -> str:
+    """Plain text for speech: no SSML/HTML tags, markdown symbols or emoji."""
+    text = html.unescape(MARKUP_PATTERN.sub(" ", str(text)))
+    text = EMOJI_PATTERN.sub("", text)
+    text = LINE_MARKER_PATTERN.sub("", text)
+    return text.strip()
+
+
+def _say_as(match) -> str:
+    if match.group("time"):
+        return f'<say-as interpret-as="time" format="hms24">{match.group("time").replace(".", ":")}</say-as>'
+    number = match.group("grouped") or match.group("integer")
+    return f'<say-as interpret-as="cardinal">{number.replace(",", "")}</say-as>'
+
+
+def _sentence_markup(sentence: str) -> str:
+    escaped = html.escape(sentence, quote=False)
+    escaped = SAY_AS_PATTERN.sub(_say_as, escaped)
+    escaped = BOLD_PATTERN.sub(r'<emphasis level="moderate">\1</emphasis>', escaped)
+    return MARKDOWN_LEFTOVER_PATTERN.sub("", escaped).strip()
+
+
+def text_to_ssml(text: str, rate: str = DEFAULT_RATE, pitch: str = DEFAULT_PITCH) -> str:
+    """
+    Deterministic SSML from plain text: one <s> per sentence with a <break/>
+    between sentences (longer between paragraphs), **bold** -> <emphasis>,
+    times and whole numbers -> <say-as>. Prosody is applied per sentence so
+    no <break/> ends up inside <prosody> (Neural2 rejects that).
+    """
+    paragraphs = [p for p in re.split(r"\n\s*\n", clean_spoken_text(text)) if p.strip()]
+    parts = []
+    for p_idx, paragraph in enumerate(paragraphs):
+        if p_idx:
+            parts.append(f'<break time="{PARAGRAPH_BREAK}"/>')
+        sentences = split_sentences(paragraph.replace("\n", " "), min_chars=1)
+        for s_idx, sentence in enumerate(sentences):
+            markup = _sentence_markup(sentence)
+            if not markup:
+                continue
+            if s_idx:
+                parts.append(f'<break time="{SENTENCE_BREAK}"/>')
+            parts.append(f'<s><prosody rate="{rate}" pitch="{pitch}">{markup}</prosody></s>')
+    return f"<speak>{''.join(parts)}</speak>"
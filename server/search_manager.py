@@ -1,5 +1,8 @@
 # assistant/search_manager.py (refactored with context builder integration)
 
+import asyncio
+import threading
+import httpx
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
@@ -13,13 +16,41 @@ from deep_translator import GoogleTranslator
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from latency_logger import LatencyLogger
 from urllib.parse import urlparse
-from playwright.sync_api import sync_playwright
 
 
 from .search_to_context_builder import SearchToContextBuilder
+from .async_http import get_async_http_client, get_http_session
+from .browser_pool import get_browser_pool
+from .context_composer import truncate_to_tokens
+from .ttl_cache import PersistentTTLCache
+from .text_normalizer import normalize_utterance
+from .freshness import freshness_class, freshness_ttl
+from .usage_tracker_instance import usage_tracker
 
 logger = get_logger(__name__)
 
+SERPER_URL = "https://google.serper.dev/search"
+SERPER_TIMEOUT_SEC = (3.0, 8.0)        # (connect, read) ต่อ call
+TRANSLATE_TIMEOUT_SEC = 3.0            # แปลไม่ทัน -> ค้นภาษาอังกฤษด้วยคำถามเดิม
+SEARCH_CACHE_MAX_ENTRIES = 500
+SEARCH_CACHE_STALE_RATIO = 0.5         # หมดอายุแล้วยังตอบจาก cache ได้อีกครึ่งหนึ่งของ TTL ระหว่าง refresh เบื้องหลัง
+TRANSLATION_CACHE_TTL_SEC = 30 * 24 * 3600
+TRANSLATION_CACHE_MAX_ENTRIES = 2000
+TOP_STORIES_MAX = 5
+KNOWLEDGE_GRAPH_MAX_ATTRIBUTES = 6
+DIRECT_ANSWER_MAX_TOKENS = 200         # คำตอบจาก answerBox/knowledgeGraph ที่ส่งเข้า answer prompt โดยตรง
+SEARCH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="serper")
+TRANSLATE_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="translate")  # แยก pool: งานใน SEARCH_POOL รอผลแปลอยู่
+
+WEB_SUMMARY_INPUT_TOKENS = 1200  # ผลค้นหาที่ส่งให้ GPT สรุป (ตัดที่ขอบประโยค ไม่ใช่ตัดตามจำนวนตัวอักษร)
+WEB_SUMMARY_INSTRUCTIONS = (
+    "คุณเป็นผู้ช่วยที่สามารถสรุปข้อมูลจากเว็บได้อย่างแม่นยำ และเข้าใจภาษาไทยอย่างลึกซึ้ง\n"
+    "กรุณาสรุปคำตอบแบบกระชับ ชัดเจน ภายใน 3-5 บรรทัด\n"
+    "- ถ้ามีข้อมูลที่เกี่ยวข้อง ให้ตอบโดยอ้างอิงอย่างมั่นใจ\n"
+    "- ถ้าไม่เจอข้อมูล ให้ตอบว่า 'ยังไม่พบข้อมูลล่าสุดจ้า'\n"
+    "- ห้ามคาดเดาเกินจริงหรือพูดคลุมเครือ"
+)
+
 import re
 from datetime import datetime, timedelta
 from typing import List, Union
@@ -43,6 +74,21 @@ class SearchManager:
         self.serper_api_key = SERPER_API_KEY
         self.gpt_client = gpt_client
         self.context_builder = SearchToContextBuilder()
+        # ttl ของผลค้นหากำหนดต่อ entry ตาม freshness ของคำถาม (ค่า default คือ evergreen)
+        self.search_cache = PersistentTTLCache(
+            "serper", ttl_seconds=freshness_ttl(""), max_entries=SEARCH_CACHE_MAX_ENTRIES,
+            stale_ratio=SEARCH_CACHE_STALE_RATIO
+        )
+        self.translation_cache = PersistentTTLCache(
+            "translation", ttl_seconds=TRANSLATION_CACHE_TTL_SEC, max_entries=TRANSLATION_CACHE_MAX_ENTRIES
+        )
+        self._refreshing = set()
+        self.answer_stats = {"direct": 0, "summarized": 0}
+        self._answer_stats_lock = threading.Lock()
+        self._refreshing_lock = threading.Lock()
+        usage_tracker.register_stats("serper_cache", self.search_cache.stats)
+        usage_tracker.register_stats("translation_cache", self.translation_cache.stats)
+        usage_tracker.register_stats("web_answers", self.get_answer_stats)
 
     import re
 
@@ -100,50 +146,193 @@ class SearchManager:
             print(f"❌ Translation error: {e}")
             return query
     
-    def search_dual_language(self, query, top_k=5):
-        lang = self.detect_language(query)
+    def _translate_query(self, query: str) -> str:
+        """Thai -> English for the secondary search; the caller already knows the query isn't English."""
+        cache_key = normalize_utterance(query)
+        cached = self.translation_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            return cached
+        try:
+            translated = GoogleTranslator(source='th', target='en').translate(query)
+        except Exception as e:
+            logger.warning(f"⚠️ Translation failed, searching English with original query: {e}")
+            return query
+        if not translated:
+            return query
+        if cache_key:
+            self.translation_cache.put(cache_key, translated)
+        return translated
 
-        # Primary: Original language
-        if lang == 'en':
-            results_primary = self.search_serper(query, top_k=top_k, lang_code='en')
-        else:
-            results_primary = self.search_serper(query, top_k=top_k, lang_code='th')
-            results_secondary = self.search_serper(self.translate_for_search(query), top_k=top_k, lang_code="en")
+    def _search_translated(self, query, top_k, ttl_seconds=None):
+        translated = query
+        future = TRANSLATE_POOL.submit(self._translate_query, query)
+        try:
+            translated = future.result(timeout=TRANSLATE_TIMEOUT_SEC)
+        except Exception as e:
+            logger.warning(f"⚠️ Translation timed out, searching English with original query: {e}")
+        return self.search_serper(translated, top_k=top_k, lang_code="en", ttl_seconds=ttl_seconds)
 
+    async def _search_translated_async(self, query, top_k, ttl_seconds=None):
+        try:
+            translated = await asyncio.wait_for(asyncio.to_thread(self._translate_query, query), TRANSLATE_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Translation timed out, searching English with original query")
+            translated = query
+        return await self.search_serper_async(translated, top_k=top_k, lang_code="en", ttl_seconds=ttl_seconds)
 
-        # # Secondary: Parallel search in other language
-        # alt_lang = 'th' if lang == 'en' else 'en'
-        # results_secondary = self.search_serper(query, top_k=top_k, lang_code=alt_lang)
+    def _merge_results(self, outcomes, top_k):
+        """
+        outcomes: [(lang_code, results or exception)] in priority order.
+        One failed language is tolerated; if every search failed the first error is raised.
+        Organic results and top stories are de-duplicated by URL; answer box and
+        knowledge graph come from the first language that has one.
+        """
+        errors = [result for _, result in outcomes if isinstance(result, BaseException)]
+        if errors and len(errors) == len(outcomes):
+            raise errors[0]
+        for lang_code, result in outcomes:
+            if isinstance(result, BaseException):
+                logger.warning(f"⚠️ Serper search ({lang_code}) failed, using the other language only: {result}")
+
+        results = [result for _, result in outcomes if not isinstance(result, BaseException)]
+        return {
+            "organic": self._dedupe_by_link(r["organic"] for r in results)[:top_k * 2],  # up to 2x top_k entries
+            "answer_box": next((r["answer_box"] for r in results if r.get("answer_box")), None),
+            "knowledge_graph": next((r["knowledge_graph"] for r in results if r.get("knowledge_graph")), None),
+            "top_stories": self._dedupe_by_link(r["top_stories"] for r in results)[:TOP_STORIES_MAX],
+        }
 
-        # Combine & de-duplicate by URL
+    def _dedupe_by_link(self, item_lists):
         seen = set()
         combined = []
-        for item in results_primary + results_secondary:
-            url = item.get("link")
-            if url and url not in seen:
-                seen.add(url)
-                combined.append(item)
-
-        return combined[:top_k * 2]  # return up to 2x top_k entries
+        for items in item_lists:
+            for item in items:
+                url = item.get("link")
+                if url and url not in seen:
+                    seen.add(url)
+                    combined.append(item)
+        return combined
 
+    def search_dual_language(self, query, top_k=5):
+        """
+        English queries: one English search. Otherwise the Thai search and the
+        translate-then-English search run concurrently over the shared HTTP session.
+        """
+        if self.detect_language(query) == 'en':
+            return self._merge_results([("en", self.search_serper(query, top_k=top_k, lang_code='en'))], top_k)
+
+        # อายุ cache ของทั้งสองภาษาคิดจากคำถามเดิม (คำแปลอาจไม่มี keyword ภาษาไทย)
+        ttl_seconds = freshness_ttl(query)
+        futures = [
+            ("th", SEARCH_POOL.submit(self.search_serper, query, top_k, "th", ttl_seconds)),
+            ("en", SEARCH_POOL.submit(self._search_translated, query, top_k, ttl_seconds)),
+        ]
+        outcomes = []
+        for lang_code, future in futures:
+            try:
+                outcomes.append((lang_code, future.result()))
+            except Exception as e:
+                outcomes.append((lang_code, e))
+        return self._merge_results(outcomes, top_k)
+
+    async def search_dual_language_async(self, query, top_k=5):
+        if self.detect_language(query) == 'en':
+            return self._merge_results([("en", await self.search_serper_async(query, top_k=top_k, lang_code='en'))], top_k)
+
+        ttl_seconds = freshness_ttl(query)
+        results = await asyncio.gather(
+            self.search_serper_async(query, top_k=top_k, lang_code='th', ttl_seconds=ttl_seconds),
+            self._search_translated_async(query, top_k, ttl_seconds),
+            return_exceptions=True,
+        )
+        return self._merge_results(list(zip(("th", "en"), results)), top_k)
 
-    def search_serper(self, query, top_k=5, lang_code="th"):
-        #logger.debug(f"Enter search_serper : query = {query} : top_k={top_k}")
-        url = "https://google.serper.dev/search"
+    def _serper_request(self, query, top_k, lang_code):
         headers = {"X-API-KEY": self.serper_api_key}
         payload = {"q": query, "hl": lang_code, "gl": lang_code, "num": top_k}
+        return SERPER_URL, headers, payload
+
+    def _search_cache_key(self, query, top_k, lang_code):
+        return f"{lang_code}:{top_k}:{normalize_utterance(query)}"
+
+    def _cached_search(self, query, top_k, lang_code, ttl_seconds):
+        """
+        Cached results or None. An expired entry inside its stale window is still
+        returned and refreshed in the background (stale-while-revalidate).
+        """
+        cache_key = self._search_cache_key(query, top_k, lang_code)
+        results, stale = self.search_cache.get_stale(cache_key)
+        if results is None:
+            return None
+        if stale:
+            logger.info(f"💾 Serper cache stale hit ({lang_code}), refreshing in background: {query}")
+            self._refresh_in_background(cache_key, query, top_k, lang_code, ttl_seconds)
+        else:
+            logger.info(f"💾 Serper cache hit ({lang_code}): {query}")
+        return results
+
+    def _store_search(self, query, top_k, lang_code, results, ttl_seconds):
+        # ผลว่างมักเป็นความผิดพลาดชั่วคราว ไม่ cache
+        if results["organic"] or results["answer_box"] or results["knowledge_graph"]:
+            cache_key = self._search_cache_key(query, top_k, lang_code)
+            self.search_cache.put(cache_key, results, ttl_seconds=ttl_seconds or freshness_ttl(query))
 
-        res = requests.post(url, headers=headers, json=payload)
+    def _refresh_in_background(self, cache_key, query, top_k, lang_code, ttl_seconds):
+        with self._refreshing_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+
+        def _refresh():
+            try:
+                results = self._fetch_serper(query, top_k, lang_code)
+                self._store_search(query, top_k, lang_code, results, ttl_seconds)
+            except Exception as e:
+                logger.warning(f"⚠️ Background Serper refresh failed ({lang_code}): {e}")
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(cache_key)
+
+        SEARCH_POOL.submit(_refresh)
+
+    def _fetch_serper(self, query, top_k, lang_code):
+        url, headers, payload = self._serper_request(query, top_k, lang_code)
+
+        res = get_http_session().post(url, headers=headers, json=payload, timeout=SERPER_TIMEOUT_SEC)
         res.raise_for_status()
-        data = res.json()
-        results = data.get("organic", [])[:top_k]
-        # logger.debug("calling normalize_thai_date")
-        # for item in results:
-        #     original_snippet = item.get("snippet", "")
-        #     normalized_snippet = self.normalize_thai_date(original_snippet)
-        #     item["snippet"] = normalized_snippet  # 🔁 แทนที่ snippet เดิมด้วยข้อความที่ normalize แล้ว
-
-        # logger.debug("Exit search_serper")
+        return self._parse_serper(res.json(), top_k)
+
+    def _parse_serper(self, data, top_k):
+        """Keep Serper's structured blocks (answerBox, knowledgeGraph, topStories) next to the organic results."""
+        return {
+            "organic": data.get("organic", [])[:top_k],
+            "answer_box": data.get("answerBox"),
+            "knowledge_graph": data.get("knowledgeGraph"),
+            "top_stories": data.get("topStories", [])[:TOP_STORIES_MAX],
+        }
+
+    def search_serper(self, query, top_k=5, lang_code="th", ttl_seconds=None):
+        results = self._cached_search(query, top_k, lang_code, ttl_seconds)
+        if results is not None:
+            return results
+        results = self._fetch_serper(query, top_k, lang_code)
+        self._store_search(query, top_k, lang_code, results, ttl_seconds)
+        return results
+
+    async def search_serper_async(self, query, top_k=5, lang_code="th", ttl_seconds=None):
+        results = self._cached_search(query, top_k, lang_code, ttl_seconds)
+        if results is not None:
+            return results
+
+        url, headers, payload = self._serper_request(query, top_k, lang_code)
+        connect_timeout, read_timeout = SERPER_TIMEOUT_SEC
+        res = await get_async_http_client().post(
+            url, headers=headers, json=payload,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+        res.raise_for_status()
+        results = self._parse_serper(res.json(), top_k)
+        self._store_search(query, top_k, lang_code, results, ttl_seconds)
         return results
 
     def should_fetch(self, link, snippet):
@@ -180,36 +369,19 @@ class SearchManager:
             print("   Reason:", str(e))
             return None, None
 
+    def _parse_rendered(self, url, html_content):
+        if not html_content:
+            return None, None
+        soup = BeautifulSoup(html_content, "html.parser")
+        logger.debug(f"✅ Rendered with browser: {url} (title: {soup.title.string if soup.title else 'N/A'})")
+        return html_content, soup
+
     def fetch_with_playwright(self, url):
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/114.0.0.0 Safari/537.36"
-            )
-        }
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page = browser.new_page()
-                page.goto(url, timeout=15000)
-                page.wait_for_load_state("networkidle")
-                html_content = page.content()
-                soup = BeautifulSoup(html_content, "html.parser")
-
-                print(f"\n✅ Successfully rendered with Playwright: {url}\n")
-                print("=" * 80)
-                print(html_content[:3000])
-                print("=" * 80)
-                print("📌 Page Title:", soup.title.string if soup.title else "N/A")
-
-                browser.close()
-                return html_content, soup
+        """(html, soup) rendered by the shared headless browser, or (None, None)."""
+        return self._parse_rendered(url, get_browser_pool().fetch(url))
 
-        except Exception as e:
-            print(f"\n❌ Failed to render {url} with Playwright")
-            print("   Reason:", str(e))
-            return None, None
+    async def fetch_with_playwright_async(self, url):
+        return self._parse_rendered(url, await get_browser_pool().fetch_async(url))
 
     def fetch_webpage_content(self, url):
         headers = {
@@ -242,14 +414,70 @@ class SearchManager:
                 results[url] = future.result()
         return results
     
+    def _count_answer(self, key):
+        with self._answer_stats_lock:
+            self.answer_stats[key] += 1
+
+    def get_answer_stats(self):
+        with self._answer_stats_lock:
+            return dict(self.answer_stats)
+
+    def direct_answer(self, search_results, question):
+        """
+        Compact answer straight from Serper when it is confident enough to skip the
+        summarize_web LLM call: an answerBox with an explicit answer / highlighted
+        snippet (prices, scores, conversions), or for evergreen questions a
+        knowledgeGraph description (definitions, people, places). None otherwise.
+        """
+        box = search_results.get("answer_box") or {}
+        graph = search_results.get("knowledge_graph") or {}
+        answer = box.get("answer") or box.get("snippetHighlighted")
+        if isinstance(answer, list):
+            answer = ", ".join(str(part) for part in answer)
+
+        if answer:
+            parts = [f"คำตอบ: {answer}"]
+            if box.get("title"):
+                parts.append(f"หัวข้อ: {box['title']}")
+            if box.get("snippet") and box["snippet"] != answer:
+                parts.append(box["snippet"])
+            if box.get("date"):
+                parts.append(f"ข้อมูล ณ {box['date']}")
+            source = "answerBox"
+        elif graph.get("description") and freshness_class(question) == "evergreen":
+            parts = [f"{graph.get('title', '')}: {graph['description']}".strip(": ")]
+            attributes = list((graph.get("attributes") or {}).items())[:KNOWLEDGE_GRAPH_MAX_ATTRIBUTES]
+            parts.extend(f"{name}: {value}" for name, value in attributes)
+            source = "knowledgeGraph"
+        else:
+            self._count_answer("summarized")
+            return None
+
+        # นับ direct หลังตัดแล้วเท่านั้น: ถ้าตัดแล้วว่าง ผู้เรียกจะสรุปผลค้นหาด้วย LLM ตามปกติ
+        direct = truncate_to_tokens("\n".join(parts), DIRECT_ANSWER_MAX_TOKENS)
+        if not direct:
+            self._count_answer("summarized")
+            return None
+        self._count_answer("direct")
+        logger.info(f"⚡ Direct answer from Serper {source}, skipping web summary")
+        return direct
+
     def build_context_from_search_results(self, search_results, enable_fetch=True):
         logger.debug("Enter build_context_from_search_results")
         context_parts = []
 
-        urls = [item.get('link') for item in search_results if item.get('link')] if enable_fetch else []
+        box = search_results.get("answer_box") or {}
+        box_text = box.get("answer") or box.get("snippet")
+        if box_text:
+            context_parts.append(f"Google Answer: {box.get('title', '')}\n{box_text}".strip())
+        for story in search_results.get("top_stories", []):
+            context_parts.append(f"ข่าว: {story.get('title', '')} ({story.get('source', '')} {story.get('date', '')})".strip())
+
+        organic = search_results.get("organic", [])
+        urls = [item.get('link') for item in organic if item.get('link')] if enable_fetch else []
         webpage_contents = self.fetch_all_webpages(urls) if enable_fetch else {}
 
-        for idx, item in enumerate(search_results, 1):
+        for idx, item in enumerate(organic, 1):
             title = item.get('title', '')
             snippet = item.get('snippet', '')
             link = item.get('link', '')
@@ -303,24 +531,35 @@ class SearchManager:
 
         # Fallback: let GPT summarize as before
         #print(f"context_str={context_str[:3000]}")
-        today_th = datetime.today().strftime("%-d %B %Y")  # เช่น '23 May 2025'
+        prompt = self._build_summary_prompt(context_str, user_question)
 
-        prompt = (
-            f"คุณเป็นผู้ช่วยที่สามารถสรุปข้อมูลจากเว็บได้อย่างแม่นยำ และเข้าใจภาษาไทยอย่างลึกซึ้ง\n"
-            f"วันนี้คือวันที่ {today_th} กรุณาใช้บริบทนี้ประกอบการตีความคำว่า 'วันนี้' หรือ 'ล่าสุด'\n\n"
-            f"คำถามของผู้ใช้:\n{user_question}\n\n"
-            f"ข้อมูลที่ได้จากเว็บ (บางส่วน):\n{context_str[:3000]}\n\n"
-            f"กรุณาสรุปคำตอบแบบกระชับ ชัดเจน ภายใน 3-5 บรรทัด\n"
-            f"- ถ้ามีข้อมูลที่เกี่ยวข้อง ให้ตอบโดยอ้างอิงอย่างมั่นใจ\n"
-            f"- ถ้าไม่เจอข้อมูล ให้ตอบว่า 'ยังไม่พบข้อมูลล่าสุดจ้า'\n"
-            f"- ห้ามคาดเดาเกินจริงหรือพูดคลุมเครือ"
-        )
+        try:
+            summary = self.gpt_client.chat_manager.ask_simple(prompt, task="summarize_web")
+            logger.debug(f"summarized = {summary}")
+            return summary.strip() if summary else ""
+        except Exception as e:
+            logger.error(f"❌ Error summarizing context: {e}")
+            return ""
 
+    async def summarize_web_context_async(self, context_str, user_question):
+        logger.debug("Enter summarize_web_context_async")
+        prompt = self._build_summary_prompt(context_str, user_question)
 
         try:
-            summary = self.gpt_client.chat_manager.ask_simple(prompt)
-            print(f"summarized = {summary}")
+            summary = await self.gpt_client.chat_manager.ask_simple_async(prompt, task="summarize_web")
+            logger.debug(f"summarized = {summary}")
             return summary.strip() if summary else ""
         except Exception as e:
             logger.error(f"❌ Error summarizing context: {e}")
             return ""
+
+    def _build_summary_prompt(self, context_str, user_question):
+        today_th = datetime.today().strftime("%-d %B %Y")  # เช่น '23 May 2025'
+
+        # ส่วนคงที่ขึ้นก่อน (cacheable prefix) ส่วนที่เปลี่ยนทุกครั้ง (วันที่ ข้อมูลเว็บ คำถาม) อยู่ท้าย
+        return (
+            f"{WEB_SUMMARY_INSTRUCTIONS}\n\n"
+            f"วันนี้คือวันที่ {today_th} กรุณาใช้บริบทนี้ประกอบการตีความคำว่า 'วันนี้' หรือ 'ล่าสุด'\n\n"
+            f"ข้อมูลที่ได้จากเว็บ (บางส่วน):\n{truncate_to_tokens(context_str, WEB_SUMMARY_INPUT_TOKENS)}\n\n"
+            f"คำถามของผู้ใช้:\n{user_question}"
+        )
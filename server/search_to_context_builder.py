@@ -4,17 +4,17 @@ from datetime import datetime
 from typing import Optional, Dict, Any, List
 import re
 from dateutil.parser import parse
-from openai import OpenAI
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from config import OPENAI_API_KEY
+from .llm_gateway import get_llm_gateway
+from .llm_schemas import EntityList
 
 class SearchToContextBuilder:
     def __init__(self):
         self.today = datetime.today().strftime("%d %B %Y")
         self.exclusion_keywords = ["1 ปี", "ทั้งปี", "ทุกสนาม", "ฤดูกาล"]
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.llm = get_llm_gateway()
 
     def contains_exclusion_keyword(self, text: str) -> bool:
         return any(kw in text for kw in self.exclusion_keywords)
@@ -82,23 +82,20 @@ class SearchToContextBuilder:
     def infer_with_gpt(self, text: str) -> List[Dict[str, str]]:
         try:
             prompt = (
-                f"Extract key entities from this text. Return a JSON list of objects like this:\n"
-                f"[{{ \"type\": \"topic\", \"value\": \"ฟอร์มูล่าวัน\" }}]\n"
+                f"Extract key entities from this text as a list of objects like "
+                f"{{ \"type\": \"topic\", \"value\": \"ฟอร์มูล่าวัน\" }}\n"
                 f"Text:\n{text}"
             )
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+            result = self.llm.chat_structured(
+                EntityList,
+                task="extract_json",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0
             )
-            content = response.choices[0].message.content
-            match = re.search(r"\[(.*?)\]", content, re.DOTALL)
-            if match:
-                json_text = "[" + match.group(1).strip() + "]"
-                return eval(json_text)
+            return [entity.model_dump() for entity in result.entities]
         except Exception:
-            pass
-        return []
+            # parse failure ถูกนับใน llm_gateway stats แล้ว
+            return []
 
     def extract_entities(self, text: str) -> Dict[str, Any]:
         result = self.extract_with_pattern(text)
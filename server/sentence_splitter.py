@@ -0,0 +1,206 @@
+# server/sentence_splitter.py
+import html
+import re
+from pythainlp.tokenize import sent_tokenize
+
+MIN_SENTENCE_CHARS = 24  # ประโยคที่สั้นกว่านี้จะถูกรวมกับประโยคถัดไป เพื่อไม่ให้ยิง TTS ถี่เกินไป
+
+SEGMENT_MIN_CHARS = 60      # ความยาวขั้นต่ำของ segment ที่ส่งไป TTS แบบขนาน
+SEGMENT_MAX_CHARS = 1000    # กันไม่ให้ชน request size limit ของ Google TTS (5000 bytes, ภาษาไทย ~3 bytes/ตัวอักษร)
+
+BREAK_TAG_PATTERN = re.compile(r"<break[^>]*/?>", re.IGNORECASE)
+SSML_TAG_PATTERN = re.compile(r"<[^>]*>")
+SSML_TOKEN_PATTERN = re.compile(r"(<[^>]+>)")
+TAG_NAME_PATTERN = re.compile(r"<\s*/?\s*([\w:-]+)")
+
+
+def strip_ssml(text: str) -> str:
+    """Remove SSML/markup tags and unescape entities, keeping <break/> as a pause (space)."""
+    text = BREAK_TAG_PATTERN.sub(" ", text)
+    text = SSML_TAG_PATTERN.sub("", text)
+    return html.unescape(text)
+
+
+def _merge_short(sentences, min_chars):
+    merged = []
+    pending = ""
+    for sentence in sentences:
+        pending = f"{pending} {sentence}".strip() if pending else sentence
+        if len(pending) >= min_chars:
+            merged.append(pending)
+            pending = ""
+    if pending:
+        if merged:
+            merged[-1] = f"{merged[-1]} {pending}"
+        else:
+            merged.append(pending)
+    return merged
+
+
+def _tokenize_block(block: str):
+    return [s.strip() for s in sent_tokenize(block) if s.strip()]
+
+
+def split_sentences(text: str, min_chars: int = MIN_SENTENCE_CHARS):
+    """Split a complete (plain) text into speakable sentences."""
+    sentences = []
+    for block in re.split(r"\n+", text):
+        block = block.strip()
+        if block:
+            sentences.extend(_tokenize_block(block))
+    return _merge_short(sentences, min_chars)
+
+
+def _hard_wrap(sentence: str, max_chars: int):
+    """Split an overlong sentence on spaces so no segment exceeds max_chars."""
+    if len(sentence) <= max_chars:
+        return [sentence]
+    pieces, current = [], ""
+    for word in sentence.split(" "):
+        if current and len(current) + len(word) + 1 > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text_segments(text: str, min_chars: int = SEGMENT_MIN_CHARS, max_chars: int = SEGMENT_MAX_CHARS):
+    """Sentence-sized plain-text segments for parallel synthesis."""
+    segments = []
+    for sentence in split_sentences(text, min_chars=min_chars):
+        segments.extend(_hard_wrap(sentence, max_chars))
+    return segments
+
+
+def split_ssml(ssml: str, min_chars: int = SEGMENT_MIN_CHARS, max_chars: int = SEGMENT_MAX_CHARS):
+    """
+    Split an SSML document into several standalone <speak> documents at sentence
+    boundaries. Tags open at a cut (e.g. <prosody>, <s>) are closed at the end of
+    one segment and re-opened at the start of the next, so every segment is balanced.
+    """
+    body = re.sub(r"^\s*<speak[^>]*>|</speak>\s*$", "", ssml.strip())
+
+    segments = []
+    stack = []            # [(name, open_tag)]
+    prefix = []           # open tags in effect when the current segment started
+    pieces = []
+    length = 0
+
+    def flush():
+        nonlocal prefix, pieces, length
+        content = "".join(pieces).strip()
+        if content and SSML_TAG_PATTERN.sub("", content).strip():
+            closing = "".join(f"</{name}>" for name, _ in reversed(stack))
+            segments.append(f"<speak>{''.join(prefix)}{content}{closing}</speak>")
+        prefix = [tag for _, tag in stack]
+        pieces = []
+        length = 0
+
+    for token in SSML_TOKEN_PATTERN.split(body):
+        if not token:
+            continue
+        if token.startswith("<"):
+            name_match = TAG_NAME_PATTERN.match(token)
+            name = name_match.group(1) if name_match else ""
+            if token.startswith("</"):
+                pieces.append(token)
+                if stack and stack[-1][0] == name:
+                    stack.pop()
+                if name in ("s", "p") and length >= min_chars:
+                    flush()
+            elif token.endswith("/>"):
+                pieces.append(token)
+            else:
+                pieces.append(token)
+                stack.append((name, token))
+            continue
+
+        sentences = split_sentences(token, min_chars=1) if token.strip() else [token]
+        for idx, sentence in enumerate(sentences):
+            for part in _hard_wrap(sentence, max_chars):
+                if length and length + len(part) > max_chars:
+                    flush()
+                pieces.append(part if idx == 0 else f" {part}")
+                length += len(part)
+            is_last = idx == len(sentences) - 1
+            if not is_last and length >= min_chars:
+                flush()
+        if token.strip() and token[-1].isspace() and length >= min_chars:
+            flush()
+
+    flush()
+    return segments
+
+
+class SentenceBuffer:
+    """
+    Incrementally cut streamed LLM tokens into complete Thai sentences.
+
+    feed() returns the sentences completed by the new delta; flush() returns
+    whatever is left once the stream ends. SSML tags emitted by the model are
+    stripped on the fly (a partially received tag is held back until closed).
+    """
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._raw = ""
+        self._text = ""
+        self._pending = ""
+
+    def _absorb_raw(self):
+        open_idx = self._raw.rfind("<")
+        cut = open_idx if open_idx > self._raw.rfind(">") else len(self._raw)
+        # hold back a half-received entity such as "&am" as well
+        amp_idx = self._raw.rfind("&", 0, cut)
+        if amp_idx >= 0 and ";" not in self._raw[amp_idx:cut] and cut - amp_idx < 10:
+            cut = amp_idx
+        self._text += strip_ssml(self._raw[:cut])
+        self._raw = self._raw[cut:]
+
+    def _emit(self, sentences):
+        ready = []
+        for sentence in sentences:
+            self._pending = f"{self._pending} {sentence}".strip() if self._pending else sentence
+            if len(self._pending) >= self.min_chars:
+                ready.append(self._pending)
+                self._pending = ""
+        return ready
+
+    def feed(self, delta: str):
+        if not delta:
+            return []
+        self._raw += delta
+        self._absorb_raw()
+
+        if not any(ch.isspace() for ch in delta):
+            return []
+
+        complete = []
+        # ขึ้นบรรทัดใหม่ถือว่าจบประโยคแน่นอน
+        *blocks, self._text = re.split(r"\n+", self._text)
+        for block in blocks:
+            if block.strip():
+                complete.extend(_tokenize_block(block))
+
+        if len(self._text) >= self.min_chars:
+            sentences = _tokenize_block(self._text)
+            if len(sentences) > 1:
+                complete.extend(sentences[:-1])
+                last_start = self._text.rfind(sentences[-1])
+                self._text = self._text[last_start:] if last_start >= 0 else sentences[-1]
+
+        return self._emit(complete)
+
+    def flush(self):
+        self._text += strip_ssml(self._raw)
+        self._raw = ""
+        sentences = split_sentences(self._text, min_chars=1)
+        self._text = ""
+        ready = self._emit(sentences)
+        if self._pending:
+            ready.append(self._pending)
+            self._pending = ""
+        return ready
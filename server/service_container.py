@@ -0,0 +1,86 @@
+# server/service_container.py
+import threading
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def _create_gpt_client():
+    from .gpt_integration import GPTClient
+    return GPTClient()
+
+
+def _create_intent_classifier():
+    from .intent_classifier.classifier import IntentClassifier
+    return IntentClassifier()
+
+
+def _create_tts_manager():
+    from .tts_manager import TTSManager
+    return TTSManager()
+
+
+DEFAULT_FACTORIES = {
+    "gpt_client": _create_gpt_client,
+    "intent_classifier": _create_intent_classifier,
+    "tts_manager": _create_tts_manager,
+}
+
+
+class ServiceContainer:
+    """
+    Process-wide holder for the heavy shared services (GPTClient with its
+    ChatManager / MemoryManager / SearchManager / summarizers, the intent
+    classifier, the TTS manager).
+
+    Created once in api_server and handed to IntentRouter, which injects it into
+    handlers. Each service is built lazily on first access and then reused, so a
+    turn never constructs OpenAI clients, SQLite connections or summarizer threads.
+    """
+
+    def __init__(self, factories=None):
+        self.factories = {**DEFAULT_FACTORIES, **(factories or {})}
+        self._instances = {}
+        self._lock = threading.Lock()
+        self.construction_counts = {}
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                factory = self.factories.get(name)
+                if factory is None:
+                    raise KeyError(f"Unknown service: {name}")
+                logger.info(f"🧩 Creating shared service: {name}")
+                instance = factory()
+                self._instances[name] = instance
+                self.construction_counts[name] = self.construction_counts.get(name, 0) + 1
+            return instance
+
+    def is_created(self, name: str) -> bool:
+        return name in self._instances
+
+    def close(self):
+        """Release resources held by services that were actually created."""
+        gpt_client = self._instances.get("gpt_client")
+        if gpt_client is not None:
+            gpt_client.memory_manager.close()
+        intent_classifier = self._instances.get("intent_classifier")
+        if intent_classifier is not None:
+            intent_classifier.cache.close()
+
+    @property
+    def gpt_client(self):
+        return self.get("gpt_client")
+
+    @property
+    def intent_classifier(self):
+        return self.get("intent_classifier")
+
+    @property
+    def tts_manager(self):
+        return self.get("tts_manager")
@@ -0,0 +1,104 @@
+# server/speech_stream.py
+import asyncio
+import base64
+import json
+from .sentence_splitter import SentenceBuffer, split_sentences, strip_ssml
+from .prosody import text_to_ssml
+from .turn_registry import TURN_CANCELLED_RESPONSE
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class SpeechStreamer:
+    """
+    Turns IntentRouter.route_stream_async events into an NDJSON stream:
+
+        {"type": "audio", "seq": 0, "text": "...", "audio": "<base64 mp3>"}
+        ...
+        {"type": "done", "response": {...}}
+
+    Each sentence is sent to TTS as soon as it is complete, while the LLM keeps
+    generating; audio events are emitted strictly in sentence order.
+    """
+
+    def __init__(self, tts_manager):
+        self.tts_manager = tts_manager
+
+    def _event(self, payload: dict) -> str:
+        return json.dumps(payload, ensure_ascii=False) + "\n"
+
+    async def _synthesize(self, sentence: str) -> bytes:
+        return await self.tts_manager.synthesize_audio_async(text_to_ssml(sentence), True)
+
+    async def _queue_sentence(self, queue: asyncio.Queue, sentence: str):
+        logger.debug(f"🔊 Sentence ready for TTS: {sentence}")
+        await queue.put((sentence, asyncio.create_task(self._synthesize(sentence))))
+
+    async def _produce(self, events, queue: asyncio.Queue, final: dict):
+        buffer = SentenceBuffer()
+        streamed = False
+        try:
+            async for event in events:
+                if event["type"] == "delta":
+                    streamed = True
+                    for sentence in buffer.feed(event["text"]):
+                        await self._queue_sentence(queue, sentence)
+                elif event["type"] == "result":
+                    final["result"] = event["result"]
+                    if streamed:
+                        sentences = buffer.flush()
+                    else:
+                        result = event["result"]
+                        reply = result.get("reply") or result.get("message") or ""
+                        sentences = split_sentences(strip_ssml(str(reply)))
+                    for sentence in sentences:
+                        await self._queue_sentence(queue, sentence)
+        finally:
+            await queue.put(None)
+
+    async def stream(self, events):
+        queue = asyncio.Queue()
+        final = {}
+        producer = asyncio.create_task(self._produce(events, queue, final))
+        seq = 0
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                if producer.cancelled():
+                    # producer ถูกยกเลิก (/cancel): ไม่สังเคราะห์/ส่งเสียงของประโยคที่เหลือ
+                    item[1].cancel()
+                    break
+                sentence, task = item
+                try:
+                    audio_content = await task
+                except Exception as e:
+                    logger.error(f"❌ TTS failed for streamed sentence: {e}")
+                    continue
+                yield self._event({
+                    "type": "audio",
+                    "seq": seq,
+                    "text": sentence,
+                    "audio": base64.b64encode(audio_content).decode("ascii")
+                })
+                seq += 1
+
+            try:
+                await producer
+            except asyncio.CancelledError:
+                if not producer.cancelled():
+                    raise
+                final["result"] = dict(TURN_CANCELLED_RESPONSE)
+            yield self._event({"type": "done", "response": final.get("result")})
+        except Exception as e:
+            logger.error(f"❌ Streaming turn failed: {e}")
+            yield self._event({"type": "error", "error": str(e)})
+        finally:
+            if not producer.done():
+                producer.cancel()
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item:
+                    item[1].cancel()
@@ -0,0 +1,100 @@
+# server/test_context_composer.py
+# run: python -m pytest server/test_context_composer.py
+import pytest
+
+pytest.importorskip("pythainlp")
+pytest.importorskip("pycrfsuite")   # sent_tokenize (crfcut)
+from server import context_composer
+from server.context_composer import ContextComposer, count_tokens, truncate_to_tokens
+
+
+class ByteEncoder:
+    """tiktoken-like encoder: one token per UTF-8 byte, so a cut can land inside a Thai character."""
+
+    def encode(self, text):
+        return list(text.encode("utf-8"))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8", errors="replace")
+
+
+@pytest.fixture
+def estimate_tokens(monkeypatch):
+    monkeypatch.setattr(context_composer, "_get_encoder", lambda: None)
+
+
+@pytest.fixture
+def byte_tokens(monkeypatch):
+    monkeypatch.setattr(context_composer, "_get_encoder", lambda: ByteEncoder())
+
+
+def test_sources_are_labelled_in_order(estimate_tokens):
+    composed = ContextComposer().compose({
+        "history": "User: เมื่อกี้ถามเรื่องอากาศ",
+        "web": "พรุ่งนี้ฝนตกหนักในกรุงเทพ",
+        "memory": "User: ชอบดื่มกาแฟตอนเช้า",
+    })
+
+    assert composed.index("ข้อมูลจากเว็บ:") < composed.index("ความทรงจำล่าสุด:") < composed.index("บทสนทนาก่อนหน้า:")
+
+
+def test_each_source_stays_within_its_budget(estimate_tokens):
+    web = "\n".join(f"ข่าวหัวข้อที่ {i} รายละเอียดเกี่ยวกับเหตุการณ์สำคัญในวันนี้" for i in range(200))
+    composer = ContextComposer(budgets={"web": 120})
+
+    composed = composer.compose({"web": web})
+
+    body = composed.split(":\n", 1)[1]
+    assert 0 < count_tokens(body) <= 120
+    assert body.startswith("ข่าวหัวข้อที่ 0")
+    assert composer.stats()["tokens_saved"] > 0
+
+
+def test_near_duplicates_across_sources_are_dropped(estimate_tokens):
+    sentence = "ราคาทองคำแท่งวันนี้ขายออกบาทละสี่หมื่นหนึ่งพันสองร้อยบาท"
+    composer = ContextComposer()
+
+    composed = composer.compose({"web": sentence, "history": f"Assistant: {sentence}"})
+
+    assert composed.count("สี่หมื่นหนึ่งพัน") == 1
+    assert "บทสนทนาก่อนหน้า" not in composed
+    assert composer.stats()["duplicates_dropped"] == 1
+
+
+def test_short_phrases_are_not_treated_as_duplicates(estimate_tokens):
+    composed = ContextComposer().compose({"memory": "User: hi", "history": "User: hi"})
+
+    assert "ความทรงจำล่าสุด" in composed and "บทสนทนาก่อนหน้า" in composed
+
+
+@pytest.mark.parametrize("tokens", ["estimate_tokens", "byte_tokens"])
+def test_oversized_sentence_is_cut_not_dropped(tokens, request):
+    request.getfixturevalue(tokens)
+
+    composed = ContextComposer().compose({"web": "ข้อมูล" * 1000, "memory": "User: hi"})
+
+    assert "ข้อมูลจากเว็บ:\nข้อมูล" in composed
+    web = composed.split("\n\n")[0].split(":\n", 1)[1]
+    assert count_tokens(web) <= context_composer.CONTEXT_TOKEN_BUDGETS["web"]
+    assert "�" not in web
+
+
+def test_oversized_sentence_survives_system_prompt_overflow(estimate_tokens):
+    system_prompt = "ระบบ" * 650   # 1300 tokens: เกิน budget ของ system 850 จน web เหลือ 50
+
+    composed = ContextComposer().compose({"web": "ข้อมูล" * 1000}, system_prompt=system_prompt)
+
+    assert composed.startswith("ข้อมูลจากเว็บ:\nข้อมูล")
+
+
+def test_truncate_to_tokens_cuts_long_unpunctuated_text(estimate_tokens):
+    text = "คำตอบ: " + "ข้อมูล" * 500
+
+    cut = truncate_to_tokens(text, 50)
+
+    assert cut.startswith("คำตอบ:")
+    assert 0 < count_tokens(cut) <= 50
+
+
+def test_truncate_to_tokens_keeps_short_text(estimate_tokens):
+    assert truncate_to_tokens("สวัสดีค่ะ", 50) == "สวัสดีค่ะ"
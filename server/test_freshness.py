@@ -0,0 +1,41 @@
+# server/test_freshness.py
+# run: python -m pytest server/test_freshness.py
+import pytest
+
+from server.freshness import freshness_class, needs_fresh_data
+
+
+@pytest.mark.parametrize("text", [
+    "ราคาทองวันนี้",
+    "ผลบอลเมื่อคืน",
+    "what is the latest news",
+    "Bitcoin price now",
+    "stock prices",
+    "เลือกตั้ง 2566",
+    "ประชุมวันที่ 12/5",
+])
+def test_time_sensitive_questions_need_fresh_data(text):
+    assert needs_fresh_data(text)
+
+
+@pytest.mark.parametrize("text", [
+    "do you know python",          # "now" ใน "know"
+    "tell me about snowboarding",  # "now" ใน "snow"
+    "who is the newscaster",       # "news" ใน "newscaster"
+    "explain concurrent programming",
+    "ทำไมท้องฟ้าเป็นสีฟ้า",
+])
+def test_evergreen_questions_do_not_need_fresh_data(text):
+    assert not needs_fresh_data(text)
+    assert freshness_class(text) == "evergreen"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("ราคาน้ำมันตอนนี้", "live"),
+    ("what is the score now", "live"),
+    ("ข่าววันนี้", "daily"),
+    ("I know the news today", "daily"),
+    ("ประวัติศาสตร์สุโขทัย", "evergreen"),
+])
+def test_freshness_class(text, expected):
+    assert freshness_class(text) == expected
@@ -0,0 +1,81 @@
+# server/test_llm_gateway.py
+# run: python -m pytest server/test_llm_gateway.py
+import asyncio
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("httpx")
+from server.llm_gateway import DEFAULT_MODEL_ROUTES, LLMGateway
+
+
+@pytest.fixture
+def gateway():
+    return LLMGateway(api_key="test-key", routes=DEFAULT_MODEL_ROUTES)   # ไม่ขึ้นกับ LLM_MODEL_ROUTES ใน config
+
+
+def test_hedge_win_is_recorded_under_task_name(gateway, monkeypatch):
+    monkeypatch.setattr(gateway, "hedge_delay", lambda task: 0.01)
+    delays = iter([1.0, 0.0])
+
+    async def make_attempt():
+        delay = next(delays)
+        await asyncio.sleep(delay)
+        return "slow" if delay else "hedge"
+
+    result = asyncio.run(gateway._hedged_async("classify", make_attempt))
+
+    assert result == "hedge"
+    assert gateway.hedges_fired == {"classify": 1}
+    assert gateway.hedges_won == {"classify": 1}
+
+
+def test_hedge_loser_is_cancelled(gateway, monkeypatch):
+    monkeypatch.setattr(gateway, "hedge_delay", lambda task: 0.01)
+    delays = iter([1.0, 0.0])
+    cancelled = []
+
+    async def make_attempt():
+        delay = next(delays)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return delay
+
+    asyncio.run(gateway._hedged_async("answer", make_attempt))
+
+    assert cancelled == [1.0]
+
+
+def test_answer_route_caps_max_tokens_but_general_does_not(gateway):
+    answer_kwargs, general_kwargs = {}, {}
+
+    gateway._apply_route("answer", answer_kwargs)
+    gateway._apply_route("general", general_kwargs)
+
+    assert answer_kwargs["max_tokens"] == 400
+    assert "max_tokens" not in general_kwargs
+    assert general_kwargs["model"] == answer_kwargs["model"]
+
+
+def test_call_arguments_override_route(gateway):
+    kwargs = {"model": "gpt-4o", "max_tokens": 50}
+
+    assert gateway._apply_route("answer", kwargs) == "gpt-4o"
+    assert kwargs["max_tokens"] == 50
+
+
+def test_unknown_task_falls_back_to_uncapped_default(gateway):
+    kwargs = {}
+    gateway._apply_route("no_such_task", kwargs)
+
+    assert "max_tokens" not in kwargs
+
+
+def test_routes_can_be_overridden_per_gateway():
+    gateway = LLMGateway(api_key="test-key", routes={"classify": {"model": "tiny", "max_tokens": 10}})
+    kwargs = {}
+
+    assert gateway._apply_route("classify", kwargs) == "tiny"
+    assert kwargs["max_tokens"] == 10
@@ -0,0 +1,49 @@
+# server/test_prosody.py
+# run: python -m pytest server/test_prosody.py
+import re
+import pytest
+
+pytest.importorskip("pythainlp")
+pytest.importorskip("pycrfsuite")   # sent_tokenize (crfcut)
+from server.prosody import clean_spoken_text, text_to_ssml
+from server.sentence_splitter import split_ssml, strip_ssml
+
+ANSWER = "## สรุป\n- ราคาทอง **วันนี้** 41,250 บาท เวลา 10:30 ค่ะ 😊\n\nพรุ่งนี้อาจขึ้น 3 บาท & ลดลงได้"
+
+
+def test_markdown_and_emoji_are_not_spoken():
+    text = clean_spoken_text(ANSWER)
+
+    assert "#" not in text and "😊" not in text
+    assert not re.search(r"^\s*-", text, re.MULTILINE)
+
+
+def test_numbers_times_and_bold_get_markup():
+    ssml = text_to_ssml(ANSWER)
+
+    assert '<say-as interpret-as="cardinal">41250</say-as>' in ssml
+    assert '<say-as interpret-as="time" format="hms24">10:30</say-as>' in ssml
+    assert '<emphasis level="moderate">วันนี้</emphasis>' in ssml
+    assert "&amp;" in ssml and "*" not in ssml
+
+
+def test_breaks_stay_outside_prosody():
+    ssml = text_to_ssml(ANSWER)
+
+    assert ssml.startswith("<speak>") and ssml.endswith("</speak>")
+    assert '<break time="600ms"/>' in ssml
+    for prosody in re.findall(r"<prosody[^>]*>.*?</prosody>", ssml):
+        assert "<break" not in prosody
+
+
+def test_decimals_are_left_alone():
+    assert "say-as" not in text_to_ssml("อัตราเงินเฟ้อ 1.5 เปอร์เซ็นต์")
+
+
+def test_generated_ssml_splits_into_segments_without_losing_text():
+    ssml = text_to_ssml(ANSWER)
+
+    segments = split_ssml(ssml, min_chars=10)
+
+    assert len(segments) > 1
+    assert re.sub(r"\s+", "", "".join(map(strip_ssml, segments))) == re.sub(r"\s+", "", strip_ssml(ssml))
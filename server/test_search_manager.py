@@ -0,0 +1,111 @@
+# server/test_search_manager.py
+# run: python -m pytest server/test_search_manager.py
+import pytest
+
+pytest.importorskip("pythainlp")
+pytest.importorskip("pycrfsuite")   # sent_tokenize (crfcut)
+pytest.importorskip("langdetect")
+pytest.importorskip("deep_translator")
+from server import context_composer
+from server.search_manager import SearchManager
+
+ORGANIC = [
+    {"title": "ราคาทองวันนี้", "snippet": "ทองคำแท่งขายออก 41,250 บาท", "link": "https://example.com/gold"},
+    {"title": "ข่าวเศรษฐกิจ", "snippet": "ตลาดหุ้นปิดบวก", "link": "https://example.com/news"},
+]
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # cache.db ของ PersistentTTLCache
+    monkeypatch.setattr(context_composer, "_get_encoder", lambda: None)
+    return SearchManager(gpt_client=None)
+
+
+def results(answer_box=None, knowledge_graph=None, organic=ORGANIC, top_stories=()):
+    return {
+        "answer_box": answer_box,
+        "knowledge_graph": knowledge_graph,
+        "top_stories": list(top_stories),
+        "organic": list(organic),
+    }
+
+
+def test_answer_box_list_answer_is_joined(manager):
+    box = {"answer": ["41,250 บาท", "41,150 บาท"], "title": "ราคาทองคำ", "date": "18 ต.ค. 2569"}
+
+    direct = manager.direct_answer(results(answer_box=box), "ราคาทองวันนี้เท่าไหร่")
+
+    assert direct.startswith("คำตอบ: 41,250 บาท, 41,150 บาท")
+    assert "หัวข้อ: ราคาทองคำ" in direct
+    assert "ข้อมูล ณ 18 ต.ค. 2569" in direct
+    assert manager.answer_stats == {"direct": 1, "summarized": 0}
+
+
+def test_answer_box_highlighted_snippet_is_used(manager):
+    box = {"snippetHighlighted": ["100 กิโลเมตร"], "snippet": "ระยะทางประมาณ 100 กิโลเมตร"}
+
+    direct = manager.direct_answer(results(answer_box=box), "กรุงเทพไปอยุธยากี่กิโล")
+
+    assert direct.startswith("คำตอบ: 100 กิโลเมตร")
+    assert "ระยะทางประมาณ 100 กิโลเมตร" in direct
+
+
+GRAPH = {
+    "title": "ดวงอาทิตย์",
+    "description": "ดาวฤกษ์ที่อยู่ใจกลางระบบสุริยะ",
+    "attributes": {f"คุณสมบัติ{i}": f"ค่า{i}" for i in range(10)},
+}
+
+
+def test_knowledge_graph_answers_evergreen_questions(manager):
+    direct = manager.direct_answer(results(knowledge_graph=GRAPH), "ดวงอาทิตย์คืออะไร")
+
+    assert direct.startswith("ดวงอาทิตย์: ดาวฤกษ์ที่อยู่ใจกลางระบบสุริยะ")
+    assert "คุณสมบัติ5: ค่า5" in direct
+    assert "คุณสมบัติ6" not in direct   # KNOWLEDGE_GRAPH_MAX_ATTRIBUTES
+    assert manager.answer_stats["direct"] == 1
+
+
+def test_knowledge_graph_is_ignored_for_time_sensitive_questions(manager):
+    assert manager.direct_answer(results(knowledge_graph=GRAPH), "ข่าวดวงอาทิตย์วันนี้") is None
+    assert manager.answer_stats == {"direct": 0, "summarized": 1}
+
+
+def test_no_answer_box_or_graph_falls_back_to_summary(manager):
+    assert manager.direct_answer(results(), "ราคาทองวันนี้") is None
+    assert manager.direct_answer(results(answer_box={"title": "ไม่มีคำตอบ"}), "ราคาทองวันนี้") is None
+    assert manager.answer_stats == {"direct": 0, "summarized": 2}
+
+
+def test_long_answer_is_truncated_and_counted_as_direct(manager):
+    box = {"answer": "ข้อมูล" * 1000}
+
+    direct = manager.direct_answer(results(answer_box=box), "ราคาทองวันนี้")
+
+    assert direct.startswith("คำตอบ: ข้อมูล")
+    assert context_composer.count_tokens(direct) <= 200
+    assert manager.answer_stats == {"direct": 1, "summarized": 0}
+
+
+def test_empty_truncation_is_not_counted_as_direct(manager, monkeypatch):
+    monkeypatch.setattr("server.search_manager.truncate_to_tokens", lambda text, max_tokens: "")
+
+    assert manager.direct_answer(results(answer_box={"answer": "42"}), "ราคาทองวันนี้") is None
+    assert manager.answer_stats == {"direct": 0, "summarized": 1}
+
+
+def test_build_context_includes_answer_box_stories_and_organic(manager):
+    stories = [{"title": "ทองขึ้นแรง", "source": "ข่าวสด", "date": "1 ชม.ที่แล้ว"}]
+    box = {"title": "ราคาทองคำ", "answer": "41,250 บาท"}
+
+    context = manager.build_context_from_search_results(results(answer_box=box, top_stories=stories), enable_fetch=False)
+
+    assert context.startswith("Google Answer: ราคาทองคำ\n41,250 บาท")
+    assert "ข่าว: ทองขึ้นแรง (ข่าวสด 1 ชม.ที่แล้ว)" in context
+    assert "1. ราคาทองวันนี้:" in context and "2. ข่าวเศรษฐกิจ:" in context
+    assert "Extracted Content: N/A" in context
+
+
+def test_build_context_without_results_is_empty(manager):
+    assert manager.build_context_from_search_results(results(organic=[]), enable_fetch=False) == ""
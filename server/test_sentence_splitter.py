@@ -0,0 +1,113 @@
+# server/test_sentence_splitter.py
+# run: python -m pytest server/test_sentence_splitter.py
+import re
+import pytest
+
+pytest.importorskip("pythainlp")
+pytest.importorskip("pycrfsuite")   # sent_tokenize (crfcut)
+from server.sentence_splitter import (
+    SSML_TOKEN_PATTERN, TAG_NAME_PATTERN, SentenceBuffer, split_ssml, split_text_segments, strip_ssml
+)
+
+ANSWER = (
+    "วันนี้อากาศที่กรุงเทพร้อนมากค่ะ อุณหภูมิสูงสุดประมาณสามสิบห้าองศา "
+    "ช่วงบ่ายอาจมีฝนฟ้าคะนองบางพื้นที่ ควรพกร่มติดตัวไว้ด้วยนะคะ"
+)
+SSML = (
+    '<speak><prosody rate="95%"><s>' + ANSWER + '</s><break time="300ms"/>'
+    "<s>พรุ่งนี้ &amp; มะรืนนี้อากาศจะเย็นลงเล็กน้อยค่ะ</s></prosody></speak>"
+)
+
+
+def squash(text):
+    return re.sub(r"\s+", "", text)
+
+
+def feed_in_chunks(buffer, text, size):
+    sentences = []
+    for i in range(0, len(text), size):
+        sentences.extend(buffer.feed(text[i:i + size]))
+    return sentences + buffer.flush()
+
+
+def assert_balanced(ssml):
+    stack = []
+    for token in SSML_TOKEN_PATTERN.split(ssml):
+        if not token.startswith("<") or token.endswith("/>"):
+            continue
+        name = TAG_NAME_PATTERN.match(token).group(1)
+        if token.startswith("</"):
+            assert stack and stack.pop() == name, ssml
+        else:
+            stack.append(name)
+    assert stack == [], ssml
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 50])
+def test_sentence_buffer_keeps_all_text_whatever_the_chunking(chunk_size):
+    sentences = feed_in_chunks(SentenceBuffer(), ANSWER, chunk_size)
+
+    assert len(sentences) > 1
+    assert squash("".join(sentences)) == squash(ANSWER)
+
+
+def test_sentence_buffer_emits_before_stream_ends():
+    buffer = SentenceBuffer()
+    early = []
+    for i in range(0, len(ANSWER), 5):
+        early.extend(buffer.feed(ANSWER[i:i + 5]))
+
+    assert early
+    assert all(len(sentence) >= buffer.min_chars for sentence in early)
+
+
+def test_sentence_buffer_strips_tags_and_entities_split_across_deltas():
+    buffer = SentenceBuffer(min_chars=1)
+    sentences = []
+    for delta in ["วันนี้<pro", 'sody rate="90%">อากาศดี &am', "p; สดใสมากค่ะ ", "พรุ่งนี้</prosody> ฝนตกค่ะ"]:
+        sentences.extend(buffer.feed(delta))
+    sentences.extend(buffer.flush())
+
+    text = " ".join(sentences)
+    assert "<" not in text and "&amp;" not in text
+    assert squash(text) == squash("วันนี้อากาศดี & สดใสมากค่ะ พรุ่งนี้ ฝนตกค่ะ")
+
+
+def test_sentence_buffer_flush_on_empty_stream():
+    assert SentenceBuffer().flush() == []
+
+
+def test_split_ssml_segments_are_balanced_standalone_documents():
+    segments = split_ssml(SSML, min_chars=20)
+
+    assert len(segments) > 1
+    for segment in segments:
+        assert segment.startswith("<speak>") and segment.endswith("</speak>")
+        assert_balanced(segment)
+        assert segment.count('<prosody rate="95%">') == 1
+
+
+def test_split_ssml_keeps_text_and_order():
+    segments = split_ssml(SSML, min_chars=20)
+
+    assert squash("".join(strip_ssml(segment) for segment in segments)) == squash(strip_ssml(SSML))
+
+
+def test_split_ssml_short_document_is_one_segment():
+    assert split_ssml("<speak>สวัสดีค่ะ</speak>") == ["<speak>สวัสดีค่ะ</speak>"]
+
+
+def test_split_ssml_respects_max_chars():
+    long_ssml = "<speak>" + " ".join(["ประโยคทดสอบที่ยาวพอสมควร"] * 40) + "</speak>"
+
+    segments = split_ssml(long_ssml, min_chars=20, max_chars=120)
+
+    assert len(segments) > 1
+    assert all(len(strip_ssml(segment)) <= 120 for segment in segments)
+
+
+def test_split_text_segments_respects_max_chars():
+    segments = split_text_segments(" ".join(["คำ"] * 200), min_chars=10, max_chars=50)
+
+    assert all(len(segment) <= 50 for segment in segments)
+    assert squash("".join(segments)) == "คำ" * 200
@@ -0,0 +1,89 @@
+# server/test_service_container.py
+# run: python -m pytest server/test_service_container.py
+import threading
+import pytest
+from server.service_container import ServiceContainer
+
+
+class FakeGPTClient:
+    pass
+
+
+class FakeSession:
+    user_id = "test-user"
+    context = {}
+    intent = None
+    state = None
+
+    def update(self, **kwargs):
+        pass
+
+
+def counting_factories(counts):
+    def factory(name, cls):
+        def create():
+            counts[name] = counts.get(name, 0) + 1
+            return cls()
+        return create
+
+    return {
+        "gpt_client": factory("gpt_client", FakeGPTClient),
+        "intent_classifier": factory("intent_classifier", object),
+        "tts_manager": factory("tts_manager", object),
+    }
+
+
+def test_services_are_lazy():
+    counts = {}
+    services = ServiceContainer(factories=counting_factories(counts))
+
+    assert counts == {}
+    assert not services.is_created("gpt_client")
+
+    services.gpt_client
+    assert counts == {"gpt_client": 1}
+
+
+def test_services_are_built_once():
+    counts = {}
+    services = ServiceContainer(factories=counting_factories(counts))
+
+    first = services.gpt_client
+    for _ in range(10):
+        assert services.gpt_client is first
+    assert counts["gpt_client"] == 1
+
+
+def test_concurrent_access_builds_once():
+    counts = {}
+    services = ServiceContainer(factories=counting_factories(counts))
+    seen = []
+
+    threads = [threading.Thread(target=lambda: seen.append(services.gpt_client)) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert counts["gpt_client"] == 1
+    assert all(instance is seen[0] for instance in seen)
+
+
+def test_router_handlers_share_gpt_client():
+    # ต้องมี dependency ของ handler ครบ (feedparser, yfinance, httpx, openai ...)
+    for module in ("feedparser", "yfinance", "httpx", "openai"):
+        pytest.importorskip(module)
+    from server.flow_handlers.intent_router import IntentRouter
+
+    counts = {}
+    services = ServiceContainer(factories=counting_factories(counts))
+    router = IntentRouter(services=services)
+    session = FakeSession()
+
+    handlers = [
+        router._create_handler(intent, session)
+        for intent in ("news_summary", "reminder", "news_summary", "reminder", "chat", "daily_briefing")
+    ]
+
+    assert counts == {"gpt_client": 1}
+    assert all(h.gpt_client is services.gpt_client for h in handlers if hasattr(h, "gpt_client"))
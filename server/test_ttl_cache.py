@@ -0,0 +1,85 @@
+# server/test_ttl_cache.py
+# run: python -m pytest server/test_ttl_cache.py
+import pytest
+
+from server import ttl_cache
+from server.ttl_cache import PersistentTTLCache
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ttl_cache.time, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def test_fresh_entry_is_returned_until_ttl(clock, db_path):
+    cache = PersistentTTLCache("t", ttl_seconds=60, db_path=db_path)
+    cache.put("k", {"intent": "weather"})
+
+    clock.now += 59
+    assert cache.get("k") == {"intent": "weather"}
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_per_entry_ttl_overrides_default(clock, db_path):
+    cache = PersistentTTLCache("t", ttl_seconds=3600, db_path=db_path)
+    cache.put("news", "x", ttl_seconds=10)
+
+    clock.now += 11
+    assert cache.get("news") is None
+
+
+def test_entries_survive_restart(clock, db_path):
+    PersistentTTLCache("t", ttl_seconds=60, db_path=db_path).put("k", ["ไทย", 1])
+
+    reopened = PersistentTTLCache("t", ttl_seconds=60, db_path=db_path)
+    assert reopened.get("k") == ["ไทย", 1]
+    assert reopened.stats()["disk_hits"] == 1
+    assert reopened.get("k") == ["ไทย", 1]
+    assert reopened.stats()["memory_hits"] == 1
+
+
+def test_namespaces_do_not_share_entries(clock, db_path):
+    PersistentTTLCache("a", ttl_seconds=60, db_path=db_path).put("k", 1)
+
+    assert PersistentTTLCache("b", ttl_seconds=60, db_path=db_path).get("k") is None
+
+
+def test_memory_tier_evicts_least_recently_used(clock, db_path):
+    cache = PersistentTTLCache("t", ttl_seconds=60, max_entries=2, db_path=db_path)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("b") == 2   # ยังอยู่บน disk
+
+
+def test_get_stale_serves_expired_entry_inside_stale_window(clock, db_path):
+    cache = PersistentTTLCache("t", ttl_seconds=100, db_path=db_path, stale_ratio=0.5)
+    cache.put("k", "old")
+
+    assert cache.get_stale("k") == ("old", False)
+    clock.now += 140
+    assert cache.get("k") is None
+    assert cache.get_stale("k") == ("old", True)
+    clock.now += 20
+    assert cache.get_stale("k") == (None, False)
@@ -0,0 +1,121 @@
+# server/test_tts_cache.py
+# run: python -m pytest server/test_tts_cache.py
+import os
+import pytest
+
+from server.tts_cache import TTSCache
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "tts_cache")
+
+
+def set_mtime(cache, key, mtime):
+    os.utime(cache._path(key), (mtime, mtime))
+
+
+def test_key_ignores_whitespace_but_not_voice_settings():
+    key = TTSCache.make_key("<speak>\n  <s>สวัสดี   ค่ะ</s>\n</speak>", True, "th-TH-A", 1.0, 0.0, "MP3")
+
+    assert key == TTSCache.make_key("<speak><s>สวัสดี ค่ะ</s></speak>", True, "th-TH-A", 1.0, 0.0, "MP3")
+    assert key != TTSCache.make_key("<speak><s>สวัสดี ค่ะ</s></speak>", True, "th-TH-B", 1.0, 0.0, "MP3")
+    assert key != TTSCache.make_key("<speak><s>สวัสดี ค่ะ</s></speak>", True, "th-TH-A", 1.0, 0.0, "LINEAR16")
+
+
+def test_put_then_get_hits_memory(cache_dir):
+    cache = TTSCache(cache_dir)
+    cache.put("a", b"audio-a")
+
+    assert cache.get("a") == b"audio-a"
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"]) == (1, 1)
+
+
+def test_empty_audio_is_not_cached(cache_dir):
+    cache = TTSCache(cache_dir)
+    cache.put("a", b"")
+
+    assert cache.get("a") is None
+    assert os.listdir(cache_dir) == []
+
+
+def test_memory_tier_is_bounded_by_bytes(cache_dir):
+    cache = TTSCache(cache_dir, max_memory_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    cache.get("a")             # a ใช้ล่าสุด -> b ถูกไล่ออกก่อน
+    cache.put("c", b"cccc")
+
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.stats()["memory_bytes"] == 8
+    assert cache.get("b") == b"bbbb"   # ยังอยู่บน disk
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_audio_larger_than_memory_budget_stays_on_disk_only(cache_dir):
+    cache = TTSCache(cache_dir, max_memory_bytes=4)
+    cache.put("big", b"0123456789")
+
+    assert "big" not in cache._memory
+    assert cache.get("big") == b"0123456789"
+
+
+def test_disk_tier_evicts_least_recently_used(cache_dir):
+    cache = TTSCache(cache_dir, max_memory_bytes=0, max_disk_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    cache.get("a")
+    cache.put("c", b"cccc")
+
+    assert sorted(os.listdir(cache_dir)) == ["a.audio", "c.audio"]
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("b") is None
+
+
+def test_index_is_reloaded_in_mtime_order_on_restart(cache_dir):
+    cache = TTSCache(cache_dir)
+    for key in ("old", "mid", "new"):
+        cache.put(key, b"xxxx")
+    set_mtime(cache, "old", 1000)
+    set_mtime(cache, "mid", 2000)
+    set_mtime(cache, "new", 3000)
+
+    reopened = TTSCache(cache_dir, max_disk_bytes=8)   # เกิน budget -> ไล่ไฟล์ที่เก่าสุดออกตอนโหลด
+
+    assert list(reopened._disk) == ["mid", "new"]
+    assert not os.path.exists(reopened._path("old"))
+    assert reopened.get("new") == b"xxxx"
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_disk_hit_refreshes_mtime(cache_dir):
+    cache = TTSCache(cache_dir, max_memory_bytes=0)
+    cache.put("a", b"aaaa")
+    set_mtime(cache, "a", 1000)
+
+    cache.get("a")
+
+    assert os.path.getmtime(cache._path("a")) > 1000
+
+
+def test_missing_disk_file_counts_as_miss(cache_dir):
+    cache = TTSCache(cache_dir, max_memory_bytes=0)
+    cache.put("a", b"aaaa")
+    os.remove(cache._path("a"))
+
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["misses"], stats["disk_entries"], stats["disk_bytes"]) == (1, 0, 0)
+
+    cache.put("a", b"aaaa")   # เขียนใหม่ได้ตามปกติ
+    assert cache.get("a") == b"aaaa"
+
+
+def test_non_audio_files_are_ignored(cache_dir):
+    os.makedirs(cache_dir)
+    with open(os.path.join(cache_dir, "notes.txt"), "w") as f:
+        f.write("x")
+
+    assert TTSCache(cache_dir).stats()["disk_entries"] == 0
@@ -0,0 +1,86 @@
+# server/test_turn_registry.py
+# run: python -m pytest server/test_turn_registry.py
+import asyncio
+import pytest
+
+from server.turn_registry import TurnRegistry, TurnCancelled
+
+
+def test_cancel_aborts_running_work():
+    async def scenario():
+        registry = TurnRegistry()
+        started = asyncio.Event()
+
+        async def slow_answer():
+            started.set()
+            await asyncio.sleep(10)
+            return "answer"
+
+        async with registry.track("s1", "t1") as turn:
+            work = asyncio.ensure_future(registry.run(turn, slow_answer()))
+            await started.wait()
+            assert registry.cancel("s1", "t1") == ["t1"]
+            with pytest.raises(TurnCancelled):
+                await work
+        return registry
+
+    registry = asyncio.run(scenario())
+
+    assert registry.active == {}
+    assert registry.stats()["cancelled"] == 1
+    assert registry.stats()["tasks_cancelled"] == 1
+
+
+def test_cancel_before_request_still_applies():
+    async def scenario():
+        registry = TurnRegistry()
+        assert registry.cancel("s1", "late") == []
+
+        async def answer():
+            return "answer"
+
+        async with registry.track("s1", "late") as turn:
+            assert turn.cancelled
+            with pytest.raises(TurnCancelled):
+                await registry.run(turn, answer())
+
+    asyncio.run(scenario())
+
+
+def test_cancel_expires_after_ttl():
+    async def scenario():
+        registry = TurnRegistry(cancelled_ttl_sec=0)
+        registry.cancel("s1", "old")
+        await asyncio.sleep(0.01)
+
+        async def answer():
+            return "answer"
+
+        async with registry.track("s1", "old") as turn:
+            return await registry.run(turn, answer())
+
+    assert asyncio.run(scenario()) == "answer"
+
+
+def test_cancel_without_turn_id_cancels_only_that_session():
+    async def scenario():
+        registry = TurnRegistry()
+        async with registry.track("s1", "a") as turn_a, registry.track("s2", "b") as turn_b:
+            assert registry.cancel("s1") == ["a"]
+            return turn_a.cancelled, turn_b.cancelled
+
+    assert asyncio.run(scenario()) == (True, False)
+
+
+def test_requests_sharing_a_turn_keep_it_active():
+    async def scenario():
+        registry = TurnRegistry()
+        async with registry.track("s1", "t1") as chat_turn:
+            async with registry.track("s1", "t1") as speak_turn:
+                assert speak_turn is chat_turn
+                assert chat_turn.requests == 2
+            assert "t1" in registry.active
+        assert registry.active == {}
+        assert registry.started == 1
+
+    asyncio.run(scenario())
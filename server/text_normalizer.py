@@ -0,0 +1,43 @@
+# server/text_normalizer.py
+import re
+import unicodedata
+
+THAI_DIGITS = str.maketrans("๐๑๒๓๔๕๖๗๘๙", "0123456789")
+
+# คำลงท้ายสุภาพ/คำเสริม ที่ไม่เปลี่ยนความหมายของคำสั่ง (ตัดเฉพาะท้ายประโยค เพราะ "คะ" อยู่ใน "คะแนน" ได้)
+TRAILING_PARTICLES = [
+    "ให้หน่อย", "หน่อยนะ", "หน่อย", "ด้วยนะ", "ด้วย",
+    "ครับผม", "ครับ", "คับ", "ค่ะ", "คะ", "ค่า", "จ้ะ", "จ้า", "จ๊ะ", "นะ", "สิ", "ที",
+]
+LEADING_PARTICLES = ["ช่วย", "รบกวน", "please "]
+
+PUNCTUATION_PATTERN = re.compile(r"[\s\"'`.,!?;:()\[\]{}~…“”‘’]+")
+
+
+def normalize_utterance(text: str) -> str:
+    """
+    Canonical form of a spoken utterance for cache keys:
+    NFC, lower case, Thai digits -> Arabic, punctuation/whitespace removed,
+    polite particles (ครับ/ค่ะ/หน่อย ...) stripped from the end and ช่วย/รบกวน from the start.
+    """
+    text = unicodedata.normalize("NFC", str(text)).lower().translate(THAI_DIGITS).strip()
+
+    changed = True
+    while changed and text:
+        changed = False
+        for prefix in LEADING_PARTICLES:
+            if text.startswith(prefix) and len(text) > len(prefix):
+                text = text[len(prefix):].lstrip()
+                changed = True
+
+    text = PUNCTUATION_PATTERN.sub("", text)
+
+    changed = True
+    while changed and text:
+        changed = False
+        for particle in TRAILING_PARTICLES:
+            if text.endswith(particle) and len(text) > len(particle):
+                text = text[:-len(particle)]
+                changed = True
+                break
+    return text
@@ -0,0 +1,171 @@
+# server/ttl_cache.py
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_DB_PATH = "cache.db"
+PRUNE_EVERY_PUTS = 100
+
+
+class PersistentTTLCache:
+    """
+    Two-level cache for JSON-serialisable values: an in-memory LRU (OrderedDict)
+    in front of a SQLite table, so entries survive restarts. Every entry has an
+    expiry; expired entries count as misses and are pruned lazily.
+
+    With stale_ratio > 0 an expired entry stays usable through get_stale() for
+    stale_ratio x its TTL, so callers can serve it while refreshing in the background.
+
+    One table per namespace, all namespaces share DEFAULT_DB_PATH.
+    """
+
+    def __init__(self, namespace, ttl_seconds, max_entries=1000, db_path=DEFAULT_DB_PATH, max_disk_entries=None, stale_ratio=0.0):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.stale_ratio = stale_ratio
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries or max_entries * 10
+        self.table = f"cache_{namespace}"
+        self.lock = threading.Lock()
+
+        self._memory = OrderedDict()   # key -> (value, created_at, expires_at)
+        self._puts = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stale_hits = 0
+        self.evictions = 0
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock:
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self.conn.commit()
+            self._prune_disk()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _prune_disk(self):
+        self.conn.execute(
+            f"DELETE FROM {self.table} WHERE expires_at + (expires_at - created_at) * ? < ?",
+            (self.stale_ratio, time.time())
+        )
+        self.conn.execute(
+            f"DELETE FROM {self.table} WHERE key NOT IN "
+            f"(SELECT key FROM {self.table} ORDER BY created_at DESC LIMIT ?)",
+            (self.max_disk_entries,)
+        )
+        self.conn.commit()
+
+    def _lookup(self, key):
+        """(value, created_at, expires_at) from memory or disk without touching hit counters."""
+        entry = self._memory.get(key)
+        if entry is not None:
+            return entry, "memory"
+        row = self.conn.execute(
+            f"SELECT value, created_at, expires_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None, None
+        try:
+            entry = (json.loads(row[0]), row[1], row[2])
+        except json.JSONDecodeError:
+            return None, None
+        self._remember(key, entry)
+        return entry, "disk"
+
+    def get(self, key):
+        """Fresh value or None."""
+        with self.lock:
+            entry, tier = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] < time.time():
+                self.expired += 1
+                self.misses += 1
+                self._memory.pop(key, None)
+                return None
+            self._memory.move_to_end(key)
+            if tier == "memory":
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+            return entry[0]
+
+    def get_stale(self, key):
+        """
+        (value, is_stale): a fresh value, an expired one still inside its stale
+        window (the caller should refresh it), or (None, False).
+        """
+        with self.lock:
+            entry, tier = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            value, created_at, expires_at = entry
+            now = time.time()
+            if expires_at >= now:
+                self._memory.move_to_end(key)
+                if tier == "memory":
+                    self.memory_hits += 1
+                else:
+                    self.disk_hits += 1
+                return value, False
+            self.expired += 1
+            if now <= expires_at + (expires_at - created_at) * self.stale_ratio:
+                self.stale_hits += 1
+                return value, True
+            self.misses += 1
+            self._memory.pop(key, None)
+            return None, False
+
+    def put(self, key, value, ttl_seconds=None):
+        now = time.time()
+        entry = (value, now, now + (ttl_seconds or self.ttl_seconds))
+        with self.lock:
+            self._remember(key, entry)
+            try:
+                self.conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), entry[1], entry[2])
+                )
+                self.conn.commit()
+                self._puts += 1
+                if self._puts % PRUNE_EVERY_PUTS == 0:
+                    self._prune_disk()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Failed to persist {self.namespace} cache entry: {e}")
+
+    def stats(self):
+        with self.lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.stale_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "stale_hits": self.stale_hits,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
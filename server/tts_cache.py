@@ -0,0 +1,158 @@
+# server/tts_cache.py
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+MAX_MEMORY_BYTES = 32 * 1024 * 1024   # ~ หลายร้อยประโยคสั้น ๆ
+MAX_DISK_BYTES = 256 * 1024 * 1024
+
+
+class TTSCache:
+    """
+    Content-addressed cache of synthesized audio.
+
+    Two LRU tiers: an in-memory OrderedDict and a size-bounded directory on disk
+    (recency kept via file mtime so it survives restarts). A hit on either tier
+    returns the bytes without any network call.
+    """
+
+    def __init__(self, cache_dir="tts_cache", max_memory_bytes=MAX_MEMORY_BYTES, max_disk_bytes=MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.lock = threading.Lock()
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_disk_index()
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        text = re.sub(r"\s+", " ", str(text)).strip()
+        return re.sub(r">\s+<", "><", text)
+
+    @classmethod
+    def make_key(cls, text, is_ssml, voice, speaking_rate, pitch, encoding) -> str:
+        material = json.dumps(
+            [cls.normalize_text(text), bool(is_ssml), voice, speaking_rate, pitch, encoding],
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.audio")
+
+    def _load_disk_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".audio"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-len(".audio")], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        logger.info(f"🗂️ TTS cache loaded {len(self._disk)} files ({self._disk_bytes} bytes) from {self.cache_dir}")
+        self._evict_disk()
+
+    def _remember_in_memory(self, key, audio):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        if len(audio) > self.max_memory_bytes:
+            return
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError as e:
+                logger.warning(f"⚠️ Failed to evict TTS cache file {key}: {e}")
+
+    def get(self, key):
+        with self.lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return audio
+
+            if key in self._disk:
+                try:
+                    with open(self._path(key), "rb") as f:
+                        audio = f.read()
+                    os.utime(self._path(key))
+                except OSError:
+                    self._disk_bytes -= self._disk.pop(key)
+                    self.misses += 1
+                    return None
+                self._disk.move_to_end(key)
+                self._remember_in_memory(key, audio)
+                self.disk_hits += 1
+                return audio
+
+            self.misses += 1
+            return None
+
+    def put(self, key, audio: bytes):
+        if not audio:
+            return
+        with self.lock:
+            self._remember_in_memory(key, audio)
+            if key in self._disk:
+                self._disk.move_to_end(key)
+                return
+            try:
+                tmp_path = self._path(key) + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(audio)
+                os.replace(tmp_path, self._path(key))
+            except OSError as e:
+                logger.warning(f"⚠️ Failed to write TTS cache file: {e}")
+                return
+            self._disk[key] = len(audio)
+            self._disk_bytes += len(audio)
+            self._evict_disk()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
@@ -0,0 +1,97 @@
+# server/tts_client_pool.py
+import itertools
+import threading
+from google.api_core import exceptions as core_exceptions
+from google.api_core import retry as retries
+from google.cloud import texttospeech
+from google.cloud.texttospeech_v1.services.text_to_speech.transports import TextToSpeechGrpcTransport
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+POOL_SIZE = 2                 # channel ละหลาย stream อยู่แล้ว 2 channel พอสำหรับ client ในบ้าน
+CALL_DEADLINE_SEC = 10.0      # per-attempt deadline
+RETRY_BUDGET_SEC = 15.0       # total time spent retrying one synth call
+
+KEEPALIVE_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+RETRYABLE_ERRORS = (
+    core_exceptions.ServiceUnavailable,
+    core_exceptions.DeadlineExceeded,
+    core_exceptions.ResourceExhausted,
+    core_exceptions.InternalServerError,
+)
+
+
+class TTSClientPool:
+    """
+    A small pool of long-lived TextToSpeechClient instances, each on its own
+    keepalive gRPC channel, shared by every synth call. Credentials are read and
+    the TLS handshake done once per channel instead of once per utterance.
+    """
+
+    def __init__(self, size=POOL_SIZE, deadline=CALL_DEADLINE_SEC, retry_budget=RETRY_BUDGET_SEC):
+        self.size = size
+        self.deadline = deadline
+        self.retry = retries.Retry(
+            predicate=retries.if_exception_type(*RETRYABLE_ERRORS),
+            initial=0.1,
+            maximum=1.0,
+            multiplier=2.0,
+            timeout=retry_budget,
+        )
+        self._clients = []
+        self._cycle = None
+        self._lock = threading.Lock()
+
+    def _create_client(self):
+        channel = TextToSpeechGrpcTransport.create_channel(options=KEEPALIVE_OPTIONS)
+        transport = TextToSpeechGrpcTransport(channel=channel)
+        return texttospeech.TextToSpeechClient(transport=transport)
+
+    def start(self):
+        with self._lock:
+            if self._clients:
+                return
+            self._clients = [self._create_client() for _ in range(self.size)]
+            self._cycle = itertools.cycle(self._clients)
+            logger.info(f"🔌 TTS client pool started with {self.size} channel(s)")
+
+    def _next_client(self):
+        if not self._clients:
+            self.start()
+        with self._lock:
+            return next(self._cycle)
+
+    def synthesize_speech(self, **request):
+        return self._next_client().synthesize_speech(
+            **request,
+            timeout=self.deadline,
+            retry=self.retry,
+        )
+
+    def warm_up(self, language_code="th-TH"):
+        """
+        Open every channel and authenticate with a free list_voices call,
+        so the first real utterance after boot does not pay the setup cost.
+        """
+        self.start()
+        for client in self._clients:
+            client.list_voices(language_code=language_code, timeout=self.deadline)
+        logger.info("🔥 TTS client pool warmed up")
+
+    def close(self):
+        with self._lock:
+            for client in self._clients:
+                try:
+                    client.transport.close()
+                except Exception as e:
+                    logger.warning(f"⚠️ Failed to close TTS channel: {e}")
+            self._clients = []
+            self._cycle = None
+        logger.info("🛑 TTS client pool closed")
@@ -1,24 +1,37 @@
 # tts_manager.py
 from google.cloud import texttospeech
-import uuid
+import asyncio
+import io
 import os
-import platform
 import html
 import re
+import wave
 from .usage_tracker_instance import usage_tracker
+from .tts_cache import TTSCache
+from .tts_client_pool import TTSClientPool
+from .sentence_splitter import split_ssml, split_text_segments
 from config import GOOGLE_CLOUD_CREDENTIALS_PATH
+from logger_config import get_logger
 
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_CLOUD_CREDENTIALS_PATH
 
+logger = get_logger(__name__)
+
+MAX_PARALLEL_SEGMENTS = 4   # จำนวน segment ที่สังเคราะห์พร้อมกันสูงสุด (ทั้ง server)
+
  
 class TTSManager:
     def __init__(self):
+        self.language_code = "th-TH"
+        self.ssml_gender = "FEMALE"
+        self.speaking_rate = 0.75
+        self.pitch = 1.0
+        self.audio_encoding = "MP3"
 
-        system = platform.system()
-        if system == "Linux" and os.path.exists("/dev/shm"):
-            self.output_dir = "/dev/shm"  # บน Raspberry Pi หรือ Linux ทั่วไป
-        else:
-            self.output_dir = "."  # macOS หรือ fallback → เก็บไว้ใน current folder    
+        self.cache = TTSCache()
+        self.client_pool = TTSClientPool()
+        usage_tracker.register_stats("tts_cache", self.cache.stats)
+        self.segment_semaphore = asyncio.Semaphore(MAX_PARALLEL_SEGMENTS)
 
     def normalize_ssml_for_neural2(self,text: str) -> str:
         """
@@ -64,7 +77,8 @@ class TTSManager:
     def sanitize_ssml_text(self,ssml: str) -> str:
         def escape_inside_tags(match):
             inner_text = match.group(1)
-            return f">{html.escape(inner_text)}<"
+            # unescape ก่อน เพื่อไม่ให้ข้อความที่ escape มาแล้ว (prosody.text_to_ssml / client) กลายเป็น &amp;amp;
+            return f">{html.escape(html.unescape(inner_text), quote=False)}<"
 
         # Escapeเฉพาะเนื้อหาที่อยู่ระหว่าง >...< ของแต่ละ tag
         sanitized = re.sub(r'>([^<]+)<', escape_inside_tags, ssml)
@@ -119,8 +133,38 @@ class TTSManager:
 
         return text
 
-    def synthesize(self, text: str, is_ssml=False) -> str:
-        client = texttospeech.TextToSpeechClient()
+    def media_type(self, audio_format="mp3", sample_rate=None) -> str:
+        if audio_format == "pcm":
+            return f"audio/L16; rate={sample_rate}; channels=1"
+        return "audio/mpeg"
+
+    def _strip_wav_header(self, audio_content: bytes) -> bytes:
+        # LINEAR16 จาก Google มาพร้อม WAV header ตัดออกให้เหลือ PCM ล้วน
+        with wave.open(io.BytesIO(audio_content), "rb") as wav_file:
+            return wav_file.readframes(wav_file.getnframes())
+
+    def synthesize_audio(self, text: str, is_ssml=False, audio_format="mp3", sample_rate=None) -> bytes:
+        """
+        Synthesize and return audio bytes without touching the filesystem.
+        audio_format "mp3" returns MP3; "pcm" returns raw 16-bit mono PCM at sample_rate.
+        """
+        if audio_format == "pcm":
+            encoding = "LINEAR16"
+            sample_rate = int(sample_rate or 24000)
+        else:
+            encoding = self.audio_encoding
+            sample_rate = None
+
+        cache_key = TTSCache.make_key(
+            text, is_ssml,
+            voice=f"{self.language_code}/{self.ssml_gender}",
+            speaking_rate=self.speaking_rate,
+            pitch=self.pitch,
+            encoding=f"{encoding}@{sample_rate}" if sample_rate else encoding
+        )
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         if is_ssml:                 
             safe_ssml = self.sanitize_ssml_text(text)
@@ -137,26 +181,59 @@ class TTSManager:
         # )
 
         voice = texttospeech.VoiceSelectionParams(
-            language_code="th-TH",
-            ssml_gender=texttospeech.SsmlVoiceGender.FEMALE
+            language_code=self.language_code,
+            ssml_gender=texttospeech.SsmlVoiceGender[self.ssml_gender]
         )
         audio_config = texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.MP3,
-                speaking_rate=0.75,
-                pitch=1.0
+                audio_encoding=texttospeech.AudioEncoding[encoding],
+                speaking_rate=self.speaking_rate,
+                pitch=self.pitch,
+                sample_rate_hertz=sample_rate or 0
             )        
 
-        response = client.synthesize_speech(
+        response = self.client_pool.synthesize_speech(
             input=synthesis_input,
             voice=voice,
             audio_config=audio_config
         )
 
-        filename = os.path.join(self.output_dir, f"tts_{uuid.uuid4()}.mp3")
-        with open(filename, "wb") as out:
-            out.write(response.audio_content)
-        
         #log tts usage
         usage_tracker.log_tts_usage(len(text), is_ssml=is_ssml)
 
-        return filename  # return path to mp3
\ No newline at end of file
+        audio_content = response.audio_content
+        if encoding == "LINEAR16":
+            audio_content = self._strip_wav_header(audio_content)
+
+        self.cache.put(cache_key, audio_content)
+        return audio_content
+
+    def split_segments(self, text: str, is_ssml=False):
+        """Sentence-sized segments; SSML segments are standalone balanced <speak> documents."""
+        segments = split_ssml(text) if is_ssml else split_text_segments(text)
+        return segments or [text]
+
+    async def synthesize_audio_async(self, text: str, is_ssml=False, audio_format="mp3", sample_rate=None) -> bytes:
+        async with self.segment_semaphore:
+            return await asyncio.to_thread(self.synthesize_audio, text, is_ssml, audio_format, sample_rate)
+
+    async def iter_synthesize_async(self, text: str, is_ssml=False, audio_format="mp3", sample_rate=None):
+        """
+        Synthesize a long text as sentence segments in parallel (bounded by
+        MAX_PARALLEL_SEGMENTS) and yield each segment's audio in order, so the
+        first segment can be played while the rest are still being synthesized.
+        MP3 frames and raw PCM both concatenate cleanly.
+        """
+        segments = self.split_segments(text, is_ssml)
+        if len(segments) > 1:
+            logger.info(f"✂️ Split TTS input into {len(segments)} segments")
+
+        tasks = [
+            asyncio.create_task(self.synthesize_audio_async(segment, is_ssml, audio_format, sample_rate))
+            for segment in segments
+        ]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,127 @@
+# server/turn_registry.py
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+CANCELLED_TTL_SEC = 120      # /cancel ที่มาก่อน (หรือหลัง) request ของ turn นั้นยังมีผลภายในช่วงนี้
+MAX_CANCELLED_TURNS = 256
+TURN_CANCELLED_RESPONSE = {"status": "interrupted", "reply": ""}   # client จะไม่พูดคำตอบนี้
+
+
+class TurnCancelled(Exception):
+    """The client cancelled this turn (stop word) before it finished."""
+
+
+class Turn:
+    """
+    One user utterance. /chat, /chat/stream and every /speak for the utterance
+    share the turn id sent by the client; tasks doing work for it are attached
+    so /cancel can abort them.
+    """
+
+    def __init__(self, turn_id, session_id):
+        self.turn_id = turn_id
+        self.session_id = session_id
+        self.cancelled = False
+        self.tasks = set()
+        self.requests = 0
+
+    def attach(self, task=None):
+        """Attach a task (default: the current one); it is cancelled immediately if the turn already is."""
+        task = task or asyncio.current_task()
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        if self.cancelled:
+            task.cancel()
+        return task
+
+    def cancel(self):
+        self.cancelled = True
+        for task in list(self.tasks):
+            task.cancel()
+        return len(self.tasks)
+
+
+class TurnRegistry:
+    """In-flight turns by id, used from the event loop only (no locking)."""
+
+    def __init__(self, cancelled_ttl_sec=CANCELLED_TTL_SEC):
+        self.cancelled_ttl_sec = cancelled_ttl_sec
+        self.active = {}
+        self._cancelled = OrderedDict()   # turn_id -> cancelled_at
+        self.started = 0
+        self.cancelled = 0
+        self.tasks_cancelled = 0
+
+    def _was_cancelled(self, turn_id):
+        cutoff = time.monotonic() - self.cancelled_ttl_sec
+        while self._cancelled and next(iter(self._cancelled.values())) < cutoff:
+            self._cancelled.popitem(last=False)
+        return turn_id in self._cancelled
+
+    def _remember_cancelled(self, turn_id):
+        self._cancelled[turn_id] = time.monotonic()
+        self._cancelled.move_to_end(turn_id)
+        while len(self._cancelled) > MAX_CANCELLED_TURNS:
+            self._cancelled.popitem(last=False)
+
+    @asynccontextmanager
+    async def track(self, session_id, turn_id=None):
+        turn_id = turn_id or uuid.uuid4().hex
+        turn = self.active.get(turn_id)
+        if turn is None:
+            turn = self.active[turn_id] = Turn(turn_id, session_id)
+            turn.cancelled = self._was_cancelled(turn_id)
+            self.started += 1
+        turn.requests += 1
+        try:
+            yield turn
+        finally:
+            turn.requests -= 1
+            if turn.requests == 0:
+                self.active.pop(turn_id, None)
+
+    async def run(self, turn, coro):
+        """Await coro as a task attached to the turn; raises TurnCancelled if /cancel aborts it."""
+        if turn.cancelled:
+            coro.close()
+            raise TurnCancelled(turn.turn_id)
+        task = turn.attach(asyncio.ensure_future(coro))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if turn.cancelled and task.cancelled():
+                raise TurnCancelled(turn.turn_id)
+            raise
+
+    def cancel(self, session_id, turn_id=None):
+        """Cancel one turn, or every active turn of the session. Returns the cancelled turn ids."""
+        if turn_id:
+            self._remember_cancelled(turn_id)
+            turns = [self.active[turn_id]] if turn_id in self.active else []
+        else:
+            turns = [turn for turn in self.active.values() if turn.session_id == session_id]
+
+        for turn in turns:
+            if not turn.cancelled:
+                self.cancelled += 1
+            self.tasks_cancelled += turn.cancel()
+        if turns:
+            logger.info(f"🛑 Cancelled turn(s) {[turn.turn_id for turn in turns]} for session {session_id}")
+        return [turn.turn_id for turn in turns]
+
+    def stats(self):
+        return {
+            "active": len(self.active),
+            "started": self.started,
+            "cancelled": self.cancelled,
+            "tasks_cancelled": self.tasks_cancelled,
+        }
+
+
+turn_registry = TurnRegistry()
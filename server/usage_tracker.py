@@ -2,6 +2,7 @@ from datetime import datetime
 from collections import defaultdict
 import json
 import os
+import threading
 from config import OPENAI_MODEL
 from logger_config import get_logger
 
@@ -10,17 +11,54 @@ logger = get_logger(__name__)
 class UsageTracker:
     def __init__(self, log_file="usage_log.json"):
         self.log_file = log_file
+        self.stats_providers = {}
+        self._lock = threading.Lock()
+        self.prompt_tokens_total = 0
+        self.cached_tokens_total = 0
+        self.register_stats("prompt_cache", self.prompt_cache_stats)
 
-    def log_gpt_usage(self, prompt_tokens, completion_tokens, model=OPENAI_MODEL):
+    def register_stats(self, name, provider):
+        """Register a callable returning in-process counters (cache hit rates etc.) for /usage."""
+        self.stats_providers[name] = provider
+
+    def runtime_stats(self):
+        return {name: provider() for name, provider in self.stats_providers.items()}
+
+    def prompt_cache_stats(self):
+        with self._lock:
+            return {
+                "prompt_tokens": self.prompt_tokens_total,
+                "cached_tokens": self.cached_tokens_total,
+                "cached_ratio": round(self.cached_tokens_total / self.prompt_tokens_total, 3) if self.prompt_tokens_total else 0.0,
+            }
+
+    def log_gpt_usage(self, prompt_tokens, completion_tokens, model=OPENAI_MODEL, cached_tokens=0):
         total = prompt_tokens + completion_tokens
+        with self._lock:
+            self.prompt_tokens_total += prompt_tokens
+            self.cached_tokens_total += cached_tokens
         self._write_log({
             "type": "gpt",
             "model": model,
             "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
             "completion_tokens": completion_tokens,
             "total_tokens": total
         })
 
+    def log_openai_usage(self, usage, model=OPENAI_MODEL):
+        """Log an OpenAI usage object, including prompt_tokens_details.cached_tokens (provider prompt cache)."""
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        self.log_gpt_usage(
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            model=model,
+            cached_tokens=cached_tokens
+        )
+
     def log_tts_usage(self, char_count, is_ssml=True):
         self._write_log({
             "type": "tts",
@@ -41,7 +79,7 @@ class UsageTracker:
         with open(self.log_file) as f:
             logs = [json.loads(line) for line in f]
 
-        summary = defaultdict(lambda: {"gpt_tokens": 0, "tts_chars": 0})
+        summary = defaultdict(lambda: {"gpt_tokens": 0, "gpt_cached_tokens": 0, "tts_chars": 0})
         for entry in logs:
             ts = datetime.fromisoformat(entry["timestamp"])
             if by == "day":
@@ -55,6 +93,7 @@ class UsageTracker:
 
             if entry["type"] == "gpt":
                 summary[key]["gpt_tokens"] += entry.get("total_tokens", 0)
+                summary[key]["gpt_cached_tokens"] += entry.get("cached_tokens", 0)
             elif entry["type"] == "tts":
                 summary[key]["tts_chars"] += entry.get("char_count", 0)
 
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import random
+import sys
+from collections import defaultdict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from server.intent_classifier.local_model import (
+    LocalIntentModel, seed_examples, load_logged_examples,
+    DEFAULT_MODEL_PATH, INTENT_LOG_PATH, MIN_LOG_CONFIDENCE
+)
+
+# ตัวอย่างการใช้งาน (รันจาก root ของ repo):
+#   python tools/train_intent_model.py --log intent_log.jsonl --out intent_model.json
+#   python tools/train_intent_model.py --report-only --threshold 0.8
+
+
+def split_holdout(examples, ratio, seed):
+    """Stratified split so every intent keeps examples on both sides."""
+    by_intent = defaultdict(list)
+    for text, intent in examples:
+        by_intent[intent].append((text, intent))
+
+    rng = random.Random(seed)
+    train, holdout = [], []
+    for items in by_intent.values():
+        rng.shuffle(items)
+        n_holdout = int(len(items) * ratio) if len(items) > 2 else 0
+        holdout.extend(items[:n_holdout])
+        train.extend(items[n_holdout:])
+    return train, holdout
+
+
+def print_report(report):
+    print(f"📊 Held-out examples : {report['examples']}")
+    print(f"🎯 Accuracy          : {report['accuracy']:.3f}")
+    print(f"🔒 Threshold         : {report['threshold']}")
+    print(f"   coverage          : {report['coverage']:.3f} (ตอบเองโดยไม่ต้องใช้ LLM)")
+    print(f"   accuracy above    : {report['accuracy_above_threshold']:.3f}")
+    print(f"⏱️ Latency mean / p95: {report['latency_ms_mean']:.3f} ms / {report['latency_ms_p95']:.3f} ms")
+    for intent, accuracy in report["per_intent"].items():
+        print(f"   - {intent:<16} {accuracy:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrain the local intent model from seed examples and logged utterances")
+    parser.add_argument("--log", default=INTENT_LOG_PATH, help="intent log (JSONL) written by IntentClassifier")
+    parser.add_argument("--out", default=DEFAULT_MODEL_PATH, help="where to write the model JSON")
+    parser.add_argument("--min-confidence", type=float, default=MIN_LOG_CONFIDENCE)
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction held out for the report")
+    parser.add_argument("--threshold", type=float, default=0.75, help="confidence threshold to report coverage for")
+    parser.add_argument("--epochs", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--report-only", action="store_true", help="evaluate the existing model without retraining")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    logged = load_logged_examples(args.log, args.min_confidence)
+    examples = seed_examples() + logged
+    print(f"📚 {len(examples)} examples ({len(logged)} from {args.log})")
+
+    train, holdout = split_holdout(examples, args.holdout, args.seed)
+
+    if args.report_only:
+        model = LocalIntentModel.load(args.out)
+    else:
+        model = LocalIntentModel().train(train, epochs=args.epochs, seed=args.seed)
+
+    report = model.evaluate(holdout or train, threshold=args.threshold)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+    if not args.report_only:
+        # model สุดท้ายใช้ข้อมูลทั้งหมด (รวม held-out) ตอนเอาไปใช้งานจริง
+        final_model = LocalIntentModel().train(examples, epochs=args.epochs, seed=args.seed)
+        final_model.save(args.out)
+        print(f"✅ Saved model to {args.out} ({len(final_model.weights)} features)")
+
+
+if __name__ == "__main__":
+    main()